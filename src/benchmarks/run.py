@@ -0,0 +1,308 @@
+"""Benchmarks des chemins principaux de l'application, sur des données synthétiques.
+
+Usage (depuis src/):
+    python -m benchmarks.run                                 # fichiers seuls : écriture, parse, métadonnées, aperçu
+    python -m benchmarks.run --catalog-rows 10000,100000,1000000 --ingest-files 50
+    python -m benchmarks.run --compare .cache/benchmarks/20260101_120000_abc1234.json
+
+Les suites ingest, update et catalog écrivent dans la base configurée
+(variables POSTGRES_*) : les lignes synthétiques sont reconnaissables à leur
+file_path et supprimées à la fin (sauf --keep).
+
+Chaque mesure est répétée (--repeat) après un passage d'échauffement. Le
+résultat est un fichier JSON (médiane, p95, min, max... en ms, commit git,
+versions) ; --compare affiche le rapport des médianes avec un résultat
+précédent.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.synthetic import (
+    BENCHMARK_PATH_PREFIX, insert_synthetic_catalog, remove_synthetic_rows, synthetic_clip, write_synthetic_files
+)
+from tools.bvh_parser import build_bvh_file_create, parse_bvh
+from tools.clip_edit import save_clip
+from tools.kinematics import analyze_clip
+from tools.preview import QUANTIZATIONS, encode_preview, render_viewer_html
+
+DEFAULT_RESULTS_DIR = os.getenv("BENCHMARK_DIR", ".cache/benchmarks")
+VIEWER_TEMPLATE = Path("viewer.html")
+SUITES = ("files", "ingest", "update", "catalog")
+
+# Écart de médiane signalé par --compare
+REGRESSION_RATIO = 1.10
+
+
+class BenchmarkRun:
+    """Mesures d'une exécution, par nom ("suite/cas")."""
+
+    def __init__(self, repeat: int = 5, warmup: int = 1, log=print):
+        self.repeat = repeat
+        self.warmup = warmup
+        self.log = log
+        self.results = {}
+
+    def measure(self, name: str, fn, repeat: int = None, warmup: int = None, setup=None, **extra) -> dict:
+        """Chronomètre fn() (setup() éventuel non compté), enregistre et renvoie le résumé.
+
+        Args:
+            name: Nom du cas
+            fn: Fonction sans argument à mesurer ; si elle renvoie un dict, il est ajouté au résumé
+            repeat: Nombre de mesures (défaut: self.repeat)
+            warmup: Passages non mesurés avant les mesures
+            setup: Fonction appelée avant chaque passage, hors chronomètre
+            extra: Valeurs ajoutées au résumé (taille, nombre de lignes...)
+        """
+        repeat = self.repeat if repeat is None else repeat
+        warmup = self.warmup if warmup is None else warmup
+        timings = []
+        details = {}
+        for iteration in range(warmup + repeat):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            returned = fn()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if iteration >= warmup:
+                timings.append(elapsed_ms)
+                if isinstance(returned, dict):
+                    details = returned
+        runs = np.asarray(timings)
+        summary = {
+            "median_ms": float(np.median(runs)),
+            "mean_ms": float(runs.mean()),
+            "p95_ms": float(np.percentile(runs, 95)),
+            "min_ms": float(runs.min()),
+            "max_ms": float(runs.max()),
+            "runs": len(timings),
+            **extra,
+            **details,
+        }
+        self.results[name] = summary
+        self.log(f"  {name:<48} médiane {summary['median_ms']:10.2f} ms   p95 {summary['p95_ms']:10.2f} ms")
+        return summary
+
+
+def bench_files(run: BenchmarkRun, work_dir: Path, joints: int, frame_counts: list, orders: list,
+                joint_positions: bool):
+    """Écriture, parse, métadonnées (cinématique + statistiques) et encodage de l'aperçu."""
+    template = VIEWER_TEMPLATE.read_text(encoding="utf-8") if VIEWER_TEMPLATE.exists() else None
+    for frames in frame_counts:
+        for order in orders:
+            label = f"{joints}j_{frames}f_{order}"
+            clip = synthetic_clip(joints, frames, rotation_order=order, joint_positions=joint_positions)
+            saved = {}
+
+            def write():
+                saved["file"] = save_clip(clip, work_dir, f"bench_{label}.bvh")
+                saved["file"].path.unlink()
+
+            run.measure(f"write/{label}", write)
+            path = save_clip(clip, work_dir, f"bench_{label}.bvh").path
+            size_mb = path.stat().st_size / 1024 ** 2
+            parse = run.measure(f"parse/{label}", lambda: parse_bvh(path), size_mb=round(size_mb, 2))
+            parse["mb_per_s"] = size_mb / (parse["median_ms"] / 1000)
+            parsed = parse_bvh(path)
+            run.measure(f"kinematics/{label}", lambda: analyze_clip(parsed))
+            run.measure(f"metadata/{label}", lambda: build_bvh_file_create(path, parsed))
+            for quantization in QUANTIZATIONS:
+                def preview():
+                    payload = encode_preview(parsed, quantization=quantization)
+                    html = render_viewer_html(template, payload) if template else payload.buffer_b64
+                    return {"payload_bytes": payload.size_bytes, "html_bytes": len(html)}
+
+                run.measure(f"preview/{quantization}/{label}", preview)
+            path.unlink()
+
+
+def bench_ingest(run: BenchmarkRun, engine, work_dir: Path, file_count: int, joints: int, frames: int,
+                 workers: int):
+    """Ingestion d'un répertoire de fichiers synthétiques (parse en parallèle + INSERT par lots)."""
+    from tools.ingest import ingest_directory
+
+    ingest_dir = work_dir / "ingest"
+    write_synthetic_files(ingest_dir, file_count, joint_count=joints, frame_count=frames)
+    prefix = str(ingest_dir.absolute())
+
+    def ingest():
+        stats = ingest_directory(engine, ingest_dir, workers=workers, cache_path=None, log=lambda message: None)
+        return {"inserted": stats["inserted"], "files_per_sec": stats["files_per_sec"]}
+
+    try:
+        run.measure(f"ingest/{file_count}files_{joints}j_{frames}f", ingest, warmup=0,
+                    setup=lambda: remove_synthetic_rows(engine, prefix))
+    finally:
+        remove_synthetic_rows(engine, prefix)
+
+
+def bench_update(run: BenchmarkRun, engine, rows: int, label: str):
+    """update_bvh_records_from_dataframe sur une page de lignes synthétiques."""
+    import pandas
+    from sqlalchemy import select
+    from tools.db_tools import BVHFile, update_bvh_records_from_dataframe
+
+    with engine.connect() as conn:
+        original = pandas.read_sql_query(
+            select(BVHFile).where(BVHFile.file_path.like(f"{BENCHMARK_PATH_PREFIX}%")).order_by(BVHFile.id).limit(rows),
+            conn,
+        )
+    state = {"round": 0}
+
+    def update():
+        # Valeurs différentes à chaque passage : toutes les lignes sont réellement modifiées
+        state["round"] += 1
+        edited = original.copy()
+        edited["description"] = edited["description"] + f" bench{state['round']}"
+        edited.loc[edited.index[::5], "animation_style"] = f"Bench{state['round']}"
+        updated, errors = update_bvh_records_from_dataframe(engine, edited, original)
+        return {"updated": updated, "errors": len(errors)}
+
+    run.measure(f"update/{len(original)}rows@{label}", update)
+
+
+def bench_catalog(run: BenchmarkRun, engine, label: str):
+    """Pages, comptage, recherche et facettes du catalogue."""
+    from sqlalchemy import select
+    from tools.catalog import CatalogFilters, count_catalog, fetch_catalog_page, search_facets
+    from tools.db_tools import BVHFile
+
+    with engine.connect() as conn:
+        total = conn.execute(select(BVHFile.id).order_by(BVHFile.id.desc()).limit(1)).scalar() or 0
+        # Curseur au milieu du tri par fps : coût d'une page "profonde"
+        middle = conn.execute(
+            select(BVHFile.fps, BVHFile.id).order_by(BVHFile.fps, BVHFile.id).offset(total // 2).limit(1)
+        ).first()
+
+    cases = {
+        "first_page": dict(filters=CatalogFilters()),
+        "sorted_fps_desc": dict(filters=CatalogFilters(), sort_by="fps", descending=True),
+        "deep_page_fps": dict(filters=CatalogFilters(), sort_by="fps", after=tuple(middle) if middle else None),
+        "filtered_style_gender": dict(filters=CatalogFilters(styles=("Walk", "Run"), genders=("F",))),
+        "search_common": dict(filters=CatalogFilters(search="walk")),
+        "search_rare": dict(filters=CatalogFilters(search="zombie reload aim")),
+        "motion_range": dict(filters=CatalogFilters(motion_ranges=(("activity", 1.5, None),))),
+    }
+    for name, options in cases.items():
+        run.measure(f"catalog/{name}@{label}", lambda options=options: {"rows": len(fetch_catalog_page(engine, **options)[0])})
+    for name, filters in {"count_all": CatalogFilters(), "count_filtered": CatalogFilters(styles=("Walk",)),
+                          "count_search": CatalogFilters(search="walk")}.items():
+        run.measure(f"catalog/{name}@{label}", lambda filters=filters: {"count": int(count_catalog(engine, filters)[0])})
+    run.measure(f"catalog/facets_search@{label}", lambda: {"groups": len(search_facets(engine, CatalogFilters(search="walk")))})
+
+
+def environment_info(engine=None) -> dict:
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    info = {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": git("rev-parse", "HEAD"),
+        "git_dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+    if engine is not None:
+        from sqlalchemy import text
+        with engine.connect() as conn:
+            info["postgres"] = conn.execute(text("SHOW server_version")).scalar()
+    return info
+
+
+def compare(previous: dict, current: dict, log=print):
+    """Affiche le rapport des médianes (courant / précédent) des cas présents dans les deux résultats."""
+    log(f"Comparaison avec {previous['meta'].get('git_commit') or '?'} ({previous['meta'].get('created_at')})")
+    for name, summary in current["results"].items():
+        before = previous["results"].get(name)
+        if before is None:
+            continue
+        ratio = summary["median_ms"] / before["median_ms"] if before["median_ms"] else float("inf")
+        flag = "⚠️ plus lent" if ratio > REGRESSION_RATIO else ("plus rapide" if ratio < 1 / REGRESSION_RATIO else "")
+        log(f"  {name:<48} {before['median_ms']:10.2f} -> {summary['median_ms']:10.2f} ms  x{ratio:5.2f}  {flag}")
+
+
+def _int_list(value: str) -> list:
+    return [int(item) for item in value.split(",") if item]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks sur données synthétiques")
+    parser.add_argument("--suites", default=",".join(SUITES), help=f"Suites à lancer parmi {', '.join(SUITES)}")
+    parser.add_argument("--joints", type=int, default=60, help="Nombre de joints des clips synthétiques")
+    parser.add_argument("--frames", type=_int_list, default=[1000, 10000], help="Nombres de frames, ex: 1000,10000")
+    parser.add_argument("--orders", default="ZXY,YXZ", help="Ordres des canaux de rotation, ex: ZXY,XYZ")
+    parser.add_argument("--joint-positions", action="store_true", help="Canaux de position sur tous les joints")
+    parser.add_argument("--catalog-rows", type=_int_list, default=[],
+                        help="Tailles de catalogue synthétique, ex: 10000,100000,1000000 (nécessite la base)")
+    parser.add_argument("--ingest-files", type=int, default=0, help="Fichiers ingérés par la suite ingest (0 = pas d'ingest)")
+    parser.add_argument("--update-rows", type=int, default=500, help="Lignes modifiées par la suite update")
+    parser.add_argument("--workers", type=int, default=None, help="Processus de la suite ingest (défaut: nombre de CPU)")
+    parser.add_argument("--repeat", type=int, default=5, help="Mesures par cas")
+    parser.add_argument("--out", type=Path, default=None, help="Fichier JSON des résultats")
+    parser.add_argument("--compare", type=Path, default=None, help="Résultat précédent à comparer")
+    parser.add_argument("--keep", action="store_true", help="Garde les lignes synthétiques du catalogue en base")
+    args = parser.parse_args(argv)
+
+    suites = set(args.suites.split(","))
+    needs_db = bool(args.catalog_rows) and bool(suites & {"update", "catalog"}) or (args.ingest_files and "ingest" in suites)
+    engine = None
+    if needs_db:
+        from tools.db_tools import get_postgis_connection
+        engine = get_postgis_connection()
+
+    run = BenchmarkRun(repeat=args.repeat)
+    params = {key: (str(value) if isinstance(value, Path) else value) for key, value in vars(args).items()}
+    with tempfile.TemporaryDirectory(prefix="bvh_bench_") as work_dir:
+        work_dir = Path(work_dir)
+        if "files" in suites:
+            print("Fichiers")
+            bench_files(run, work_dir, args.joints, args.frames, args.orders.split(","), args.joint_positions)
+        if engine is not None and args.ingest_files and "ingest" in suites:
+            print("Ingestion")
+            bench_ingest(run, engine, work_dir, args.ingest_files, args.joints, min(args.frames), args.workers)
+        if engine is not None and args.catalog_rows and suites & {"update", "catalog"}:
+            inserted = 0
+            try:
+                for size in sorted(args.catalog_rows):
+                    label = f"{size // 1000}k"
+                    print(f"Catalogue de {size} lignes synthétiques")
+                    run.measure(f"catalog/load@{label}", lambda: {"rows": insert_synthetic_catalog(
+                        engine, size - inserted, run_id=f"{label}", seed=size)}, repeat=1, warmup=0)
+                    inserted = size
+                    if "catalog" in suites:
+                        bench_catalog(run, engine, label)
+                    if "update" in suites:
+                        bench_update(run, engine, args.update_rows, label)
+            finally:
+                if not args.keep:
+                    print(f"{remove_synthetic_rows(engine)} ligne(s) synthétique(s) supprimée(s)")
+
+    result = {"meta": {**environment_info(engine), "params": params}, "results": run.results}
+    out = args.out
+    if out is None:
+        commit = (result["meta"]["git_commit"] or "nogit")[:7]
+        out = Path(DEFAULT_RESULTS_DIR) / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{commit}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, indent=2), encoding="utf-8")
+    print(f"Résultats écrits dans {out}")
+    if args.compare:
+        compare(json.loads(args.compare.read_text(encoding="utf-8")), result)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
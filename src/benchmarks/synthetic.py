@@ -0,0 +1,184 @@
+"""Données synthétiques pour les benchmarks : fichiers BVH et catalogues de lignes bvh.
+
+Les clips sont générés entièrement (hiérarchie, ordre des canaux, mouvement
+sinusoïdal régulier) puis écrits avec tools.clip_edit.write_bvh : ils passent
+par le même parser que les vraies captures.
+
+Les lignes de catalogue sont générées par colonnes avec NumPy et chargées par
+COPY ; leur file_path commence par BENCHMARK_PATH_PREFIX, ce qui permet de les
+retrouver et de les supprimer sans toucher aux vraies entrées.
+"""
+import io
+import math
+
+import numpy as np
+from sqlalchemy import Engine, text
+
+from tools.bvh_parser import BvhClip, BvhJoint
+from tools.clip_edit import save_clip
+from tools.motion_stats import STATS_VERSION
+
+BENCHMARK_PATH_PREFIX = "/benchmark/"
+
+STYLES = ["Walk", "Run", "Jump", "Dance", "Idle", "Combat", "Gesture"]
+SKELETON_TYPES = ["MIXAMO", "CUSTOM", "CMU", "BIPED"]
+GENDERS = ["M", "F", "Neutral", "Other"]
+DESCRIPTION_WORDS = (
+    "walk run jump turn idle zombie crouch sneak dance spin kick punch wave sit stand fall climb "
+    "slow fast loop left right forward backward happy tired injured strafe combo reload aim"
+).split()
+
+COPY_CHUNK_ROWS = 100_000
+CATALOG_COLUMNS = (
+    "original_filename", "file_path", "file_size_kb", "duration_seconds", "frame_count", "frame_time", "fps",
+    "skeleton_type", "bone_count", "has_fingers", "rest_pose_height", "animation_style", "description",
+    "actor_gender", "loopable", "content_hash",
+)
+
+
+def synthetic_skeleton(joint_count: int, rotation_order: str = "ZXY", joint_positions: bool = False,
+                       seed: int = 0) -> list:
+    """Hiérarchie de joint_count joints : une colonne et des membres en chaînes, feuilles avec End Site.
+
+    Args:
+        joint_count: Nombre de joints (racine comprise)
+        rotation_order: Ordre des canaux de rotation, ex: "ZXY", "YXZ"
+        joint_positions: Donne aussi des canaux de position à tous les joints (sinon seulement à la racine)
+        seed: Graine du générateur
+    """
+    rng = np.random.default_rng(seed)
+    rotations = [f"{axis.upper()}rotation" for axis in rotation_order]
+    positions = ["Xposition", "Yposition", "Zposition"]
+    # Chaînes de 3 à 6 joints partant de la racine ou d'un joint de la colonne
+    joints = [BvhJoint(name="Hips", parent=-1, offset=(0.0, 0.0, 0.0), channels=positions + rotations)]
+    spine = [0]
+    chain_parent, chain_length = 0, 0
+    for index in range(1, joint_count):
+        if chain_length == 0:
+            chain_parent = int(rng.choice(spine))
+            chain_length = int(rng.integers(3, 7))
+            parent = chain_parent
+        else:
+            parent = index - 1
+        chain_length -= 1
+        offset = tuple(float(v) for v in rng.normal(0.0, 4.0, 3).round(4))
+        channels = (positions if joint_positions else []) + rotations
+        joints.append(BvhJoint(name=f"Joint{index}", parent=parent, offset=offset, channels=channels))
+        if parent == 0 and len(spine) < 4:
+            spine.append(index)
+
+    parents = {joint.parent for joint in joints}
+    channel_start = 0
+    for index, joint in enumerate(joints):
+        joint.channel_start = channel_start
+        channel_start += len(joint.channels)
+        if index not in parents:
+            joint.end_site = (0.0, 3.0, 0.0)
+    return joints
+
+
+def synthetic_clip(joint_count: int = 60, frame_count: int = 1000, fps: float = 40.0, rotation_order: str = "ZXY",
+                   joint_positions: bool = False, seed: int = 0) -> BvhClip:
+    """Clip synthétique : rotations sinusoïdales par canal, racine qui avance en oscillant."""
+    rng = np.random.default_rng(seed)
+    joints = synthetic_skeleton(joint_count, rotation_order, joint_positions, seed)
+    channel_count = sum(len(joint.channels) for joint in joints)
+    frame_time = 1.0 / fps
+    t = np.arange(frame_count)[:, None] * frame_time
+    amplitude = rng.uniform(5.0, 45.0, channel_count)
+    frequency = rng.uniform(0.5, 2.0, channel_count)
+    phase = rng.uniform(0.0, 2 * math.pi, channel_count)
+    motion = amplitude * np.sin(2 * math.pi * frequency * t + phase)
+    # Canaux de position : petites oscillations, la racine avance selon Z
+    for joint in joints:
+        for i, name in enumerate(joint.channels):
+            if name.endswith("position"):
+                column = joint.channel_start + i
+                motion[:, column] = np.sin(2 * math.pi * frequency[column] * t[:, 0]) * 2.0
+    root_z = joints[0].channel_start + joints[0].channels.index("Zposition")
+    motion[:, root_z] += t[:, 0] * 100.0
+    return BvhClip(joints=joints, frame_count=frame_count, frame_time=frame_time, motion=motion.astype(np.float32))
+
+
+def write_synthetic_files(dest_dir, count: int, **clip_options) -> list:
+    """Écrit count fichiers synthétiques (graines différentes) dans dest_dir.
+
+    Returns:
+        La liste des chemins écrits
+    """
+    seed = clip_options.pop("seed", 0)
+    paths = []
+    for index in range(count):
+        clip = synthetic_clip(seed=seed + index, **clip_options)
+        paths.append(save_clip(clip, dest_dir, f"synthetic_{seed + index:06d}.bvh").path)
+    return paths
+
+
+def _catalog_chunk(start: int, count: int, run_id: str, rng) -> str:
+    """Bloc CSV de lignes bvh synthétiques (une ligne par clip)."""
+    index = np.arange(start, start + count)
+    fps = rng.choice([24.0, 30.0, 40.0, 60.0, 120.0], count)
+    frame_count = rng.integers(30, 20_000, count)
+    words = np.asarray(DESCRIPTION_WORDS)[rng.integers(0, len(DESCRIPTION_WORDS), (count, 6))]
+    descriptions = [" ".join(row) for row in words.tolist()]
+    columns = [
+        [f"clip_{i:07d}.bvh" for i in index],
+        [f"{BENCHMARK_PATH_PREFIX}{run_id}/clip_{i:07d}.bvh" for i in index],
+        rng.integers(50, 50_000, count),
+        (frame_count / fps).round(3),
+        frame_count,
+        (1.0 / fps).round(6),
+        fps,
+        np.asarray(SKELETON_TYPES)[rng.integers(0, len(SKELETON_TYPES), count)],
+        rng.integers(15, 80, count),
+        rng.random(count) < 0.3,
+        rng.uniform(150.0, 190.0, count).round(2),
+        np.asarray(STYLES)[rng.integers(0, len(STYLES), count)],
+        descriptions,
+        np.asarray(GENDERS)[rng.integers(0, len(GENDERS), count)],
+        rng.random(count) < 0.4,
+        [f"{value:064x}" for value in rng.integers(0, 2 ** 62, count).tolist()],
+    ]
+    return "".join(",".join(str(value) for value in row) + "\n" for row in zip(*(list(c) for c in columns)))
+
+
+def insert_synthetic_catalog(engine: Engine, rows: int, run_id: str = "catalog", seed: int = 0,
+                             with_motion_stats: bool = True) -> int:
+    """Charge rows lignes bvh synthétiques par COPY (et leurs statistiques de mouvement).
+
+    Returns:
+        Le nombre de lignes insérées
+    """
+    rng = np.random.default_rng(seed)
+    raw = engine.raw_connection()
+    try:
+        with raw.cursor() as cursor:
+            cursor.execute("SET LOCAL statement_timeout = 0")
+            for start in range(0, rows, COPY_CHUNK_ROWS):
+                chunk = _catalog_chunk(start, min(COPY_CHUNK_ROWS, rows - start), run_id, rng)
+                cursor.copy_expert(f"COPY bvh ({', '.join(CATALOG_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                                   io.StringIO(chunk))
+            if with_motion_stats:
+                cursor.execute(
+                    "INSERT INTO bvh_motion_stats (bvh_id, stats_version, root_speed_mean, root_speed_peak, "
+                    "travel_distance, displacement, vertical_range, activity) "
+                    "SELECT id, %s, s, s * (1 + random()), s * duration_seconds, s * duration_seconds * random(), "
+                    "random() * 0.4, random() * 2 FROM (SELECT id, duration_seconds, random() * 3 AS s "
+                    "FROM bvh WHERE file_path LIKE %s) synthetic",
+                    (STATS_VERSION, f"{BENCHMARK_PATH_PREFIX}{run_id}/%"),
+                )
+            cursor.execute("ANALYZE bvh")
+            cursor.execute("ANALYZE bvh_motion_stats")
+        raw.commit()
+    finally:
+        raw.close()
+    return rows
+
+
+def remove_synthetic_rows(engine: Engine, path_prefix: str = BENCHMARK_PATH_PREFIX) -> int:
+    """Supprime les lignes bvh dont le file_path commence par path_prefix (les statistiques suivent)."""
+    with engine.begin() as conn:
+        conn.execute(text("SET LOCAL statement_timeout = 0"))
+        return conn.execute(
+            text("DELETE FROM bvh WHERE file_path LIKE :pattern"), {"pattern": f"{path_prefix}%"}
+        ).rowcount
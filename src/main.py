@@ -1,38 +1,243 @@
-import base64
+import time
+import uuid
+from pathlib import Path
 
-import pandas
-import sqlalchemy
 import streamlit as st
 import streamlit_pydantic as sp
 import streamlit.components.v1 as components
 
-from models.BvhModels import BVHFileCreate, generate_random_bvh_file_create
+from tools.bvh_parser import parse_bvh_stream, BvhParseError
+from tools.preview import QUANTIZATIONS, encode_preview, render_viewer_html
+from tools.preview_cache import PreviewCache, preview_key
+from tools.bvh_reader import BvhFrameReader, slice_clip
 from tools.db_tools import (
-    save_bvh_file_to_db,
     get_postgis_connection,
-    BVHFile,
     update_bvh_records_from_dataframe,
-    delete_bvh_records
+    delete_bvh_records,
+    delete_bvh_records_and_files,
+    duplicate_bvh_records,
+    has_extension,
+    set_skeleton_type
+)
+from tools.database import get_metrics
+from tools.profiler import profiler
+from tools.ingest_queue import IngestQueue, STAGES
+from tools.catalog_sync import CatalogTracker
+from tools.file_catalog import FileCatalog, DEFAULT_DATA_DIR
+from tools.export import EXPORT_FORMATS, EXPORT_DOWNLOAD_MAX_BYTES, EXPORT_RETENTION, export_catalog
+from tools.metadata_cache import MetadataCache, stream_content_hash
+from tools.motion_stats import IDLE_ACTIVITY_THRESHOLD
+from tools.similarity import SimilarityIndex, similar_clips
+from tools.clip_edit import ClipEdit, process_edits
+from tools.catalog import (
+    CatalogFilters,
+    SORT_COLUMNS,
+    MOTION_STAT_COLUMNS,
+    fetch_catalog_page,
+    count_catalog,
+    get_filter_options,
+    search_facets
 )
 
 st.set_page_config(page_title="Motion Lab Operator Tools", layout="wide")
+
+# Profilage opt-in (PROFILING=1 ou page profiler) : sections nommées et requêtes SQL de ce rerun
+profiler.start_rerun("main", st.session_state.setdefault("profiler_session", uuid.uuid4().hex))
+
+# Nombre max de fichiers proposés dans la liste des exemples
+SAMPLE_SEARCH_LIMIT = 200
+
 st.title("🏃‍♂️ Motion Lab Operator Tools")
 
-def load_html_template(bvh_data=""):
+@st.cache_resource
+def load_html_template():
     """
-    Loads the external HTML file and injects the BVH data
-    into the placeholder string.
+    Loads the external HTML viewer template once per process.
+    The encoded preview is injected later by render_viewer_html.
     """
     with open("viewer.html", "r", encoding="utf-8") as f:
-        html_content = f.read()
+        return f.read()
+
+@st.cache_resource
+def get_preview_cache():
+    return PreviewCache()
 
-    # 1. Encode the BVH string to Base64 to avoid syntax errors
-    bvh_b64 = base64.b64encode(bvh_data.encode('utf-8')).decode('utf-8')
+def render_preview(bvh_source, height):
+    """Renders the 3D preview of a BVH file path or uploaded stream.
 
-    # 2. Inject the Base64 string
-    return html_content.replace("__BVH_BASE64_PLACEHOLDER__", bvh_b64)
+    The encoded payload is cached by content hash, so switching back
+    to an already previewed clip neither re-reads nor re-encodes it.
+    """
+    preview_cache = get_preview_cache()
+    with profiler.span("preview.hash"):
+        if isinstance(bvh_source, (str, Path)):
+            content_hash = preview_cache.hash_for_file(bvh_source)
+        else:
+            content_hash = stream_content_hash(bvh_source)
+            bvh_source.seek(0)
+
+    def build():
+        if isinstance(bvh_source, (str, Path)):
+            # Only the frames of the window (and 1 out of preview_decimate) are parsed
+            with BvhFrameReader(bvh_source, content_hash=content_hash) as reader:
+                start = int(round(preview_start / reader.frame_time))
+                stop = None if preview_end is None else int(round(preview_end / reader.frame_time))
+                clip = reader.clip(start, stop, preview_decimate)
+        else:
+            clip = parse_bvh_stream(bvh_source)
+            start = int(round(preview_start / clip.frame_time))
+            stop = None if preview_end is None else int(round(preview_end / clip.frame_time))
+            clip = slice_clip(clip, start, stop, preview_decimate)
+        if clip.frame_count == 0:
+            raise BvhParseError("aucune frame dans la fenêtre demandée")
+        return encode_preview(clip, quantization=preview_quantization)
+
+    try:
+        # Lecture du fichier et encodage seulement si l'aperçu n'est pas en cache
+        with profiler.span("preview.build"):
+            payload = preview_cache.get_or_build(
+                preview_key(content_hash, preview_decimate, preview_quantization, preview_start, preview_end), build
+            )
+    except BvhParseError as e:
+        st.error(f"❌ BVH invalide: {e}")
+        return
+    with profiler.span("preview.render"):
+        components.html(render_viewer_html(load_html_template(), payload), height=height)
+    st.caption(
+        f"Aperçu: {payload.size_bytes / 1024:.0f} Ko ({preview_quantization}, "
+        f"1 frame sur {preview_decimate}) - encodage {payload.encode_ms:.1f} ms"
+    )
 
-engine = get_postgis_connection()
+@st.cache_resource
+def get_metadata_cache():
+    return MetadataCache()
+
+@st.cache_data(ttl=300)
+def load_filter_options():
+    return get_filter_options(engine)
+
+# Le jeton de version du catalogue fait partie de la clé : toute modification invalide le cache
+@st.cache_data(ttl=300)
+def load_catalog_count(filters: CatalogFilters, change_token):
+    return count_catalog(engine, filters)
+
+@st.cache_data(ttl=300)
+def load_search_facets(filters: CatalogFilters, change_token):
+    return search_facets(engine, filters)
+
+@st.cache_data(ttl=300)
+def load_search_capabilities():
+    return has_extension(engine, "pg_trgm")
+
+FACET_LABELS = {"animation_style": "Style", "skeleton_type": "Type Squelette"}
+MOTION_STAT_LABELS = {
+    "root_speed_mean": "Vitesse moyenne (m/s)",
+    "root_speed_peak": "Vitesse de pointe (m/s)",
+    "travel_distance": "Distance parcourue (m)",
+    "vertical_range": "Amplitude verticale (m)",
+    "activity": "Activité (hauteurs/s)",
+}
+
+@st.cache_resource
+def get_ingest_queue():
+    return IngestQueue(get_postgis_connection(), get_metadata_cache(), Path(DEFAULT_DATA_DIR))
+
+@st.cache_resource
+def get_file_catalog():
+    return FileCatalog(DEFAULT_DATA_DIR)
+
+@st.cache_resource
+def get_catalog_tracker():
+    return CatalogTracker(get_postgis_connection())
+
+@st.cache_resource
+def get_similarity_index():
+    return SimilarityIndex(get_postgis_connection())
+
+@st.fragment(run_every=5.0)
+def catalog_change_notice():
+    # Modifications faites par d'autres opérateurs depuis le chargement de la page
+    page = st.session_state.get("catalog_page")
+    if page is not None and catalog_tracker.token() != page.token:
+        notice_col, refresh_col = st.columns([4, 1])
+        with notice_col:
+            st.info("🔔 Le catalogue a été modifié depuis l'affichage de cette page.")
+        with refresh_col:
+            if st.button("🔄 Actualiser"):
+                st.rerun(scope="app")
+
+def submit_ingest_job(job):
+    st.session_state.setdefault("ingest_jobs", []).append(job.id)
+    st.toast(f"⏳ '{job.filename}' ajouté à la file d'ingestion")
+
+def session_ingest_jobs():
+    jobs = (ingest_queue.get(job_id) for job_id in st.session_state.get("ingest_jobs", []))
+    return [job for job in jobs if job is not None][::-1]
+
+INGEST_STATUS_ICONS = {"queued": "⏳", "running": "⚙️", "done": "✅", "duplicate": "⚠️", "error": "❌"}
+
+def ingest_jobs_panel(polling: bool):
+    jobs = session_ingest_jobs()
+    if not jobs:
+        return
+    st.subheader("Ingestion en cours")
+    st.caption(f"File d'ingestion: {ingest_queue.queue_depth} job(s) en attente, "
+               f"{ingest_queue.active_count} en cours")
+    for job in jobs[:10]:
+        icon = INGEST_STATUS_ICONS[job.status]
+        if job.finished:
+            timings = ", ".join(f"{stage} {job.timings[stage]:.0f} ms" for stage in STAGES if stage in job.timings)
+            st.write(f"{icon} **{job.filename}** - {job.message}")
+            if timings:
+                st.caption(timings)
+        else:
+            st.progress(job.progress, text=f"{icon} {job.filename} - {job.stage or 'en attente'}")
+    last = jobs[0]
+    if last.finished and last.model is not None:
+        sp.pydantic_output(last.model)
+    stage_stats = ingest_queue.stage_stats()
+    if stage_stats:
+        st.caption("Moyennes: " + ", ".join(
+            f"{stage} {stats['avg_ms']:.0f} ms" for stage, stats in stage_stats.items()))
+    if polling and all(job.finished for job in jobs):
+        # Relance toute la page pour rafraîchir la liste des fichiers et le catalogue
+        file_catalog.invalidate()
+        catalog_tracker.invalidate()
+        st.rerun()
+
+with profiler.span("init"):
+    engine = get_postgis_connection()
+    profiler.watch(get_metrics(engine))
+    metadata_cache = get_metadata_cache()
+    ingest_queue = get_ingest_queue()
+    file_catalog = get_file_catalog()
+    catalog_tracker = get_catalog_tracker()
+    similarity_index = get_similarity_index()
+
+with profiler.span("sidebar"):
+    # Compromis qualité / taille de l'aperçu 3D
+    st.sidebar.subheader("Aperçu 3D")
+    preview_quantization = st.sidebar.selectbox("Quantification", QUANTIZATIONS)
+    preview_decimate = st.sidebar.slider("Garder 1 frame sur", min_value=1, max_value=8, value=1)
+    preview_start = st.sidebar.number_input("Début (s)", min_value=0.0, value=0.0, step=1.0)
+    preview_end = st.sidebar.number_input("Fin (s)", min_value=0.0, value=None, step=1.0)
+
+    cache_stats = metadata_cache.stats()
+    st.sidebar.caption(
+        f"Cache métadonnées: {cache_stats['entries']} entrée(s), "
+        f"{cache_stats['total_hits'] + cache_stats['total_hash_hits']} hit(s) / {cache_stats['total_misses']} miss"
+    )
+    preview_stats = get_preview_cache().stats()
+    st.sidebar.caption(
+        f"Cache aperçus: {preview_stats['entries']} entrée(s), "
+        f"{preview_stats['bytes'] / 1024 ** 2:.1f} / {preview_stats['max_bytes'] / 1024 ** 2:.0f} Mo, "
+        f"taux de hit {preview_stats['hit_rate']:.0%}"
+    )
+    sql_stats = get_metrics(engine).summary()
+    st.sidebar.caption(
+        f"SQL: {sql_stats['queries']} requête(s), moy. {sql_stats['avg_ms']:.1f} ms, "
+        f"p95 {sql_stats['p95_ms']:.1f} ms (voir la page test db)"
+    )
 
 tab1, tab2 = st.tabs(["View and Save BVH file to database", "Edit BVH Database Entries"])
 with tab1:
@@ -43,85 +248,53 @@ with tab1:
         st.subheader("1. Upload, preview and save a BVH file to the database")
         uploaded_file = st.file_uploader("Upload and preview a BVH file", type=["bvh"])
 
-        # Optionally, provide sample BVH files from a 'data' folder
-        from pathlib import Path
-        data_folder = Path("data")
+        # Optionally, provide sample BVH files from the data folder (DATA_DIR)
 
-        # Bouton pour sauvegarder le fichier uploadé dans le répertoire data
+        # Les fichiers sont écrits et enregistrés en arrière-plan par la file d'ingestion
         if uploaded_file is not None:
             col_save1, col_save2 = st.columns(2)
             with col_save1:
                 if st.button("💾 Sauvegarder le fichier dans data/", type="primary"):
-                    # Créer le répertoire data s'il n'existe pas
-                    data_folder.mkdir(exist_ok=True)
-
-                    # Définir le chemin du fichier
-                    file_path = data_folder / uploaded_file.name
-
-                    # Vérifier si le fichier existe déjà
-                    if file_path.exists():
-                        st.warning(f"⚠️ Le fichier '{uploaded_file.name}' existe déjà dans data/")
-                    else:
-                        # Sauvegarder le fichier
-                        with open(file_path, "wb") as f:
-                            f.write(uploaded_file.getbuffer())
-                        st.success(f"✅ Fichier '{uploaded_file.name}' sauvegardé dans {file_path}")
-                        st.rerun()
+                    submit_ingest_job(ingest_queue.submit_upload(uploaded_file.name, uploaded_file, register=False))
 
             with col_save2:
                 if st.button("💾📊 Sauvegarder + Ajouter à la DB", type="secondary"):
-                    # Créer le répertoire data s'il n'existe pas
-                    data_folder.mkdir(exist_ok=True)
-
-                    # Définir le chemin du fichier
-                    file_path = data_folder / uploaded_file.name
-
-                    # Sauvegarder le fichier
-                    with open(file_path, "wb") as f:
-                        f.write(uploaded_file.getbuffer())
-
-                    # Créer le modèle BVH et sauvegarder en DB
-                    try:
-                        new_bvh_model = generate_random_bvh_file_create(file_path)
-                        save_bvh_file_to_db(engine, new_bvh_model)
-                        st.success(f"✅ Fichier sauvegardé et ajouté à la base de données!")
-                        sp.pydantic_output(new_bvh_model)
-                        st.rerun()
-                    except Exception as e:
-                        st.error(f"❌ Erreur: {str(e)}")
-
-        if data_folder.exists():
-            bvh_files = [p for p in data_folder.iterdir() if p.is_file() and p.suffix.lower() == ".bvh"]
-            if bvh_files:
-                st.subheader("2. Or load a sample BVH file from the NAS and save to database")
-                selected_file = st.selectbox("Or select a sample BVH file", bvh_files)
-                new_bvh_model : BVHFileCreate = None
+                    submit_ingest_job(ingest_queue.submit_upload(uploaded_file.name, uploaded_file))
+
+        # Index persistant du dossier : pas de listing du NAS à chaque rerun
+        with profiler.span("files.refresh"):
+            file_catalog.refresh_if_due()
+        if len(file_catalog):
+            st.subheader("2. Or load a sample BVH file from the NAS and save to database")
+            search = st.text_input("Search sample files", placeholder="ex: walk cmu")
+            with profiler.span("files.search"):
+                matches = file_catalog.search(search, limit=SAMPLE_SEARCH_LIMIT)
+            st.caption(f"{len(matches)} / {len(file_catalog)} file(s) shown - "
+                       f"index refreshed {time.time() - file_catalog.last_refresh:.0f}s ago")
+            if st.button("🔄 Rescan data folder"):
+                file_catalog.refresh(full=True)
+                st.rerun()
+            selected_entry = st.selectbox("Or select a sample BVH file", matches,
+                                          format_func=lambda entry: entry.path)
+            if selected_entry is not None:
+                selected_file = file_catalog.absolute_path(selected_entry)
                 col1_1, col1_2 = st.columns(2, width="stretch")
                 with col1_1:
                     if st.button("Load Sample File"):
                         uploaded_file = open(selected_file, "rb")
                 with col1_2:
                     if st.button("Save Sample BVH File to Database", type="primary"):
-                        new_bvh_model : BVHFileCreate = generate_random_bvh_file_create(Path(selected_file))
-                        if save_bvh_file_to_db(engine, new_bvh_model):
-                            st.success(f"Sample BVH file '{selected_file.name}' saved to database.")
-                        else:
-                            st.error("Failed to save the sample BVH file to database.")
+                        submit_ingest_job(ingest_queue.submit_path(selected_file))
 
-                if new_bvh_model:
-                    sp.pydantic_output(new_bvh_model)
+        # Suivi des jobs de cette session (rafraîchi tant qu'un job est en cours)
+        polling = any(not job.finished for job in session_ingest_jobs())
+        st.fragment(ingest_jobs_panel, run_every=1.0 if polling else None)(polling)
 
     with col2:
         if uploaded_file is not None:
-            # Read file content as string
-            bvh_content = uploaded_file.read().decode("utf-8")
-
-            # 2. Inject into HTML Template
-            final_html = load_html_template(bvh_content)
-
-            # 3. Render the HTML component
+            # Parse, encode and render the preview
             # Height 600px gives enough room for the viewer
-            components.html(final_html, height=600)
+            render_preview(uploaded_file, height=600)
 
         else:
             st.info("Please upload or select a .bvh file to visualize.")
@@ -129,14 +302,143 @@ with tab1:
 with tab2:
     st.subheader("📊 Éditer les entrées BVH")
 
-    # Charger les données depuis la base
-    df = pandas.read_sql_query(
-        sql = sqlalchemy.select(BVHFile),
-        con = engine
+    # Recherche indexée (plein texte, + sous-chaîne / similarité si pg_trgm est installé)
+    trigram_search = load_search_capabilities()
+    search_query = st.text_input(
+        "🔍 Rechercher",
+        placeholder="mots de la description ou du nom de fichier, ex: zombie walk",
+        help="Recherche par préfixe de mots" + (" et par sous-chaîne / similarité du nom de fichier" if trigram_search else ""),
+    )
+
+    # Filtres et tri, appliqués côté base de données
+    with profiler.span("catalog.filter_options"):
+        filter_options = load_filter_options()
+    with st.expander("🔎 Filtres et tri", expanded=False):
+        fcol1, fcol2, fcol3 = st.columns(3)
+        with fcol1:
+            filter_styles = st.multiselect("Style", filter_options["styles"])
+            filter_skeletons = st.multiselect("Type Squelette", filter_options["skeleton_types"])
+            rigs = {rig.id: rig for rig in filter_options["skeletons"]}
+            filter_rigs = st.multiselect(
+                "Rig", list(rigs),
+                format_func=lambda rig_id: f"#{rig_id} {rigs[rig_id].skeleton_type or '?'} - "
+                                           f"{rigs[rig_id].joint_count} joints ({rigs[rig_id].clips} clip(s))",
+            )
+        with fcol2:
+            filter_genders = st.multiselect("Genre", ["M", "F", "Neutral", "Other"])
+            filter_loopable = st.selectbox("Loopable", ["Tous", "Oui", "Non"])
+        with fcol3:
+            fps_min = st.number_input("FPS min", min_value=0.0, value=None, step=1.0)
+            fps_max = st.number_input("FPS max", min_value=0.0, value=None, step=1.0)
+        # Statistiques de mouvement précalculées (table bvh_motion_stats)
+        mcol1, mcol2, mcol3, mcol4 = st.columns(4)
+        with mcol1:
+            filter_motion = st.selectbox("Mouvement", ["Tous", "Idle", "Actif"],
+                                         help=f"Idle : activité < {IDLE_ACTIVITY_THRESHOLD} hauteur de squelette par seconde")
+        with mcol2:
+            motion_stat = st.selectbox("Statistique", list(MOTION_STAT_COLUMNS),
+                                       format_func=MOTION_STAT_LABELS.get)
+        with mcol3:
+            motion_min = st.number_input("Min", value=None, step=0.1, key="motion_min")
+        with mcol4:
+            motion_max = st.number_input("Max", value=None, step=0.1, key="motion_max")
+        scol1, scol2, scol3 = st.columns(3)
+        with scol1:
+            sort_by = st.selectbox("Trier par", list(SORT_COLUMNS.keys()))
+        with scol2:
+            sort_descending = st.checkbox("Ordre décroissant")
+        with scol3:
+            page_size = st.selectbox("Lignes par page", [50, 100, 250, 500], index=1)
+        if len(filter_rigs) == 1:
+            # Le type est porté par le rig : le changer reclasse toutes ses captures
+            rig = rigs[filter_rigs[0]]
+            rcol1, rcol2 = st.columns([3, 1])
+            with rcol1:
+                rig_type = st.text_input("Type du rig", value=rig.skeleton_type or "", max_chars=50)
+            with rcol2:
+                if st.button("🏷️ Reclasser le rig", disabled=not rig_type.strip() or rig_type == rig.skeleton_type):
+                    updated_count = set_skeleton_type(engine, rig.id, rig_type.strip())
+                    st.toast(f"✅ Rig #{rig.id} reclassé en {rig_type.strip()} ({updated_count} capture(s))")
+                    load_filter_options.clear()
+                    catalog_tracker.invalidate()
+                    st.rerun()
+
+    motion_ranges = []
+    if filter_motion == "Idle":
+        motion_ranges.append(("activity", None, IDLE_ACTIVITY_THRESHOLD))
+    elif filter_motion == "Actif":
+        motion_ranges.append(("activity", IDLE_ACTIVITY_THRESHOLD, None))
+    if motion_min is not None or motion_max is not None:
+        motion_ranges.append((motion_stat, motion_min, motion_max))
+
+    catalog_filters = CatalogFilters(
+        styles=tuple(filter_styles),
+        skeleton_types=tuple(filter_skeletons),
+        skeleton_ids=tuple(filter_rigs),
+        genders=tuple(filter_genders),
+        fps_min=fps_min,
+        fps_max=fps_max,
+        loopable={"Tous": None, "Oui": True, "Non": False}[filter_loopable],
+        motion_ranges=tuple(motion_ranges),
+        search=search_query.strip() or None,
+        trigram=trigram_search,
     )
 
+    if catalog_filters.search:
+        # Répartition des résultats par style et type de squelette (une seule requête)
+        with profiler.span("catalog.facets"):
+            facets = load_search_facets(catalog_filters, catalog_tracker.token())
+        facet_cols = st.columns(len(facets))
+        for facet_col, (facet_name, counts) in zip(facet_cols, facets.items()):
+            with facet_col:
+                st.caption(f"**{FACET_LABELS[facet_name]}** : " + (", ".join(
+                    f"{value or '—'} ({count})" for value, count in list(counts.items())[:8]) or "aucun résultat"))
+
+    # Pile des curseurs keyset : cursors[i] = curseur de début de la page i
+    catalog_key = (catalog_filters, sort_by, sort_descending, page_size)
+    if st.session_state.get("catalog_key") != catalog_key:
+        st.session_state.catalog_key = catalog_key
+        st.session_state.catalog_cursors = [None]
+    cursors = st.session_state.catalog_cursors
+    page_index = len(cursors) - 1
+
+    # Page courante : gardée en session, relue seulement si le catalogue a changé
+    # (delta des lignes modifiées / supprimées, ou rechargement complet de la page)
+    with profiler.span("catalog.page"):
+        catalog_page, catalog_sync = catalog_tracker.refresh_page(
+            st.session_state.get("catalog_page"),
+            key=(catalog_key, cursors[-1]),
+            fetch=lambda: fetch_catalog_page(
+                engine, catalog_filters, sort_by, sort_descending, after=cursors[-1], limit=page_size
+            ),
+            filters=catalog_filters,
+            sort_by=sort_by,
+            page_size=page_size,
+        )
+    st.session_state.catalog_page = catalog_page
+    st.session_state.catalog_sync = catalog_sync
+    # Copie : l'éditeur ajoute une colonne au DataFrame affiché
+    df, next_cursor = catalog_page.df.copy(), catalog_page.next_cursor
+    with profiler.span("catalog.count"):
+        total_count, is_estimate = load_catalog_count(catalog_filters, catalog_page.token)
+
+    nav_col1, nav_col2, nav_col3 = st.columns([1, 1, 4])
+    with nav_col1:
+        if st.button("◀ Précédent", disabled=page_index == 0):
+            cursors.pop()
+            st.rerun()
+    with nav_col2:
+        if st.button("Suivant ▶", disabled=next_cursor is None):
+            cursors.append(next_cursor)
+            st.rerun()
+    with nav_col3:
+        st.caption(f"Page {page_index + 1} - {'~' if is_estimate else ''}{total_count} entrée(s) au total "
+                   f"- synchro: {catalog_sync['status']} ({catalog_sync['elapsed_ms']:.0f} ms)")
+
+    catalog_change_notice()
+
     if df.empty:
-        st.info("Aucune entrée dans la base de données.")
+        st.info("Aucune entrée ne correspond aux filtres." if not catalog_filters.is_empty() else "Aucune entrée dans la base de données.")
     else:
         st.info(f"📝 Vous pouvez éditer directement les cellules ci-dessous. Cliquez sur 'Sauvegarder les modifications' pour enregistrer dans la base de données.")
 
@@ -145,43 +447,49 @@ with tab2:
             df.insert(0, 'Sélectionner', False)
 
         # Colonnes non éditables
-        disabled_columns = ['id', 'uuid', 'uploaded_at']
-
-        # Éditeur de données
-        edited_df = st.data_editor(
-            df,
-            width="content",
-            num_rows="fixed",  # Pas d'ajout/suppression de lignes
-            disabled=disabled_columns,  # Colonnes en lecture seule
-            column_config={
-                "Sélectionner": st.column_config.CheckboxColumn(
-                    "✓",
-                    help="Sélectionner cette ligne pour les actions",
-                    default=False,
-                ),
-                "id": st.column_config.NumberColumn("ID", disabled=True),
-                "uuid": st.column_config.TextColumn("UUID", disabled=True),
-                "uploaded_at": st.column_config.DatetimeColumn("Date Upload", disabled=True),
-                "file_path": st.column_config.TextColumn("Chemin"),
-                "original_filename": st.column_config.TextColumn("Nom Fichier"),
-                "file_size_kb": st.column_config.NumberColumn("Taille (KB)"),
-                "duration_seconds": st.column_config.NumberColumn("Durée (s)", format="%.3f"),
-                "frame_count": st.column_config.NumberColumn("Nb Frames"),
-                "frame_time": st.column_config.NumberColumn("Frame Time", format="%.6f"),
-                "fps": st.column_config.NumberColumn("FPS", format="%.2f"),
-                "skeleton_type": st.column_config.TextColumn("Type Squelette"),
-                "bone_count": st.column_config.NumberColumn("Nb Os"),
-                "has_fingers": st.column_config.CheckboxColumn("Doigts"),
-                "rest_pose_height": st.column_config.NumberColumn("Hauteur (m)", format="%.2f"),
-                "animation_style": st.column_config.TextColumn("Style"),
-                "description": st.column_config.TextColumn("Description"),
-                "actor_gender": st.column_config.SelectboxColumn(
-                    "Genre",
-                    options=["M", "F", "Neutral", "Other"],
-                ),
-                "loopable": st.column_config.CheckboxColumn("Loopable"),
-            }
-        )
+        disabled_columns = ['id', 'uuid', 'uploaded_at', 'updated_at', 'skeleton_id']
+
+        # Éditeur de données (mesure la sérialisation côté serveur, pas le rendu dans le navigateur)
+        with profiler.span("catalog.editor"):
+            edited_df = st.data_editor(
+                df,
+                width="content",
+                num_rows="fixed",  # Pas d'ajout/suppression de lignes
+                disabled=disabled_columns,  # Colonnes en lecture seule
+                column_config={
+                    "Sélectionner": st.column_config.CheckboxColumn(
+                        "✓",
+                        help="Sélectionner cette ligne pour les actions",
+                        default=False,
+                    ),
+                    "id": st.column_config.NumberColumn("ID", disabled=True),
+                    "uuid": st.column_config.TextColumn("UUID", disabled=True),
+                    "uploaded_at": st.column_config.DatetimeColumn("Date Upload", disabled=True),
+                    "updated_at": st.column_config.DatetimeColumn("Modifié le", disabled=True),
+                    "file_path": st.column_config.TextColumn("Chemin"),
+                    "original_filename": st.column_config.TextColumn("Nom Fichier"),
+                    "file_size_kb": st.column_config.NumberColumn("Taille (KB)"),
+                    "duration_seconds": st.column_config.NumberColumn("Durée (s)", format="%.3f"),
+                    "frame_count": st.column_config.NumberColumn("Nb Frames"),
+                    "frame_time": st.column_config.NumberColumn("Frame Time", format="%.6f"),
+                    "fps": st.column_config.NumberColumn("FPS", format="%.2f"),
+                    "skeleton_id": st.column_config.NumberColumn("Rig", disabled=True),
+                    "skeleton_type": st.column_config.TextColumn("Type Squelette"),
+                    "bone_count": st.column_config.NumberColumn("Nb Os"),
+                    "has_fingers": st.column_config.CheckboxColumn("Doigts"),
+                    "rest_pose_height": st.column_config.NumberColumn(
+                        "Hauteur (m)", format="%.2f",
+                        help="Hauteur de la pose de repos, convertie en mètres depuis l'unité du fichier (m, cm ou mm)",
+                    ),
+                    "animation_style": st.column_config.TextColumn("Style"),
+                    "description": st.column_config.TextColumn("Description"),
+                    "actor_gender": st.column_config.SelectboxColumn(
+                        "Genre",
+                        options=["M", "F", "Neutral", "Other"],
+                    ),
+                    "loopable": st.column_config.CheckboxColumn("Loopable"),
+                }
+            )
 
         # Compter les lignes sélectionnées
         selected_rows = edited_df[edited_df['Sélectionner'] == True]
@@ -192,16 +500,19 @@ with tab2:
         st.caption(f"**{num_selected}** ligne(s) sélectionnée(s)")
 
         # Boutons d'action
-        action_col1, action_col2, action_col3, action_col4, action_col5 = st.columns(5)
+        action_col1, action_col2, action_col3, action_col4, action_col5, action_col6 = st.columns(6)
 
-        final_html = None
+        show_preview = False
         with action_col1:
             if st.button("👁️ Preview BVH", type="secondary", width="content", disabled=(num_selected == 0 or num_selected > 1)):
-                if num_selected == 1:
-                    with st.spinner("Chargement du BVH..."):
-                        with open(selected_rows.iloc[0].file_path, "r", encoding="utf-8") as f:
-                            bvh_content = f.read()
-                            final_html = load_html_template(bvh_content)
+                show_preview = num_selected == 1
+
+        show_similar = False
+        with action_col6:
+            similar_count = st.number_input("Nombre de résultats", min_value=1, max_value=100, value=10,
+                                            label_visibility="collapsed")
+            if st.button("🧭 Mouvements similaires", type="secondary", width="content", disabled=(num_selected != 1)):
+                show_similar = num_selected == 1
 
 
         with action_col2:
@@ -210,7 +521,9 @@ with tab2:
                     try:
                         # Enlever la colonne de sélection avant de sauvegarder
                         df_to_save = edited_df.drop(columns=['Sélectionner'])
-                        updated_count, errors = update_bvh_records_from_dataframe(engine, df_to_save)
+                        # Seules les cellules différentes du chargement initial sont envoyées
+                        original_df = df.drop(columns=['Sélectionner'])
+                        updated_count, errors = update_bvh_records_from_dataframe(engine, df_to_save, original_df)
 
                         if errors:
                             st.warning(f"⚠️ {updated_count} ligne(s) mise(s) à jour avec {len(errors)} erreur(s):")
@@ -218,38 +531,129 @@ with tab2:
                                 st.error(error)
                         else:
                             st.success(f"✅ {updated_count} ligne(s) mise(s) à jour avec succès!")
+                            catalog_tracker.invalidate()
                             st.rerun()
 
                     except Exception as e:
                         st.error(f"❌ Erreur lors de la sauvegarde: {str(e)}")
 
         with action_col3:
+            remove_orphans = st.checkbox("Effacer aussi les fichiers orphelins", value=False,
+                                         help="Supprime du disque les .bvh / .bvha qui ne sont plus référencés")
             if st.button("🗑️ Supprimer sélection", type="secondary", width="content", disabled=(num_selected == 0)):
                 if num_selected > 0:
                     ids_to_delete = selected_rows['id'].tolist()
-                    deleted_count = delete_bvh_records(engine, ids_to_delete)
-                    st.success(f"✅ {deleted_count} ligne(s) supprimée(s)!")
-                    st.rerun()
+                    try:
+                        if remove_orphans:
+                            deleted_count, removed_files = delete_bvh_records_and_files(engine, ids_to_delete)
+                            st.toast(f"✅ {deleted_count} ligne(s) supprimée(s), {removed_files} fichier(s) orphelin(s) effacé(s)")
+                            file_catalog.invalidate()
+                        else:
+                            deleted_count = delete_bvh_records(engine, ids_to_delete)
+                            st.toast(f"✅ {deleted_count} ligne(s) supprimée(s)!")
+                        catalog_tracker.invalidate()
+                        st.rerun()
+                    except Exception as e:
+                        st.error(f"❌ Erreur lors de la suppression: {str(e)}")
 
         with action_col4:
             if st.button("📋 Dupliquer sélection", type="secondary", width="content", disabled=(num_selected == 0)):
                 if num_selected > 0:
-                    st.info(f"Fonctionnalité de duplication en développement pour {num_selected} ligne(s)")
+                    try:
+                        new_ids = duplicate_bvh_records(engine, selected_rows['id'].tolist())
+                        st.toast(f"✅ {len(new_ids)} ligne(s) dupliquée(s)")
+                        catalog_tracker.invalidate()
+                        st.rerun()
+                    except Exception as e:
+                        st.error(f"❌ Erreur lors de la duplication: {str(e)}")
 
         with action_col5:
-            if st.button("📊 Exporter CSV", type="secondary", width="content"):
-                csv = edited_df.drop(columns=['Sélectionner']).to_csv(index=False)
-                st.download_button(
-                    label="⬇️ Télécharger",
-                    data=csv,
-                    file_name="bvh_export.csv",
-                    mime="text/csv",
-                    width="content"
-                )
-
-        if final_html:
+            export_format = st.selectbox("Format d'export", EXPORT_FORMATS, label_visibility="collapsed")
+            if st.button("📊 Exporter", type="secondary", width="content"):
+                # Export de tout le catalogue filtré (pas seulement la page affichée), en flux depuis la base
+                with st.spinner("Export en cours..."), profiler.span("export.catalog"):
+                    try:
+                        export = export_catalog(engine, catalog_filters, export_format, sort_by, sort_descending)
+                    except Exception as e:
+                        export = None
+                        st.error(f"❌ Erreur lors de l'export: {str(e)}")
+                if export is not None:
+                    st.caption(f"{export.rows} ligne(s), {export.size_bytes / 1024 ** 2:.1f} Mo "
+                               f"en {export.elapsed_ms / 1000:.1f} s")
+                    if export.size_bytes <= EXPORT_DOWNLOAD_MAX_BYTES:
+                        # Lu seulement au clic : le fichier ne reste pas en mémoire pour la session
+                        st.download_button(
+                            label="⬇️ Télécharger",
+                            data=export.path.read_bytes,
+                            file_name=export.path.name,
+                            mime="text/csv" if export_format == "csv" else "application/vnd.apache.parquet",
+                            on_click="ignore",
+                            width="content"
+                        )
+                    else:
+                        st.info(f"Fichier trop volumineux pour le navigateur, disponible sur le serveur "
+                                f"pendant {EXPORT_RETENTION.total_seconds() / 60:.0f} min: {export.path}")
+
+        with st.expander("✂️ Découper / rééchantillonner la sélection", expanded=False):
+            st.caption("Crée un nouveau fichier par ligne sélectionnée et l'ajoute à la base.")
+            ecol1, ecol2, ecol3, ecol4 = st.columns(4)
+            with ecol1:
+                edit_start = st.number_input("Première frame", min_value=0, value=0, step=1)
+            with ecol2:
+                edit_stop = st.number_input("Frame de fin (exclue)", min_value=1, value=None, step=1)
+            with ecol3:
+                edit_fps = st.selectbox("Fréquence", [None, 24, 25, 30, 60, 120],
+                                        format_func=lambda fps: "inchangée" if fps is None else f"{fps} fps")
+            with ecol4:
+                if st.button("✂️ Créer les clips", disabled=(num_selected == 0)):
+                    edits = [ClipEdit(path, int(edit_start), None if edit_stop is None else int(edit_stop), edit_fps)
+                             for path in selected_rows['file_path']]
+                    with st.spinner(f"Traitement de {len(edits)} fichier(s)..."), profiler.span("clip_edit.process"):
+                        edit_stats = process_edits(edits, engine=engine, log=lambda message: None)
+                    for path, error in edit_stats["failures"]:
+                        st.error(f"❌ {Path(path).name}: {error}")
+                    if edit_stats["registered"]:
+                        st.toast(f"✅ {edit_stats['registered']} clip(s) créé(s) en {edit_stats['elapsed']:.1f} s")
+                        file_catalog.invalidate()
+                        catalog_tracker.invalidate()
+                        st.rerun()
+                    elif not edit_stats["failures"]:
+                        st.info("Ces clips existent déjà dans la base.")
+
+        if show_similar:
+            reference_id = int(selected_rows.iloc[0].id)
+            with profiler.span("similar.refresh"):
+                similarity_index.refresh_if_due()
+            if reference_id not in similarity_index:
+                st.warning("⚠️ Pas de descripteur de mouvement pour cette entrée "
+                           "(lancer `python -m tools.ingest --backfill-stats`).")
+            else:
+                with profiler.span("similar.query"):
+                    similar_df = similar_clips(engine, similarity_index, reference_id, similar_count)
+                st.caption(f"Plus proches de **{selected_rows.iloc[0].original_filename}** parmi "
+                           f"{len(similarity_index)} clip(s), recherche en {similarity_index.last_query_ms:.1f} ms")
+                st.dataframe(similar_df, hide_index=True, column_config={
+                    "original_filename": "Nom du fichier",
+                    "animation_style": "Style",
+                    "skeleton_type": "Type Squelette",
+                    "duration_seconds": st.column_config.NumberColumn("Durée (s)", format="%.2f"),
+                    "distance": st.column_config.NumberColumn("Distance", format="%.3f"),
+                })
+
+        if show_preview:
             col1, col2 = st.columns(2)
             with col1:
-                components.html(final_html, height=500)
+                with st.spinner("Chargement du BVH..."):
+                    render_preview(selected_rows.iloc[0].file_path, height=500)
             with col2:
-                selected_rows.iloc[0]
\ No newline at end of file
+                selected_rows.iloc[0]
+
+if profiler.enabled:
+    # Le rerun courant n'est pas terminé : résumé du précédent de cette session
+    last_rerun = profiler.last_rerun("main", st.session_state.profiler_session)
+    if last_rerun is not None:
+        st.sidebar.caption(
+            f"⏱️ Rerun précédent: {last_rerun.total_ms:.0f} ms, {last_rerun.sql_count} requête(s) SQL "
+            f"({last_rerun.sql_ms:.0f} ms) - détail sur la page profiler"
+        )
+profiler.finish_rerun()
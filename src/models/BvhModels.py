@@ -1,16 +1,11 @@
 import enum
-import random
 import uuid
 from datetime import datetime
-from pathlib import Path
-
-from faker import Faker
 
 from pydantic import Field, ConfigDict, BaseModel
 
 from sqlalchemy.orm import declarative_base
 
-fake = Faker()
 Base = declarative_base()
 
 # 1. Définition de l'Enum pour le genre (pour la validation stricte)
@@ -49,6 +44,14 @@ class BVHFileCreate(BVHFileBase):
     # Le file_path est souvent généré par le backend après l'upload,
     # mais si votre script d'analyse le fournit, on le met ici.
     file_path: str = Field(..., max_length=512)
+    # Hash du contenu (sha256), utilisé pour dédoublonner les captures
+    content_hash: str = Field(None, max_length=64)
+    # Hiérarchie canonique du squelette et son hash (voir tools.skeletons) :
+    # à l'insertion, elle est remplacée par une référence vers la table skeletons
+    skeleton_hash: str = Field(None, max_length=64)
+    skeleton_definition: str = None
+    # Statistiques de mouvement (voir tools.motion_stats), stockées dans bvh_motion_stats
+    motion_stats: dict = None
 
 # 3. READ : Ce que l'API renvoie (Output)
 class BVHFileRead(BVHFileBase):
@@ -56,40 +59,8 @@ class BVHFileRead(BVHFileBase):
     uuid: uuid.UUID
     file_path: str # On renvoie le chemin (ou une URL signée dans une vraie app)
     uploaded_at: datetime
+    updated_at: datetime = None
 
     # CONFIGURATION CRUCIALE POUR ORM
     # Permet à Pydantic de lire directement l'objet SQLAlchemy
     model_config = ConfigDict(from_attributes=True)
-
-def generate_random_bvh_file_create(path : Path) -> BVHFileCreate:
-    """Génère un objet BVHFileCreate avec des valeurs aléatoires.
-    :param path:
-    """
-
-    animation_styles = ["Walk", "Run", "Jump", "Dance", "Idle", "Combat", "Gesture"]
-    skeleton_types = ["MIXAMO", "CUSTOM", "CMU", "BIPED"]
-
-    return BVHFileCreate(
-        # Nom de fichier
-        original_filename=path.name,
-        file_path=str(path.absolute()),
-
-        # Infos techniques
-        file_size_kb=random.randint(50, 5000),
-        duration_seconds=round(random.uniform(1.0, 60.0), 3),
-        frame_count=random.randint(30, 1800),
-        frame_time=round(random.uniform(0.008, 0.033), 6),
-        fps=round(random.uniform(24.0, 120.0), 2),
-
-        # Structure
-        skeleton_type=random.choice(skeleton_types),
-        bone_count=random.randint(15, 80),
-        has_fingers=random.choice([True, False]),
-        rest_pose_height=round(random.uniform(1.5, 2.0), 2),
-
-        # Contenu
-        animation_style=random.choice(animation_styles),
-        description=fake.sentence(nb_words=10),
-        actor_gender=random.choice(list(GenderEnum)),
-        loopable=random.choice([True, False])
-    )
\ No newline at end of file
@@ -0,0 +1,63 @@
+import pandas as pd
+import streamlit as st
+
+from tools.profiler import profiler
+
+st.set_page_config(layout="wide")
+st.title("⏱️ Profiler")
+
+# Réglage du processus : s'applique à toutes les sessions
+enabled = st.toggle("Profiler les reruns de la page principale", value=profiler.enabled,
+                    help="Variable PROFILING=1 pour l'activer au démarrage")
+if enabled != profiler.enabled:
+    profiler.enabled = enabled
+    st.rerun()
+st.caption(f"Export: {profiler.log_path or 'désactivé (PROFILE_LOG vide)'} - "
+           f"{len(profiler.history())} rerun(s) en mémoire")
+
+session = st.session_state.get("profiler_session")
+last_rerun = profiler.last_rerun("main", session) if session else None
+
+st.subheader("Dernier rerun de cette session")
+if last_rerun is None:
+    st.info("Aucun rerun profilé : activer le profilage puis interagir avec la page principale.")
+else:
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Durée (ms)", f"{last_rerun.total_ms:.0f}")
+    col2.metric("Requêtes SQL", last_rerun.sql_count)
+    col3.metric("SQL (ms)", f"{last_rerun.sql_ms:.1f}")
+    col4.metric("Statut", "complet" if last_rerun.status == "complete" else "interrompu")
+    spans = pd.DataFrame([
+        {
+            "section": " " * span.depth + span.name,
+            "début_ms": round(span.start_ms, 1),
+            "durée_ms": round(span.duration_ms, 1),
+            "part": span.duration_ms / last_rerun.total_ms if last_rerun.total_ms else 0.0,
+            "sql": span.sql_count,
+            "sql_ms": round(span.sql_ms, 1),
+        }
+        for span in last_rerun.spans
+    ])
+    # Temps passé hors des sections de premier niveau (rendu des widgets, code non instrumenté)
+    covered_ms = sum(span.duration_ms for span in last_rerun.spans if span.depth == 0)
+    st.caption(f"Hors sections: {max(last_rerun.total_ms - covered_ms, 0.0):.0f} ms")
+    st.dataframe(spans, width="stretch", hide_index=True, column_config={
+        "part": st.column_config.ProgressColumn("Part du rerun", format="percent", min_value=0.0, max_value=1.0),
+    })
+
+st.subheader("Historique (toutes sessions)")
+percentiles = pd.DataFrame(profiler.span_percentiles("main"))
+if percentiles.empty:
+    st.info("Pas encore d'historique.")
+else:
+    st.caption("Durée cumulée par rerun de chaque section ; sql et sql_ms sont des moyennes par rerun.")
+    st.dataframe(percentiles.round(1), width="stretch", hide_index=True)
+    history = profiler.history("main")
+    st.line_chart(pd.DataFrame({
+        "durée_ms": [profile.total_ms for profile in history[::-1]],
+        "sql_ms": [profile.sql_ms for profile in history[::-1]],
+    }))
+
+if st.button("Vider l'historique"):
+    profiler.reset()
+    st.rerun()
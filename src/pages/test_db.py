@@ -1,9 +1,11 @@
-import os
-
+import pandas as pd
 import streamlit as st
 from pydantic import BaseModel, ConfigDict
-from sqlalchemy import create_engine, Column, Integer, String, URL
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import Column, Integer, String
+from sqlalchemy.orm import declarative_base
+
+from tools.database import get_metrics, session_scope
+from tools.db_tools import get_postgis_connection
 
 st.set_page_config(layout="wide")
 st.title("🏃‍♂️ Test database")
@@ -23,16 +25,14 @@ class User(Base):
     name = Column(String)
     email = Column(String)
 
-db_url = URL.create(
-    "postgresql",
-    username=os.getenv('POSTGRES_USER'),
-    password=os.getenv('POSTGRES_PASSWORD'),
-    host=os.getenv('POSTGRES_HOST'),
-    port=os.getenv('POSTGRES_PORT'),
-    database=os.getenv('POSTGRES_DB'),
-)
-engine = create_engine(db_url)
-Base.metadata.create_all(engine)
+@st.cache_resource
+def init_test_schema():
+    """Moteur partagé avec main.py ; la table users n'est créée qu'une fois."""
+    engine = get_postgis_connection()
+    Base.metadata.create_all(engine)
+    return engine
+
+engine = init_test_schema()
 
 with st.form("my_form"):
     st.write("Inside the form")
@@ -45,11 +45,32 @@ st.write(my_number)
 st.write(my_color)
 
 if st.button("Add test user to database"):
-    Session = sessionmaker(bind=engine)
-    session = Session()
-    new_user = User(name="John Doe", email="john.doe@example.com")
-    session.add(new_user)
-    session.query()
-    session.commit()
-    session.close()
-    st.success("Added test user to database")
\ No newline at end of file
+    with session_scope(engine) as session:
+        new_user = User(name="John Doe", email="john.doe@example.com")
+        session.add(new_user)
+    st.success("Added test user to database")
+
+# Métriques des requêtes SQL de ce processus Streamlit
+st.subheader("SQL metrics")
+metrics = get_metrics(engine)
+summary = metrics.summary()
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("Queries", summary["queries"])
+col2.metric("Avg (ms)", f"{summary['avg_ms']:.1f}")
+col3.metric("p95 (ms)", f"{summary['p95_ms']:.1f}")
+col4.metric("Rows", summary["rows"])
+st.caption(f"Pool: {engine.pool.status()}")
+
+recent = pd.DataFrame([
+    {
+        "statement": " ".join(stat.statement.split())[:200],
+        "duration_ms": round(stat.duration_ms, 2),
+        "rowcount": stat.rowcount,
+        "executemany": stat.executemany,
+    }
+    for stat in metrics.recent(200)
+])
+st.dataframe(recent, width="stretch", hide_index=True)
+if st.button("Reset metrics"):
+    metrics.reset()
+    st.rerun()
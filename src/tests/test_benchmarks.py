@@ -0,0 +1,52 @@
+import csv
+import io
+
+import numpy as np
+import pytest
+
+from benchmarks.run import BenchmarkRun, compare
+from benchmarks.synthetic import (
+    BENCHMARK_PATH_PREFIX, CATALOG_COLUMNS, _catalog_chunk, synthetic_clip, write_synthetic_files
+)
+from tools.bvh_parser import parse_bvh
+
+
+@pytest.mark.parametrize("order, joint_positions", [("ZXY", False), ("XYZ", True)])
+def test_synthetic_files_parse_back(tmp_path, order, joint_positions):
+    (path,) = write_synthetic_files(tmp_path, 1, joint_count=20, frame_count=50, rotation_order=order,
+                                    joint_positions=joint_positions)
+    clip = parse_bvh(path)
+    expected = synthetic_clip(joint_count=20, frame_count=50, rotation_order=order, joint_positions=joint_positions)
+
+    assert len(clip.joints) == 20
+    assert clip.joints[1].channels[-3:] == [f"{axis}rotation" for axis in order]
+    assert (len(clip.joints[1].channels) == 6) == joint_positions
+    np.testing.assert_allclose(clip.motion, expected.motion, atol=1e-5)
+
+
+def test_catalog_chunk_is_one_csv_row_per_clip():
+    rows = list(csv.reader(io.StringIO(_catalog_chunk(10, 25, "run", np.random.default_rng(0)))))
+    assert len(rows) == 25
+    assert all(len(row) == len(CATALOG_COLUMNS) for row in rows)
+    paths = [row[CATALOG_COLUMNS.index("file_path")] for row in rows]
+    assert paths[0] == f"{BENCHMARK_PATH_PREFIX}run/clip_0000010.bvh"
+    assert len(set(paths)) == 25
+
+
+def test_measure_skips_warmup_and_setup():
+    calls = []
+    run = BenchmarkRun(repeat=3, warmup=2, log=lambda *_: None)
+    summary = run.measure("suite/case", lambda: calls.append("fn") or {"rows": 7},
+                          setup=lambda: calls.append("setup"), size=1)
+    assert calls == ["setup", "fn"] * 5
+    assert summary["runs"] == 3 and summary["rows"] == 7 and summary["size"] == 1
+    assert run.results["suite/case"] is summary
+
+
+def test_compare_flags_slower_cases():
+    lines = []
+    previous = {"meta": {"git_commit": "abc"}, "results": {"a": {"median_ms": 10.0}, "b": {"median_ms": 10.0}}}
+    current = {"results": {"a": {"median_ms": 12.0}, "b": {"median_ms": 10.5}, "new": {"median_ms": 1.0}}}
+    compare(previous, current, log=lines.append)
+    assert "plus lent" in lines[1] and "plus lent" not in lines[2]
+    assert len(lines) == 3
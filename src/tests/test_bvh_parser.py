@@ -0,0 +1,72 @@
+import io
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from tools import bvh_parser
+from tools.bvh_parser import BvhParseError, parse_bvh, parse_bvh_stream
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+
+SMALL_BVH = b"""HIERARCHY
+ROOT Hips
+{
+\tOFFSET 0.0 0.0 0.0
+\tCHANNELS 6 Xposition Yposition Zposition Zrotation Xrotation Yrotation
+\tJOINT Spine
+\t{
+\t\tOFFSET 0.0 10.0 0.0
+\t\tCHANNELS 3 Zrotation Xrotation Yrotation
+\t\tEnd Site
+\t\t{
+\t\t\tOFFSET 0.0 5.0 0.0
+\t\t}
+\t}
+}
+MOTION
+Frames: 2
+Frame Time: 0.033333
+1 2 3 4 5 6 7 8 9
+-1 -2 -3 -4 -5 -6 -7 -8 -9.5
+"""
+
+
+def test_small_clip_hierarchy_and_motion():
+    clip = parse_bvh_stream(io.BytesIO(SMALL_BVH))
+    assert clip.joint_names == ["Hips", "Spine"]
+    assert [j.parent for j in clip.joints] == [-1, 0]
+    assert clip.joints[1].channel_start == 6
+    assert clip.joints[1].end_site == (0.0, 5.0, 0.0)
+    assert clip.motion.dtype == np.float32
+    assert clip.motion.shape == (2, 9)
+    assert clip.motion[1, -1] == pytest.approx(-9.5)
+
+
+def test_crlf_line_endings_give_the_same_clip():
+    lf = parse_bvh_stream(io.BytesIO(SMALL_BVH))
+    crlf = parse_bvh_stream(io.BytesIO(SMALL_BVH.replace(b"\n", b"\r\n")))
+    assert crlf.joint_names == lf.joint_names
+    np.testing.assert_array_equal(crlf.motion, lf.motion)
+
+
+def test_stream_read_in_small_chunks_matches_file_parse(monkeypatch):
+    path = DATA_DIR / "A_test.bvh"
+    from_file = parse_bvh(path)
+    # Des blocs minuscules coupent des nombres à chaque lecture
+    monkeypatch.setattr(bvh_parser, "MOTION_CHUNK_SIZE", 37)
+    from_stream = parse_bvh_stream(io.BytesIO(path.read_bytes()))
+    np.testing.assert_array_equal(from_stream.motion, from_file.motion)
+
+
+def test_header_only_parse_skips_motion():
+    clip = parse_bvh_stream(io.BytesIO(SMALL_BVH), with_motion=False)
+    assert clip.motion is None
+    assert clip.frame_count == 2
+    assert SMALL_BVH[clip.motion_offset:].startswith(b"1 2 3")
+
+
+def test_truncated_motion_is_rejected():
+    truncated = SMALL_BVH.rsplit(b"\n", 2)[0] + b"\n"
+    with pytest.raises(BvhParseError):
+        parse_bvh_stream(io.BytesIO(truncated))
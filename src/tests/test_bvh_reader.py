@@ -0,0 +1,83 @@
+import os
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from tools import bvh_reader
+from tools.bvh_parser import parse_bvh
+from tools.bvh_reader import BvhFrameReader
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+
+
+@pytest.fixture(scope="module")
+def full_clip():
+    return parse_bvh(DATA_DIR / "A_test.bvh")
+
+
+@pytest.mark.parametrize("start, stop, step", [(0, None, 1), (10, 50, 1), (5, 200, 7), (-20, None, 3), (40, 40, 1)])
+def test_frames_match_the_full_parse(tmp_path, full_clip, start, stop, step):
+    with BvhFrameReader(DATA_DIR / "A_test.bvh", index_dir=tmp_path) as reader:
+        np.testing.assert_array_equal(reader.frames(start, stop, step), full_clip.motion[start:stop:step])
+
+
+def test_index_is_persisted_and_reused(tmp_path, full_clip, monkeypatch):
+    with BvhFrameReader(DATA_DIR / "A_test.bvh", index_dir=tmp_path) as reader:
+        offsets = reader.line_offsets
+    assert len(list(tmp_path.glob("*.npy"))) == 1
+
+    def fail(self):
+        raise AssertionError("l'index aurait dû être relu depuis le disque")
+    monkeypatch.setattr(BvhFrameReader, "_build_index", fail)
+    with BvhFrameReader(DATA_DIR / "A_test.bvh", index_dir=tmp_path) as reader:
+        np.testing.assert_array_equal(reader.line_offsets, offsets)
+        np.testing.assert_array_equal(reader.frames(3, 9), full_clip.motion[3:9])
+
+
+def test_index_scan_across_chunk_boundaries(tmp_path, full_clip, monkeypatch):
+    monkeypatch.setattr(bvh_reader, "SCAN_CHUNK_SIZE", 4096)
+    with BvhFrameReader(DATA_DIR / "A_test.bvh", index_dir=None) as reader:
+        np.testing.assert_array_equal(reader.frames(), full_clip.motion)
+
+
+def test_crlf_file(tmp_path, full_clip):
+    path = tmp_path / "crlf.bvh"
+    path.write_bytes((DATA_DIR / "A_test.bvh").read_bytes().replace(b"\r\n", b"\n").replace(b"\n", b"\r\n"))
+    with BvhFrameReader(path, index_dir=None) as reader:
+        np.testing.assert_array_equal(reader.frames(1, 30, 2), full_clip.motion[1:30:2])
+
+
+def test_clip_keeps_the_frame_time_of_the_step(full_clip):
+    with BvhFrameReader(DATA_DIR / "A_test.bvh", index_dir=None) as reader:
+        clip = reader.clip(0, 100, 4)
+    assert clip.frame_count == 25
+    assert clip.frame_time == pytest.approx(full_clip.frame_time * 4)
+
+
+def test_index_is_named_after_the_content_hash(tmp_path):
+    index_dir = tmp_path / "index"
+    with BvhFrameReader(DATA_DIR / "A_test.bvh", index_dir=index_dir, content_hash="abc123"):
+        pass
+    assert [p.name for p in index_dir.iterdir()] == ["abc123.npy"]
+
+    assert bvh_reader.remove_frame_indexes(["abc123", "absent"], index_dir) == 1
+    assert list(index_dir.iterdir()) == []
+
+
+def test_index_dir_is_pruned_to_its_size_cap(tmp_path):
+    index_dir = tmp_path / "index"
+    index_dir.mkdir()
+    for i, name in enumerate(("old", "recent")):
+        stale = index_dir / f"{name}.npy"
+        stale.write_bytes(b"x" * 1000)
+        os.utime(stale, ns=(i * 10**9, i * 10**9))
+
+    with BvhFrameReader(DATA_DIR / "A_test.bvh", index_dir=index_dir, content_hash="new") as reader:
+        size = (index_dir / "new.npy").stat().st_size
+        assert reader.max_index_bytes > size + 1000
+    assert len(list(index_dir.iterdir())) == 3
+
+    # Les index les moins récemment utilisés partent en premier, le nouveau reste
+    assert bvh_reader.prune_frame_indexes(index_dir, size + 1000) == 1
+    assert sorted(p.name for p in index_dir.iterdir()) == ["new.npy", "recent.npy"]
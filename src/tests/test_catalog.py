@@ -0,0 +1,53 @@
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from tools.catalog import SORT_COLUMNS, CatalogFilters, _keyset_condition, apply_filters, catalog_order_by, sort_key
+from tools.db_tools import BVHFile
+
+
+def sql(clause) -> str:
+    return str(clause.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+@pytest.mark.parametrize("sort_by", [name for name in SORT_COLUMNS if name != "id"])
+def test_every_sort_key_has_a_matching_index(sort_by):
+    indexes = {tuple(sql(expression) for expression in index.expressions) for index in BVHFile.__table__.indexes}
+    assert (sql(sort_key(sort_by)), "bvh.id") in indexes
+
+
+@pytest.mark.parametrize("descending", [False, True])
+def test_order_by_has_no_nulls_clause(descending):
+    order = ", ".join(sql(clause) for clause in catalog_order_by("fps", descending))
+    direction = "DESC" if descending else "ASC"
+    assert order == f"coalesce(bvh.fps, 'Infinity'::numeric) {direction}, bvh.id {direction}"
+
+
+@pytest.mark.parametrize("descending, operator", [(False, ">"), (True, "<")])
+def test_keyset_condition_is_a_plain_row_comparison(descending, operator):
+    condition = sql(_keyset_condition("fps", (Decimal("30.00"), 42), descending))
+    assert condition == f"(coalesce(bvh.fps, 'Infinity'::numeric), bvh.id) {operator} (30.00, 42)"
+
+
+def test_keyset_condition_after_a_null_uses_the_null_sort_value():
+    condition = sql(_keyset_condition("uploaded_at", (None, 7), False))
+    assert condition.endswith("> ('infinity'::timestamptz, 7)")
+    assert "OR" not in condition and "IS NULL" not in condition
+
+
+def test_keyset_condition_on_id():
+    assert sql(_keyset_condition("id", (3, 3), True)) == "bvh.id < 3"
+
+
+def test_filters_are_empty_by_default():
+    assert CatalogFilters().is_empty()
+    assert not CatalogFilters(loopable=False).is_empty()
+    assert apply_filters(select(BVHFile), CatalogFilters()).whereclause is None
+
+
+def test_filters_become_where_clauses():
+    filters = CatalogFilters(styles=("walk",), fps_min=24, loopable=True)
+    where = sql(apply_filters(select(BVHFile), filters).whereclause)
+    assert where == "bvh.animation_style IN ('walk') AND bvh.fps >= 24 AND bvh.loopable IS true"
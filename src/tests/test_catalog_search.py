@@ -0,0 +1,35 @@
+from sqlalchemy.dialects import postgresql
+
+from tools.catalog import CatalogFilters, apply_filters, search_condition, search_tsquery
+from tools.db_tools import BVHFile, search_tsvector
+
+
+def sql(clause) -> str:
+    return str(clause.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def test_tsquery_matches_every_word_as_a_prefix():
+    assert sql(search_tsquery("Zomb  wal!")) == "to_tsquery(CAST('simple' AS REGCONFIG), 'zomb:* & wal:*')"
+    assert search_tsquery("?!") is None
+
+
+def test_search_without_words_matches_nothing():
+    assert sql(search_condition("?!")) == "false"
+
+
+def test_search_uses_the_indexed_tsvector():
+    (index,) = [index for index in BVHFile.__table__.indexes if index.name == "idx_bvh_search_fts"]
+    assert sql(index.expressions[0]) == sql(search_tsvector())
+    assert sql(search_tsvector()) in sql(search_condition("walk"))
+
+
+def test_trigram_search_escapes_like_wildcards():
+    compiled = search_condition("50%_run", trigram=True).compile(dialect=postgresql.dialect())
+    params = list(compiled.params.values())
+    assert params.count("%50!%!_run%") == 2 and "50%_run" in params
+    assert str(compiled).count("ESCAPE '!'") == 2
+
+
+def test_search_filter_strips_the_query():
+    stmt = apply_filters(BVHFile.__table__.select(), CatalogFilters(search="   "))
+    assert stmt.whereclause is None
@@ -0,0 +1,109 @@
+from datetime import datetime, timezone
+
+import pandas
+import pytest
+
+from tools import catalog_sync
+from tools.catalog import CatalogFilters
+from tools.catalog_sync import CatalogDelta, CatalogPage, CatalogTracker, ChangeToken, apply_delta, fetch_changes
+
+OLD_TOKEN = ChangeToken(datetime(2026, 1, 1, tzinfo=timezone.utc), 1, None, 0)
+NEW_TOKEN = ChangeToken(datetime(2026, 1, 2, tzinfo=timezone.utc), 1, None, 0)
+EMPTY_TOKEN = ChangeToken(None, 0, None, 0)
+
+
+def make_tracker(token):
+    # Sans __init__ : ni connexion LISTEN ni purge des tombstones
+    tracker = CatalogTracker.__new__(CatalogTracker)
+    tracker.engine = None
+    tracker.token = lambda: token
+    return tracker
+
+
+def make_page(token, ids=(1, 2, 3)):
+    df = pandas.DataFrame({"id": list(ids), "filename": [f"{i}.bvh" for i in ids], "fps": [30.0] * len(ids)})
+    return CatalogPage(key=("k",), df=df, next_cursor=None, token=token)
+
+
+def make_delta(rows=(), deleted_ids=()):
+    df = pandas.DataFrame(list(rows), columns=["id", "filename", "fps"])
+    return CatalogDelta(rows=df, deleted_ids=list(deleted_ids), elapsed_ms=0.0)
+
+
+def reload_fetch():
+    return pandas.DataFrame({"id": [1, 2], "filename": ["a.bvh", "b.bvh"]}), None
+
+
+def test_page_loaded_on_an_empty_catalog_reloads_without_a_delta_query(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("fetch_changes ne doit pas être appelé")
+    monkeypatch.setattr(catalog_sync, "fetch_changes", fail)
+    tracker = make_tracker(NEW_TOKEN)
+
+    page, sync = tracker.refresh_page(make_page(EMPTY_TOKEN, ids=()), ("k",), reload_fetch,
+                                      CatalogFilters(), "id", page_size=100)
+
+    assert sync["status"] == "reload"
+    assert list(page.df["id"]) == [1, 2]
+
+
+def test_delta_larger_than_the_page_reloads(monkeypatch):
+    limits = []
+
+    def fake_fetch_changes(engine, since, limit):
+        limits.append(limit)
+        rows = pandas.DataFrame({"id": [1, 2, 3], "filename": ["x", "y", "z"]})
+        return CatalogDelta(rows=rows, deleted_ids=[], elapsed_ms=0.0, overflow=True)
+    monkeypatch.setattr(catalog_sync, "fetch_changes", fake_fetch_changes)
+    tracker = make_tracker(NEW_TOKEN)
+
+    page, sync = tracker.refresh_page(make_page(OLD_TOKEN), ("k",), reload_fetch,
+                                      CatalogFilters(), "id", page_size=2)
+
+    assert limits == [2]
+    assert sync["status"] == "reload"
+    assert list(page.df["filename"]) == ["a.bvh", "b.bvh"]
+
+
+def test_small_delta_is_applied_and_sync_info_is_not_kept_on_the_shared_tracker(monkeypatch):
+    def fake_fetch_changes(engine, since, limit):
+        rows = pandas.DataFrame({"id": [2], "filename": ["renamed.bvh"]})
+        return CatalogDelta(rows=rows, deleted_ids=[3], elapsed_ms=0.0)
+    monkeypatch.setattr(catalog_sync, "fetch_changes", fake_fetch_changes)
+    tracker = make_tracker(NEW_TOKEN)
+
+    page, sync = tracker.refresh_page(make_page(OLD_TOKEN), ("k",), reload_fetch,
+                                      CatalogFilters(), "id", page_size=100)
+
+    assert sync["status"] == "delta" and sync["rows"] == 1 and sync["deleted"] == 1
+    assert list(page.df["filename"]) == ["1.bvh", "renamed.bvh"]
+    assert not hasattr(tracker, "last_sync")
+
+
+def test_fetch_changes_refuses_a_token_without_watermark():
+    with pytest.raises(ValueError):
+        fetch_changes(None, EMPTY_TOKEN, limit=10)
+
+
+def test_apply_delta_updates_rows_in_place_and_drops_deleted_ones():
+    df = apply_delta(make_page(OLD_TOKEN), make_delta([(2, "renamed.bvh", 30.0)], [3]), CatalogFilters(), "fps")
+    assert df.to_dict("list") == {"id": [1, 2], "filename": ["1.bvh", "renamed.bvh"], "fps": [30.0, 30.0]}
+
+
+def test_apply_delta_gives_up_when_the_page_composition_may_change():
+    page = make_page(OLD_TOKEN)
+    # Nouvelle ligne, valeur de tri modifiée, page filtrée
+    assert apply_delta(page, make_delta([(4, "new.bvh", 30.0)]), CatalogFilters(), "id") is None
+    assert apply_delta(page, make_delta([(2, "2.bvh", 60.0)]), CatalogFilters(), "fps") is None
+    assert apply_delta(page, make_delta([(2, "x.bvh", 30.0)]), CatalogFilters(loopable=True), "id") is None
+
+
+def test_unchanged_token_serves_the_page_from_the_session():
+    def fail():
+        raise AssertionError("la page ne doit pas être relue")
+    page = make_page(NEW_TOKEN)
+
+    refreshed, sync = make_tracker(NEW_TOKEN).refresh_page(page, ("k",), fail, CatalogFilters(), "id",
+                                                           page_size=100)
+
+    assert sync["status"] == "cache" and refreshed is page
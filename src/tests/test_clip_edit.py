@@ -0,0 +1,73 @@
+import io
+from itertools import permutations
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from tools.bvh_parser import parse_bvh, parse_bvh_stream
+from tools.clip_edit import (
+    ClipEdit, edit_clip, euler_to_quaternions, quaternions_to_euler, resample_clip, save_clip, write_bvh
+)
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+
+
+@pytest.fixture(scope="module")
+def clip():
+    return parse_bvh(DATA_DIR / "A_test.bvh")
+
+
+def test_write_bvh_round_trip(clip):
+    out = io.BytesIO()
+    size = write_bvh(clip, out, chunk_frames=7)
+    written = parse_bvh_stream(io.BytesIO(out.getvalue()))
+
+    assert size == len(out.getvalue())
+    assert written.joint_names == clip.joint_names
+    assert [j.channels for j in written.joints] == [j.channels for j in clip.joints]
+    assert written.frame_count == clip.frame_count
+    np.testing.assert_allclose(written.motion, clip.motion, atol=1e-5)
+
+
+@pytest.mark.parametrize("axes", [list(p) for p in permutations(range(3))])
+def test_euler_quaternion_round_trip(axes):
+    rng = np.random.default_rng(0)
+    # Angle du milieu dans ]-90, 90[ : pas de blocage de cardan, la décomposition est unique
+    angles = np.column_stack([rng.uniform(-170, 170, 50), rng.uniform(-80, 80, 50), rng.uniform(-170, 170, 50)])
+    np.testing.assert_allclose(quaternions_to_euler(euler_to_quaternions(angles, axes), axes), angles, atol=1e-6)
+
+
+def test_resample_at_the_source_rate_keeps_the_frames(clip):
+    resampled = resample_clip(clip, clip.fps)
+    assert resampled.frame_count == clip.frame_count
+    np.testing.assert_allclose(resampled.motion, clip.motion, atol=1e-2)
+
+
+def test_resample_halves_the_frames_and_keeps_the_ends(clip):
+    source = edit_clip(clip, 0, 101)
+    resampled = resample_clip(source, source.fps / 2)
+    assert resampled.frame_count == 51
+    np.testing.assert_allclose(resampled.motion[0], source.motion[0], atol=1e-3)
+    np.testing.assert_allclose(resampled.motion[-1], source.motion[100], atol=1e-2)
+
+
+def test_empty_range_is_rejected(clip):
+    with pytest.raises(ValueError):
+        edit_clip(clip, clip.frame_count, None)
+
+
+def test_output_name():
+    assert ClipEdit("data/A_test.bvh", 40, None, 30).output_name() == "A_test_f40-end_30fps.bvh"
+    assert ClipEdit("data/A_test.bvh").output_name() == "A_test.bvh"
+
+
+def test_save_clip_reuses_identical_content(tmp_path, clip):
+    short = edit_clip(clip, 0, 20)
+    first = save_clip(short, tmp_path, "a.bvh")
+    again = save_clip(short, tmp_path, "a.bvh")
+    other = save_clip(edit_clip(clip, 5, 20), tmp_path, "a.bvh")
+
+    assert not first.duplicate and again.duplicate and again.path == first.path
+    assert other.path.name == "a_1.bvh" and not other.duplicate
+    assert not list(tmp_path.glob(".*.part"))
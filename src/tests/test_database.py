@@ -0,0 +1,60 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from tools.database import get_metrics, get_session_factory, instrument_engine, session_scope
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    yield engine
+    engine.dispose()
+
+
+def test_each_statement_is_recorded(engine):
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (x INTEGER)"))
+        conn.execute(text("INSERT INTO t VALUES (:x)"), [{"x": 1}, {"x": 2}, {"x": 3}])
+        conn.execute(text("SELECT x FROM t")).all()
+
+    metrics = get_metrics(engine)
+    recent = metrics.recent()
+    assert recent[0].statement == "SELECT x FROM t"
+    assert recent[1].executemany and recent[1].rowcount == 3
+    summary = metrics.summary()
+    assert summary["queries"] == 3 and summary["max_ms"] >= summary["p50_ms"] >= 0.0
+
+
+def test_failed_statement_does_not_shift_the_next_timing(engine):
+    with engine.connect() as conn:
+        with pytest.raises(OperationalError):
+            conn.execute(text("SELECT * FROM missing_table"))
+        conn.execute(text("SELECT 1"))
+        assert conn.info["query_start"] == []
+    assert [stat.statement for stat in get_metrics(engine).recent()] == ["SELECT 1"]
+
+
+def test_listeners_and_reset(engine):
+    seen = []
+    metrics = get_metrics(engine)
+    metrics.add_listener(seen.append)
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    metrics.remove_listener(seen.append)
+    metrics.reset()
+    assert len(seen) == 1
+    assert metrics.summary()["queries"] == 0 and metrics.recent() == []
+
+
+def test_session_scope_rolls_back_on_error(engine):
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (x INTEGER)"))
+    with pytest.raises(RuntimeError):
+        with session_scope(engine) as session:
+            session.execute(text("INSERT INTO t VALUES (1)"))
+            raise RuntimeError
+    with session_scope(engine) as session:
+        assert session.execute(text("SELECT count(*) FROM t")).scalar() == 0
+    assert get_session_factory(engine) is get_session_factory(engine)
@@ -0,0 +1,96 @@
+from sqlalchemy.dialects import postgresql
+
+from tools import bvh_reader, db_tools
+from tools.db_tools import BVHArchive, BVHFile, BVHMotionStats, duplicate_bvh_records, remove_orphan_files
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+    def scalars(self):
+        return iter(self.rows)
+
+
+class FakeEngine:
+    """Moteur factice : renvoie les lignes de respond(statement) et garde les requêtes exécutées."""
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.statements = []
+
+    def begin(self):
+        return self
+
+    connect = begin
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, stmt):
+        self.statements.append(stmt)
+        return FakeResult(self.respond(stmt))
+
+
+def test_duplicate_copies_every_dependent_table_in_one_statement():
+    engine = FakeEngine(lambda stmt: [101, 102])
+
+    assert duplicate_bvh_records(engine, [9, 7]) == [101, 102]
+
+    (stmt,) = engine.statements
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    assert sql.startswith("WITH copies AS") and "nextval(pg_get_serial_sequence" in sql
+    assert sql.endswith("FROM copies ORDER BY copies.old_id")
+    inserts = sql.split("INSERT INTO ")[1:]
+    assert [part.split(" ", 1)[0] for part in inserts] == [
+        BVHFile.__tablename__, BVHMotionStats.__tablename__, BVHArchive.__tablename__
+    ]
+    regenerated = {"uuid", "uploaded_at", "updated_at", "computed_at", "created_at"}
+    for table, part in zip((BVHFile.__table__, BVHMotionStats.__table__, BVHArchive.__table__), inserts):
+        target = part[part.index("(") + 1:part.index(")")].split(", ")
+        key = "id" if table.name == BVHFile.__tablename__ else "bvh_id"
+        # La clé vient de la correspondance, toutes les autres colonnes non régénérées sont copiées
+        assert target[0] == key
+        assert set(target[1:]) == {c.name for c in table.columns} - regenerated - {key}
+        assert f"JOIN copies ON {table.name}.{key} = copies.old_id" in part
+
+
+def test_duplicate_of_nothing_runs_no_query():
+    engine = FakeEngine(lambda stmt: [])
+    assert duplicate_bvh_records(engine, []) == []
+    assert engine.statements == []
+
+
+def test_remove_orphan_files_keeps_referenced_paths(tmp_path):
+    files = {name: tmp_path / name for name in ("kept.bvh", "orphan.bvh", "kept.bvha", "orphan.bvha")}
+    for path in files.values():
+        path.write_bytes(b"x")
+    referenced = {str(files["kept.bvh"]), str(files["kept.bvha"])}
+    engine = FakeEngine(lambda stmt: [p for p in referenced
+                                      if p in str(stmt.compile(compile_kwargs={"literal_binds": True}))])
+
+    file_paths = [str(files["kept.bvh"]), str(files["orphan.bvh"]), str(tmp_path / "gone.bvh")]
+    archive_paths = [str(files["kept.bvha"]), str(files["orphan.bvha"])]
+    removed = remove_orphan_files(engine, file_paths, archive_paths, batch_size=2)
+
+    assert removed == 2
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["kept.bvh", "kept.bvha"]
+    # Deux lots de chemins .bvh, un lot d'archives
+    assert len(engine.statements) == 3
+
+
+def test_remove_orphan_files_drops_unreferenced_frame_indexes(tmp_path, monkeypatch):
+    for content_hash in ("shared", "orphan"):
+        (tmp_path / f"{content_hash}.npy").write_bytes(b"x")
+    monkeypatch.setattr(db_tools, "remove_frame_indexes",
+                        lambda hashes: bvh_reader.remove_frame_indexes(hashes, tmp_path))
+    engine = FakeEngine(lambda stmt: ["shared"])
+
+    assert remove_orphan_files(engine, [], content_hashes=["shared", "orphan"]) == 0
+    assert [p.name for p in tmp_path.iterdir()] == ["shared.npy"]
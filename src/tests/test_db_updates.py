@@ -0,0 +1,102 @@
+import numpy as np
+import pandas
+from sqlalchemy.dialects import postgresql
+
+from tools.db_tools import GenderEnum, _changed_cells, _coerce_cell, update_bvh_records_from_dataframe
+
+
+class RecordingEngine:
+    """Moteur factice : garde l'UPDATE exécuté et renvoie les ids comme s'ils existaient tous."""
+
+    def __init__(self, missing=()):
+        self.statements = []
+        self.missing = set(missing)
+
+    def begin(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, stmt):
+        self.statements.append(stmt)
+        ids = [row[0] for row in values_rows(stmt)]
+        return Result([i for i in ids if i not in self.missing])
+
+
+class Result:
+    def __init__(self, ids):
+        self.ids = ids
+
+    def scalars(self):
+        return iter(self.ids)
+
+
+def values_rows(stmt) -> list:
+    """Lignes du VALUES joint par l'UPDATE (WHERE bvh.id = changes.id)."""
+    changes = stmt.whereclause.right.table
+    return [tuple(row) for chunk in changes._data for row in chunk]
+
+
+def catalog():
+    return pandas.DataFrame({
+        "id": [1, 2, 3],
+        "description": ["a", None, "c"],
+        "fps": [30.0, np.nan, 60.0],
+        "loopable": [False, True, False],
+    })
+
+
+def test_changed_cells_ignores_empty_cells_on_both_sides():
+    original = catalog()
+    updated = original.copy()
+    updated.loc[2, "description"] = "changed"
+    changed = _changed_cells(updated, original, ["description", "fps", "loopable"])
+    assert changed.to_dict("index") == {
+        1: {"description": False, "fps": False, "loopable": False},
+        2: {"description": False, "fps": False, "loopable": False},
+        3: {"description": True, "fps": False, "loopable": False},
+    }
+
+
+def test_only_changed_rows_and_columns_are_sent():
+    original = catalog()
+    updated = original.copy()
+    updated.loc[0, "description"] = "new"
+    updated.loc[2, "loopable"] = True
+    engine = RecordingEngine()
+
+    count, errors = update_bvh_records_from_dataframe(engine, updated, original)
+
+    assert (count, errors) == (2, [])
+    (stmt,) = engine.statements
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    assert "SET description=" in sql and "loopable=" in sql and "fps=" not in sql
+    rows = values_rows(stmt)
+    # (id, description, loopable, indicateurs de modification par colonne)
+    assert sorted(rows) == [(1, "new", None, True, False), (3, None, True, False, True)]
+
+
+def test_nothing_changed_sends_nothing():
+    engine = RecordingEngine()
+    assert update_bvh_records_from_dataframe(engine, catalog(), catalog()) == (0, [])
+    assert engine.statements == []
+
+
+def test_missing_row_is_reported():
+    original = catalog()
+    updated = original.copy()
+    updated["description"] = ["x", "y", "z"]
+    count, errors = update_bvh_records_from_dataframe(RecordingEngine(missing={2}), updated, original)
+    assert count == 2 and errors == ["Erreur ligne id=2: enregistrement introuvable"]
+
+
+def test_coerce_cell():
+    assert _coerce_cell("fps", np.float64(30)) == 30.0
+    assert _coerce_cell("frame_count", np.int64(12)) == 12 and type(_coerce_cell("frame_count", np.int64(12))) is int
+    assert _coerce_cell("loopable", np.bool_(True)) is True
+    assert _coerce_cell("description", np.nan) is None
+    assert _coerce_cell("actor_gender", GenderEnum.F.value) == GenderEnum.F
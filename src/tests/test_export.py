@@ -0,0 +1,128 @@
+import os
+import time
+from datetime import timedelta
+
+import pyarrow as pa
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from tools import export
+from tools.catalog import CatalogFilters
+from tools.db_tools import BVHFile
+from tools.export import arrow_schema, export_catalog, export_statement, prune_exports, write_csv, write_parquet
+
+
+class RecordingConnection:
+    """Connexion factice (brute ou SQLAlchemy) qui garde le SQL exécuté, sans résultat."""
+
+    def __init__(self):
+        self.executed = []
+
+    # Connexion brute psycopg2
+    def cursor(self):
+        return self
+
+    def copy_expert(self, sql, out):
+        self.executed.append(sql)
+        self.rowcount = 0
+
+    def commit(self):
+        self.executed.append("COMMIT")
+
+    def close(self):
+        pass
+
+    # Connexion SQLAlchemy
+    def begin(self):
+        return self
+
+    def raw_connection(self):
+        return self
+
+    def execution_options(self, **options):
+        return self
+
+    def execute(self, stmt):
+        self.executed.append(str(stmt))
+        return self
+
+    def partitions(self):
+        return iter(())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def age(path, seconds):
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+def test_prune_exports_removes_only_old_exports_and_temp_files(tmp_path):
+    old_export = tmp_path / "bvh_export_20260101_000000.csv"
+    old_tmp = tmp_path / "tmpabc.tmp"
+    recent_export = tmp_path / "bvh_export_20260101_010000.parquet"
+    unrelated = tmp_path / "notes.txt"
+    for path in (old_export, old_tmp, recent_export, unrelated):
+        path.write_bytes(b"x")
+    for path in (old_export, old_tmp, unrelated):
+        age(path, 7200)
+
+    assert prune_exports(tmp_path, timedelta(hours=1)) == 2
+    assert sorted(p.name for p in tmp_path.iterdir()) == [recent_export.name, unrelated.name]
+
+
+def test_prune_exports_without_directory(tmp_path):
+    assert prune_exports(tmp_path / "missing", timedelta(hours=1)) == 0
+
+
+def test_arrow_schema_covers_every_catalog_column():
+    schema = arrow_schema()
+    assert schema.names == [c.name for c in BVHFile.__table__.columns]
+    assert schema.field("id").type == pa.int32()
+
+
+def test_export_statement_is_filtered_and_sorted_like_the_catalog():
+    stmt = export_statement(CatalogFilters(loopable=True), sort_by="id", descending=True)
+    sql = str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    assert "WHERE bvh.loopable IS true" in sql
+    assert sql.endswith("ORDER BY bvh.id DESC")
+
+
+def test_unknown_format_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        export_catalog(None, CatalogFilters(), "xlsx", dest_dir=tmp_path)
+
+
+def test_failed_export_leaves_no_file(tmp_path, monkeypatch):
+    def fail(engine, stmt, out):
+        out.write(b"id\n1\n")
+        raise RuntimeError("connexion perdue")
+    monkeypatch.setattr(export, "write_csv", fail)
+
+    with pytest.raises(RuntimeError):
+        export_catalog(None, CatalogFilters(), "csv", dest_dir=tmp_path)
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.parametrize("write", [write_csv, write_parquet])
+def test_export_runs_without_the_statement_timeout(tmp_path, write):
+    engine = RecordingConnection()
+    with open(tmp_path / "out", "wb") as out:
+        write(engine, export_statement(CatalogFilters()), out)
+    assert engine.executed[0] == "SET LOCAL statement_timeout = 0"
+    assert len(engine.executed) >= 2
+
+
+def test_exports_started_in_the_same_second_get_distinct_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(export, "write_csv", lambda engine, stmt, out: 0)
+    monkeypatch.setattr(export.time, "strftime", lambda fmt: "20260101_000000")
+
+    first = export_catalog(None, CatalogFilters(), "csv", dest_dir=tmp_path)
+    second = export_catalog(None, CatalogFilters(), "csv", dest_dir=tmp_path)
+
+    assert first.path != second.path and first.path.exists() and second.path.exists()
+    assert first.path.name.startswith("bvh_export_20260101_000000_")
@@ -0,0 +1,65 @@
+import os
+
+from tools.file_catalog import FileCatalog
+
+
+def make_tree(root):
+    (root / "walks" / "slow").mkdir(parents=True)
+    (root / "runs").mkdir()
+    (root / "walks" / "walk_01.bvh").write_bytes(b"x")
+    (root / "walks" / "slow" / "walk_02.BVH").write_bytes(b"xx")
+    (root / "runs" / "run_01.bvh").write_bytes(b"xxx")
+    (root / "runs" / "notes.txt").write_bytes(b"")
+    (root / "runs" / ".hidden.bvh").write_bytes(b"")
+
+
+def bump_mtime(path):
+    # Certains systèmes de fichiers ont un mtime grossier : on le force à changer
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def test_first_scan_lists_bvh_files(tmp_path):
+    make_tree(tmp_path)
+    catalog = FileCatalog(tmp_path, index_dir=None)
+    catalog.refresh()
+    assert [e.path for e in catalog.entries()] == ["runs/run_01.bvh", "walks/slow/walk_02.BVH", "walks/walk_01.bvh"]
+    assert [e.path for e in catalog.search("WALK slow")] == ["walks/slow/walk_02.BVH"]
+
+
+def test_incremental_refresh_only_rescans_changed_directories(tmp_path):
+    make_tree(tmp_path)
+    catalog = FileCatalog(tmp_path, index_dir=None)
+    catalog.refresh()
+
+    (tmp_path / "runs" / "run_02.bvh").write_bytes(b"x")
+    (tmp_path / "walks" / "slow" / "walk_02.BVH").unlink()
+    bump_mtime(tmp_path / "runs")
+    bump_mtime(tmp_path / "walks" / "slow")
+    stats = catalog.refresh()
+
+    assert stats["dirs_visited"] == 4 and stats["dirs_rescanned"] == 2
+    assert [e.path for e in catalog.entries()] == ["runs/run_01.bvh", "runs/run_02.bvh", "walks/walk_01.bvh"]
+
+
+def test_index_is_reloaded_from_disk(tmp_path):
+    root, index_dir = tmp_path / "data", tmp_path / "index"
+    root.mkdir()
+    make_tree(root)
+    FileCatalog(root, index_dir=index_dir).refresh()
+
+    reloaded = FileCatalog(root, index_dir=index_dir)
+    assert len(reloaded) == 3
+    assert reloaded.refresh()["dirs_rescanned"] == 0
+
+
+def test_removed_directory_disappears(tmp_path):
+    make_tree(tmp_path)
+    catalog = FileCatalog(tmp_path, index_dir=None)
+    catalog.refresh()
+    for path in (tmp_path / "runs").iterdir():
+        path.unlink()
+    (tmp_path / "runs").rmdir()
+    bump_mtime(tmp_path)
+    catalog.refresh()
+    assert [e.path for e in catalog.entries()] == ["walks/slow/walk_02.BVH", "walks/walk_01.bvh"]
@@ -0,0 +1,68 @@
+import shutil
+from pathlib import Path
+
+import pytest
+
+from tools import db_tools
+from tools.ingest import ingest_directory, iter_bvh_files
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+
+
+@pytest.fixture
+def nas(tmp_path):
+    root = tmp_path / "nas"
+    (root / "walks").mkdir(parents=True)
+    shutil.copy(DATA_DIR / "A_test.bvh", root / "walks" / "a.bvh")
+    # Même contenu sous un autre nom
+    shutil.copy(DATA_DIR / "A_test.bvh", root / "a_copy.BVH")
+    shutil.copy(DATA_DIR / "B_test.bvh", root / "registered.bvh")
+    (root / "broken.bvh").write_bytes(b"HIERARCHY\nROOT Hips\n{\n")
+    (root / "notes.txt").write_bytes(b"")
+    return root
+
+
+@pytest.fixture
+def fake_db(monkeypatch, nas):
+    inserted = []
+
+    def bulk_insert(engine, batch):
+        inserted.extend(batch)
+        return len(batch)
+
+    monkeypatch.setattr(db_tools, "get_registered_file_paths",
+                        lambda engine: {str((nas / "registered.bvh").absolute())})
+    monkeypatch.setattr(db_tools, "get_registered_content_hashes", lambda engine: set())
+    monkeypatch.setattr(db_tools, "get_archived_file_paths", lambda engine: set())
+    monkeypatch.setattr(db_tools, "bulk_insert_bvh_files", bulk_insert)
+    monkeypatch.setattr(db_tools, "register_archives", lambda engine, archives, version: len(archives))
+    return inserted
+
+
+def test_iter_bvh_files_is_recursive_and_case_insensitive(nas):
+    names = sorted(path.name for path in iter_bvh_files(nas))
+    assert names == ["a.bvh", "a_copy.BVH", "broken.bvh", "registered.bvh"]
+    assert all(path.is_absolute() for path in iter_bvh_files(nas))
+
+
+def test_ingest_skips_registered_files_and_duplicate_contents(nas, fake_db):
+    stats = ingest_directory(None, nas, workers=2, batch_size=1, cache_path=None, log=lambda *_: None)
+
+    assert (stats["scanned"], stats["skipped"], stats["inserted"], stats["duplicates"]) == (4, 1, 1, 1)
+    assert [Path(path).name for path, _ in stats["failures"]] == ["broken.bvh"]
+    (model,) = fake_db
+    assert model.original_filename in ("a.bvh", "a_copy.BVH")
+    assert model.content_hash and model.bone_count > 0
+
+
+def test_dry_run_writes_nothing(nas, fake_db):
+    stats = ingest_directory(None, nas, workers=1, dry_run=True, cache_path=None, log=lambda *_: None)
+    assert stats["inserted"] == 0 and fake_db == []
+
+
+def test_archives_are_registered_after_their_rows(tmp_path, nas, fake_db):
+    stats = ingest_directory(None, nas, workers=2, cache_path=None, archive_dir=tmp_path / "archives",
+                             log=lambda *_: None)
+    # a.bvh (ou sa copie) et registered.bvh, enregistré mais pas encore archivé
+    assert stats["archived"] == 2
+    assert len(list((tmp_path / "archives").rglob("*.bvha"))) == 2
@@ -0,0 +1,149 @@
+import io
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from tools import ingest_queue
+from tools.ingest_queue import IngestQueue
+from tools.storage import PARTIAL_SUFFIX, PartialFile
+
+
+class FakeMetadataCache:
+    """Renvoie un modèle factice par fichier ; échoue pour les fichiers listés dans failing."""
+
+    def __init__(self, failing=(), gate=None):
+        self.failing = set(failing)
+        self.gate = gate
+
+    def get_or_compute(self, path, compute, content_hash=None):
+        if self.gate is not None:
+            self.gate.wait(timeout=5)
+        if path.name in self.failing:
+            raise ValueError(f"{path.name} illisible")
+        return SimpleNamespace(original_filename=path.name), f"hash-{path.name}", "miss"
+
+
+@pytest.fixture
+def inserted(monkeypatch):
+    rows = []
+
+    def save(engine, model):
+        rows.append(model.original_filename)
+        return SimpleNamespace(id=len(rows))
+    monkeypatch.setattr(ingest_queue, "find_bvh_by_content_hash", lambda engine, content_hash: None)
+    monkeypatch.setattr(ingest_queue, "save_bvh_file_to_db", save)
+    return rows
+
+
+def make_files(tmp_path, *names):
+    for name in names:
+        (tmp_path / name).write_bytes(b"HIERARCHY\n")
+    return [tmp_path / name for name in names]
+
+
+def test_single_worker_runs_jobs_in_submission_order(tmp_path, inserted):
+    queue = IngestQueue(None, FakeMetadataCache(), tmp_path, max_workers=1)
+    jobs = [queue.submit_path(path) for path in make_files(tmp_path, "a.bvh", "b.bvh", "c.bvh")]
+    queue.shutdown()
+
+    assert inserted == ["a.bvh", "b.bvh", "c.bvh"]
+    assert [job.bvh_id for job in jobs] == [1, 2, 3]
+    # jobs() liste du plus récent au plus ancien
+    assert [job.filename for job in queue.jobs()] == ["c.bvh", "b.bvh", "a.bvh"]
+
+
+def test_failing_job_is_reported_and_does_not_stop_the_worker(tmp_path, inserted):
+    queue = IngestQueue(None, FakeMetadataCache(failing={"bad.bvh"}), tmp_path, max_workers=1)
+    bad, good = (queue.submit_path(path) for path in make_files(tmp_path, "bad.bvh", "good.bvh"))
+    queue.shutdown()
+
+    assert bad.status == "error" and bad.message == "ValueError: bad.bvh illisible"
+    assert bad.finished and bad.progress == 1.0 and bad.bvh_id is None
+    assert good.status == "done" and inserted == ["good.bvh"]
+    assert queue.stage_stats()["insert"]["count"] == 1
+
+
+def test_known_content_is_reported_as_duplicate(tmp_path, inserted, monkeypatch):
+    monkeypatch.setattr(ingest_queue, "find_bvh_by_content_hash",
+                        lambda engine, content_hash: SimpleNamespace(id=7, file_path="data/a.bvh"))
+    queue = IngestQueue(None, FakeMetadataCache(), tmp_path, max_workers=1)
+    (path,) = make_files(tmp_path, "a.bvh")
+    job = queue.submit_path(path)
+    queue.shutdown()
+
+    assert job.status == "duplicate" and job.bvh_id == 7 and inserted == []
+
+
+def test_shutdown_waits_for_queued_jobs_and_refuses_new_ones(tmp_path, inserted):
+    gate = threading.Event()
+    queue = IngestQueue(None, FakeMetadataCache(gate=gate), tmp_path, max_workers=1)
+    first, second = make_files(tmp_path, "a.bvh", "b.bvh")
+    jobs = [queue.submit_path(first), queue.submit_path(second)]
+    assert queue.queue_depth >= 1
+
+    gate.set()
+    queue.shutdown(wait=True)
+
+    assert all(job.status == "done" for job in jobs) and queue.queue_depth == 0
+    with pytest.raises(RuntimeError):
+        queue.submit_path(first)
+
+
+class DeferredExecutor:
+    """Garde les tâches soumises pour les lancer plus tard, à la main."""
+
+    def __init__(self):
+        self.calls = []
+
+    def submit(self, fn, *args):
+        self.calls.append((fn, args))
+
+    def run_all(self):
+        for fn, args in self.calls:
+            fn(*args)
+
+
+def make_queue(tmp_path):
+    queue = IngestQueue(engine=None, metadata_cache=None, data_dir=tmp_path)
+    queue._executor = DeferredExecutor()
+    queue._registered_path = lambda content_hash: None
+    return queue
+
+
+def test_submit_upload_queues_a_partial_file_instead_of_the_widget_file(tmp_path):
+    content = b"HIERARCHY\n" + b"x" * 10_000
+    source = io.BytesIO(content)
+    source.seek(42)
+    queue = make_queue(tmp_path)
+
+    job = queue.submit_upload("clip.bvh", source, register=False)
+    (_, args), = queue._executor.calls
+    partial = args[1]
+    assert isinstance(partial, PartialFile) and partial.path.name.endswith(PARTIAL_SUFFIX)
+    assert partial.path.read_bytes() == content and partial.size_bytes == len(content)
+    assert source.tell() == 42
+
+    # Le script réécrit le fichier du widget pendant que le job attend
+    source.seek(0)
+    source.write(b"PREVIEW")
+    queue._executor.run_all()
+
+    assert job.status == "done"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["clip.bvh"]
+    assert (tmp_path / "clip.bvh").read_bytes() == content
+
+
+def test_partial_file_is_removed_when_the_job_fails(tmp_path):
+    queue = make_queue(tmp_path)
+
+    def unavailable(content_hash):
+        raise ConnectionError("base indisponible")
+    queue._registered_path = unavailable
+
+    job = queue.submit_upload("../clip.bvh", io.BytesIO(b"HIERARCHY\n"))
+    queue._executor.run_all()
+
+    assert job.filename == "clip.bvh"
+    assert job.status == "error" and "base indisponible" in job.message
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,62 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from tools.bvh_parser import BvhClip, BvhJoint, build_bvh_file_create, parse_bvh
+from tools.kinematics import analyze_clip, forward_kinematics, guess_file_unit, height_in_metres, loop_score
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+
+
+def arm_clip(angles_deg) -> BvhClip:
+    """Racine en (0, 0, 0) et un segment de 10 le long de Y, tourné autour de Z."""
+    joints = [
+        BvhJoint("Hips", -1, (0.0, 0.0, 0.0),
+                 ["Xposition", "Yposition", "Zposition", "Zrotation", "Xrotation", "Yrotation"], 0),
+        BvhJoint("Arm", 0, (0.0, 10.0, 0.0), ["Zrotation", "Xrotation", "Yrotation"], 6, end_site=(0.0, 10.0, 0.0)),
+    ]
+    motion = np.zeros((len(angles_deg), 9), dtype=np.float32)
+    motion[:, 6] = angles_deg
+    return BvhClip(joints=joints, frame_count=len(angles_deg), frame_time=1 / 30, motion=motion)
+
+
+def test_forward_kinematics_applies_parent_rotations():
+    positions = forward_kinematics(arm_clip([0.0, 90.0]))
+    assert positions.shape == (2, 3, 3)
+    # Frame 0 : bras vertical ; frame 1 : l'end site tourne de 90° autour de Z
+    np.testing.assert_allclose(positions[0, 2], [0.0, 20.0, 0.0], atol=1e-9)
+    np.testing.assert_allclose(positions[1, 2], [-10.0, 10.0, 0.0], atol=1e-9)
+
+
+def test_cycle_is_loopable_and_one_way_motion_is_not():
+    cycle = analyze_clip(arm_clip(30.0 * np.sin(np.linspace(0.0, 2 * np.pi, 31))))
+    one_way = analyze_clip(arm_clip(np.linspace(0.0, 90.0, 31)))
+    assert cycle.loopable and cycle.loop_score > 0.9
+    assert not one_way.loopable
+
+
+def test_loop_score_needs_a_few_frames():
+    assert loop_score(np.zeros((2, 3, 3)), scale=1.0, frame_time=1 / 30) == 0.0
+
+
+def test_rest_pose_height_and_bounds():
+    kinematics = analyze_clip(parse_bvh(DATA_DIR / "A_test.bvh"))
+    assert kinematics.rest_pose_height > 0
+    assert (kinematics.bounds_min <= kinematics.bounds_max).all()
+
+
+@pytest.mark.parametrize("height, unit", [(1.8, "m"), (0.9, "m"), (164.41, "cm"), (95.0, "cm"), (1720.0, "mm")])
+def test_guess_file_unit(height, unit):
+    assert guess_file_unit(height) == unit
+
+
+def test_height_in_metres_fits_the_column():
+    assert height_in_metres(164.41) == 1.64
+    assert height_in_metres(1720.0) == 1.72
+    assert height_in_metres(0.0) == 0.0
+
+
+def test_rest_pose_height_is_stored_in_metres():
+    model = build_bvh_file_create(DATA_DIR / "A_test.bvh")
+    assert 1.0 < model.rest_pose_height < 2.2
@@ -0,0 +1,66 @@
+import shutil
+from pathlib import Path
+
+import pytest
+
+from tools.bvh_parser import build_bvh_file_create
+from tools.metadata_cache import MetadataCache
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+
+
+class CountingCompute:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, path):
+        self.calls += 1
+        return build_bvh_file_create(path)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = MetadataCache(tmp_path / "cache.sqlite")
+    yield cache
+    cache.close()
+
+
+def test_unchanged_file_is_a_hit(tmp_path, cache):
+    path = tmp_path / "a.bvh"
+    shutil.copy(DATA_DIR / "A_test.bvh", path)
+    compute = CountingCompute()
+
+    first, content_hash, status = cache.get_or_compute(path, compute)
+    again, again_hash, again_status = cache.get_or_compute(path, compute)
+
+    assert (status, again_status) == ("miss", "hit")
+    assert compute.calls == 1
+    assert again_hash == content_hash
+    assert again.model_dump(exclude={"content_hash"}) == first.model_dump(exclude={"content_hash"})
+
+
+def test_renamed_copy_is_found_by_content_hash(tmp_path, cache):
+    original, copy = tmp_path / "a.bvh", tmp_path / "renamed.bvh"
+    shutil.copy(DATA_DIR / "A_test.bvh", original)
+    compute = CountingCompute()
+    cache.get_or_compute(original, compute)
+    shutil.copy(original, copy)
+
+    model, _, status = cache.get_or_compute(copy, compute)
+
+    assert status == "hash_hit" and compute.calls == 1
+    # Les champs propres à l'emplacement viennent du nouveau fichier
+    assert model.original_filename == "renamed.bvh"
+    assert model.file_path == str(copy.absolute())
+
+
+def test_eviction_keeps_the_cache_bounded(tmp_path):
+    cache = MetadataCache(tmp_path / "cache.sqlite", max_entries=2)
+    compute = CountingCompute()
+    for name in ("A_test.bvh", "B_test.bvh", "C_test.bvh"):
+        shutil.copy(DATA_DIR / name, tmp_path / name)
+        cache.get_or_compute(tmp_path / name, compute)
+
+    assert cache.stats()["entries"] <= 2
+    assert cache.evictions >= 1
+    cache.close()
@@ -0,0 +1,30 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from tools.bvh_parser import parse_bvh
+from tools.motion_archive import ALIGNMENT, ArchiveFormatError, load_archive, read_archive_header, write_archive
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_archive_round_trip(tmp_path, mmap):
+    clip = parse_bvh(DATA_DIR / "A_test.bvh")
+    path = tmp_path / "a.bvha"
+    size = write_archive(clip, path)
+
+    loaded = load_archive(path, mmap=mmap)
+    assert size == path.stat().st_size
+    assert read_archive_header(path)["data_offset"] % ALIGNMENT == 0
+    assert loaded.joints == clip.joints
+    assert loaded.frame_time == clip.frame_time
+    np.testing.assert_array_equal(loaded.motion, clip.motion)
+
+
+def test_not_an_archive(tmp_path):
+    path = tmp_path / "a.bvha"
+    path.write_bytes((DATA_DIR / "A_test.bvh").read_bytes())
+    with pytest.raises(ArchiveFormatError):
+        load_archive(path)
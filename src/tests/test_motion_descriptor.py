@@ -0,0 +1,77 @@
+import dataclasses
+import struct
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from tools.bvh_parser import BvhClip, parse_bvh
+from tools.kinematics import analyze_clip
+from tools.motion_stats import compute_motion_stats
+from tools.similarity import SimilarityIndex, decode_float4_arrays
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+
+
+def test_activity_and_descriptor_do_not_depend_on_the_file_unit():
+    clip = parse_bvh(DATA_DIR / "A_test.bvh")
+    # Même capture en millimètres : offsets et canaux de position multipliés par 10
+    motion = clip.motion.copy()
+    joints = []
+    for joint in clip.joints:
+        for i, name in enumerate(joint.channels):
+            if name.endswith("position"):
+                motion[:, joint.channel_start + i] *= 10
+        joints.append(dataclasses.replace(
+            joint, offset=tuple(10 * v for v in joint.offset),
+            end_site=None if joint.end_site is None else tuple(10 * v for v in joint.end_site)))
+    scaled = BvhClip(joints=joints, frame_count=clip.frame_count, frame_time=clip.frame_time, motion=motion)
+
+    stats = compute_motion_stats(clip, analyze_clip(clip))
+    scaled_stats = compute_motion_stats(scaled, analyze_clip(scaled))
+    assert scaled_stats["activity"] == pytest.approx(stats["activity"], rel=1e-3)
+    np.testing.assert_allclose(scaled_stats["descriptor"], stats["descriptor"], rtol=1e-3, atol=1e-4)
+
+
+def array_send(values) -> bytes:
+    """Tableau real[] à une dimension au format binaire de PostgreSQL (array_send)."""
+    header = struct.pack(">iiIii", 1, 0, 700, len(values), 1)
+    return header + b"".join(struct.pack(">if", 4, value) for value in values)
+
+
+def test_decode_float4_arrays():
+    rows = [[1.0, -2.5, 3.25], [0.0, 4.0, -1.0]]
+    decoded = decode_float4_arrays([array_send(row) for row in rows], 3)
+    np.testing.assert_array_equal(decoded, np.asarray(rows, dtype=np.float32))
+
+
+def make_index(descriptors: np.ndarray) -> SimilarityIndex:
+    index = SimilarityIndex(engine=None, components=4)
+    index._fit(descriptors)
+    index._ids = np.arange(100, 100 + len(descriptors), dtype=np.int64)
+    index._vectors = index._project(descriptors)
+    index._norms = (index._vectors ** 2).sum(axis=1)
+    index._positions = {bvh_id: position for position, bvh_id in enumerate(index._ids.tolist())}
+    return index
+
+
+def test_query_matches_brute_force_and_excludes_the_clip_itself():
+    descriptors = np.random.default_rng(1).normal(size=(60, 12)).astype(np.float32)
+    index = make_index(descriptors)
+
+    matches = index.query(105, k=5)
+    distances = np.linalg.norm(index._vectors - index._vectors[5], axis=1)
+    expected = [100 + i for i in np.argsort(distances) if i != 5][:5]
+    assert [bvh_id for bvh_id, _ in matches] == expected
+    assert [d for _, d in matches] == sorted(d for _, d in matches)
+
+
+def test_removed_clip_is_no_longer_returned():
+    index = make_index(np.random.default_rng(2).normal(size=(20, 12)).astype(np.float32))
+    nearest = index.query(100, k=1)[0][0]
+    with index._lock:
+        assert index._remove(nearest)
+    assert nearest not in index and len(index) == 19
+    assert nearest not in [bvh_id for bvh_id, _ in index.query(100, k=19)]
+    # Les positions restent cohérentes après le déplacement de la dernière ligne
+    assert all(index._ids[position] == bvh_id for bvh_id, position in index._positions.items())
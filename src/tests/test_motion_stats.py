@@ -0,0 +1,50 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from tools.bvh_parser import BvhClip, BvhJoint, parse_bvh
+from tools.kinematics import analyze_clip
+from tools.motion_descriptor import DESCRIPTOR_SIZE
+from tools.motion_stats import compute_motion_stats
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+
+
+def sliding_clip(speed: float, unit_scale: float = 1.0, frames: int = 31, frame_time: float = 1 / 30) -> BvhClip:
+    """Racine qui glisse le long de X à vitesse constante (m/s), pose figée de 1.7 m.
+
+    unit_scale donne l'unité du fichier : 1 pour des mètres, 100 pour des centimètres...
+    """
+    joints = [
+        BvhJoint("Hips", -1, (0.0, 0.0, 0.0),
+                 ["Xposition", "Yposition", "Zposition", "Zrotation", "Xrotation", "Yrotation"], 0),
+        BvhJoint("Spine", 0, (0.0, 1.0 * unit_scale, 0.0), ["Zrotation", "Xrotation", "Yrotation"], 6,
+                 end_site=(0.0, 0.7 * unit_scale, 0.0)),
+    ]
+    motion = np.zeros((frames, 9), dtype=np.float32)
+    motion[:, 0] = np.arange(frames) * speed * frame_time * unit_scale
+    motion[:, 1] = 0.9 * unit_scale
+    return BvhClip(joints=joints, frame_count=frames, frame_time=frame_time, motion=motion)
+
+
+@pytest.mark.parametrize("unit_scale", [1.0, 100.0, 1000.0])
+def test_root_speed_and_travel_are_in_metres(unit_scale):
+    clip = sliding_clip(speed=1.5, unit_scale=unit_scale)
+    stats = compute_motion_stats(clip, analyze_clip(clip))
+    assert stats["root_speed_mean"] == pytest.approx(1.5, rel=1e-4)
+    assert stats["root_speed_peak"] == pytest.approx(1.5, rel=1e-4)
+    assert stats["travel_distance"] == pytest.approx(1.5, rel=1e-4)
+    assert stats["displacement"] == pytest.approx(1.5, rel=1e-4)
+    assert stats["vertical_range"] == pytest.approx(0.0, abs=1e-6)
+    assert stats["extent_y"] == pytest.approx(1.7, rel=1e-4)
+    # Pose figée : aucune activité autour de la racine
+    assert stats["activity"] == pytest.approx(0.0, abs=1e-6)
+
+
+def test_channel_statistics_and_descriptor_sizes():
+    clip = parse_bvh(DATA_DIR / "A_test.bvh")
+    stats = compute_motion_stats(clip, analyze_clip(clip))
+    assert len(stats["channel_min"]) == len(stats["channel_max"]) == clip.channel_count
+    assert len(stats["descriptor"]) == DESCRIPTOR_SIZE
+    assert all(lo <= hi for lo, hi in zip(stats["channel_min"], stats["channel_max"]))
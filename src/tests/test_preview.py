@@ -0,0 +1,44 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from tools.bvh_parser import parse_bvh
+from tools.preview import encode_preview, render_viewer_html
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+
+
+@pytest.fixture(scope="module")
+def clip():
+    return parse_bvh(DATA_DIR / "A_test.bvh")
+
+
+def decode(payload):
+    header = payload.header
+    shape = (header["frameCount"], header["channelCount"])
+    if header["quantization"] == "int16":
+        values = np.frombuffer(payload.buffer, dtype="<i2").reshape(shape)
+        return values * np.asarray(header["scale"]) + np.asarray(header["center"])
+    dtype = "<f2" if header["quantization"] == "float16" else "<f4"
+    return np.frombuffer(payload.buffer, dtype=dtype).reshape(shape)
+
+
+def test_int16_quantization_error_is_below_half_a_step(clip):
+    payload = encode_preview(clip, decimate=1, quantization="int16")
+    error = np.abs(decode(payload) - clip.motion)
+    assert (error <= np.asarray(payload.header["scale"]) * 0.5 + 1e-4).all()
+
+
+def test_decimation_keeps_every_nth_frame(clip):
+    payload = encode_preview(clip, decimate=4, quantization="float32")
+    np.testing.assert_array_equal(decode(payload), clip.motion[::4])
+    assert payload.header["frameTime"] == pytest.approx(clip.frame_time * 4)
+
+
+def test_header_cannot_close_the_script_tag(clip):
+    payload = encode_preview(clip)
+    payload.header["joints"][0]["name"] = "</script>"
+    html = render_viewer_html("__PREVIEW_HEADER_PLACEHOLDER__|__PREVIEW_BUFFER_PLACEHOLDER__", payload)
+    assert "</script>" not in html
+    assert html.endswith(payload.buffer_b64)
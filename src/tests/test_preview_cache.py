@@ -0,0 +1,47 @@
+import os
+from pathlib import Path
+
+from tools.bvh_parser import parse_bvh
+from tools.metadata_cache import file_content_hash
+from tools.preview import encode_preview
+from tools.preview_cache import PreviewCache, preview_key
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+
+
+def test_cache_memory_budget_and_disk_tier(tmp_path):
+    payload = encode_preview(parse_bvh(DATA_DIR / "A_test.bvh"), quantization="float16")
+    cache = PreviewCache(max_bytes=len(payload.buffer) * 3, disk_dir=tmp_path)
+    builds = []
+
+    def build():
+        builds.append(1)
+        return payload
+
+    for key in ("a", "b", "c"):
+        cache.get_or_build(key, build)
+    assert cache.evictions >= 1 and len(builds) == 3
+
+    # Évincé de la mémoire, relu depuis le disque sans reconstruction
+    restored = cache.get_or_build("a", build)
+    assert len(builds) == 3 and cache.disk_hits == 1
+    assert restored.buffer == payload.buffer and restored.header_json == payload.header_json
+
+
+def test_preview_key_includes_window():
+    assert preview_key("h", 2, "int16") == "h_int16_2"
+    assert preview_key("h", 2, "int16", 1.5, None) == "h_int16_2_1.5-end"
+
+
+def test_file_hashes_are_bounded_and_replaced_when_a_file_changes(tmp_path):
+    cache = PreviewCache(max_file_hashes=2)
+    paths = [tmp_path / f"{name}.bvh" for name in "abc"]
+    for path in paths:
+        path.write_bytes(path.name.encode())
+        cache.hash_for_file(path)
+    assert cache.stats()["file_hashes"] == 2
+
+    paths[2].write_bytes(b"changed")
+    os.utime(paths[2], ns=(0, 0))
+    assert cache.hash_for_file(paths[2]) == file_content_hash(paths[2])
+    assert cache.stats()["file_hashes"] == 2
@@ -0,0 +1,79 @@
+import json
+import time
+
+from tools.database import QueryMetrics, QueryStat
+from tools.profiler import Profiler
+
+
+def query(duration_ms: float) -> QueryStat:
+    return QueryStat(statement="SELECT 1", duration_ms=duration_ms, rowcount=1, executemany=False,
+                     timestamp=time.time())
+
+
+def test_queries_count_for_every_enclosing_span(tmp_path):
+    profiler = Profiler(enabled=True, log_path=str(tmp_path / "spans.jsonl"))
+    metrics = QueryMetrics()
+    profiler.watch(metrics)
+    profiler.watch(metrics)  # Un seul listener par moteur
+
+    profiler.start_rerun("main", "s1")
+    metrics.record(query(1.0))
+    with profiler.span("outer"):
+        metrics.record(query(2.0))
+        with profiler.span("inner"):
+            metrics.record(query(4.0))
+    profile = profiler.finish_rerun()
+
+    spans = {span.name: span for span in profile.spans}
+    assert (profile.sql_count, profile.sql_ms) == (3, 7.0)
+    assert (spans["outer"].sql_count, spans["outer"].sql_ms, spans["outer"].depth) == (2, 6.0, 0)
+    assert (spans["inner"].sql_count, spans["inner"].sql_ms, spans["inner"].depth) == (1, 4.0, 1)
+    logged = json.loads((tmp_path / "spans.jsonl").read_text().splitlines()[-1])
+    assert logged["status"] == "complete" and [s["name"] for s in logged["spans"]] == ["outer", "inner"]
+
+
+def test_rerun_left_open_is_closed_as_interrupted():
+    profiler = Profiler(enabled=True, log_path="")
+    profiler.start_rerun("main", "s1")
+    with profiler.span("catalog.page"):
+        pass
+    # st.rerun() : le script repart sans passer par finish_rerun
+    profiler.start_rerun("main", "s1")
+    profiler.finish_rerun()
+
+    statuses = [profile.status for profile in profiler.history(session="s1")]
+    assert statuses == ["complete", "interrupted"]
+
+
+def test_disabled_profiler_records_nothing():
+    profiler = Profiler(enabled=False, log_path="")
+    calls = []
+
+    @profiler.profiled()
+    def work():
+        calls.append(1)
+        return 42
+
+    profiler.start_rerun("main", "s1")
+    with profiler.span("section"):
+        assert work() == 42
+    assert profiler.finish_rerun() is None
+    assert calls == [1] and profiler.history() == []
+
+
+def test_span_percentiles_sum_repeated_calls_per_rerun():
+    profiler = Profiler(enabled=True, log_path="")
+
+    @profiler.profiled("step")
+    def step():
+        pass
+
+    for _ in range(3):
+        profiler.start_rerun("main", "s1")
+        step()
+        step()
+        profiler.finish_rerun()
+
+    rows = {row["name"]: row for row in profiler.span_percentiles("main")}
+    assert rows["step"]["reruns"] == 3 and rows["rerun"]["reruns"] == 3
+    assert rows["step"]["p95_ms"] <= rows["rerun"]["max_ms"]
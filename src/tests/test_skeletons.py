@@ -0,0 +1,44 @@
+from pathlib import Path
+
+from tools.bvh_parser import classify_skeleton, detect_skeleton_type, parse_bvh
+from tools.skeletons import KNOWN_RIGS_DIR, canonical_joint_name, known_rigs, skeleton_fields
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+
+
+def test_namespace_prefix_and_case_are_dropped():
+    assert canonical_joint_name("mixamorig:Hips") == canonical_joint_name("mixamorig1:hips") == "hips"
+
+
+def test_hash_ignores_offsets_but_not_channels():
+    clip = parse_bvh(DATA_DIR / "A_test.bvh", with_motion=False)
+    reference = skeleton_fields(clip)
+    assert reference["skeleton_definition"].count("\n") == len(clip.joints) - 1
+
+    clip.joints[1].offset = tuple(2 * value for value in clip.joints[1].offset)
+    assert skeleton_fields(clip) == reference
+
+    clip.joints[0].channels = list(reversed(clip.joints[0].channels))
+    assert skeleton_fields(clip)["skeleton_hash"] != reference["skeleton_hash"]
+
+
+def test_reference_rigs_are_loaded_by_type():
+    types = {rig["skeleton_type"] for rig in known_rigs().values()}
+    assert {"MIXAMO", "CMU", "BIPED"} <= types
+
+
+def test_known_rig_is_classified_by_hash_without_the_name_heuristic():
+    clip = parse_bvh(KNOWN_RIGS_DIR / "MIXAMO.bvh", with_motion=False)
+    # Même hiérarchie exportée sans préfixe d'espace de noms : l'heuristique ne la reconnaît pas
+    for joint in clip.joints:
+        joint.name = joint.name.split(":", 1)[-1]
+    assert detect_skeleton_type(clip) == "CUSTOM"
+    assert classify_skeleton(clip) == "MIXAMO"
+    assert classify_skeleton(clip, skeleton_fields(clip)["skeleton_hash"]) == "MIXAMO"
+
+
+def test_unknown_rig_falls_back_to_the_name_heuristic(tmp_path):
+    clip = parse_bvh(KNOWN_RIGS_DIR / "CMU.bvh", with_motion=False)
+    clip.joints[0].channels = list(reversed(clip.joints[0].channels))
+    assert skeleton_fields(clip)["skeleton_hash"] not in known_rigs()
+    assert classify_skeleton(clip) == "CMU"
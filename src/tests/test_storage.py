@@ -0,0 +1,61 @@
+import io
+import os
+import time
+
+from tools.metadata_cache import file_content_hash
+from tools.storage import PARTIAL_SUFFIX, remove_stale_partials, save_stream, write_partial
+
+
+def test_same_name_other_content_gets_a_suffix(tmp_path):
+    first = save_stream(io.BytesIO(b"first"), tmp_path, "clip.bvh")
+    second = save_stream(io.BytesIO(b"second"), tmp_path, "clip.bvh")
+
+    assert first.path.name == "clip.bvh" and second.path.name == "clip_1.bvh"
+    assert second.path.read_bytes() == b"second"
+    assert second.content_hash == file_content_hash(second.path)
+
+
+def test_same_content_is_not_written_twice(tmp_path):
+    first = save_stream(io.BytesIO(b"content"), tmp_path, "clip.bvh")
+    again = save_stream(io.BytesIO(b"content"), tmp_path, "clip.bvh")
+
+    assert again.duplicate and again.path == first.path
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["clip.bvh"]
+
+
+def test_find_duplicate_points_to_the_existing_file(tmp_path):
+    existing = tmp_path / "elsewhere.bvh"
+    existing.write_bytes(b"content")
+    saved = save_stream(io.BytesIO(b"content"), tmp_path, "clip.bvh",
+                        find_duplicate=lambda content_hash: str(existing))
+
+    assert saved.duplicate and saved.path == existing
+    assert not (tmp_path / "clip.bvh").exists()
+
+
+def test_client_path_is_reduced_to_its_name(tmp_path):
+    saved = save_stream(io.BytesIO(b"x"), tmp_path / "data", "../../etc/clip.bvh")
+    assert saved.path == tmp_path / "data" / "clip.bvh"
+
+
+def test_remove_stale_partials(tmp_path):
+    stale = tmp_path / f".clip.bvh.abc{PARTIAL_SUFFIX}"
+    fresh = tmp_path / f".clip.bvh.def{PARTIAL_SUFFIX}"
+    for path in (stale, fresh):
+        path.write_bytes(b"x")
+    past = time.time() - 7200
+    os.utime(stale, (past, past))
+
+    assert remove_stale_partials(tmp_path, max_age_seconds=3600) == 1
+    assert fresh.exists() and not stale.exists()
+
+
+def test_write_partial_streams_in_chunks_and_restores_the_position(tmp_path):
+    source = io.BytesIO(b"0123456789")
+    source.seek(7)
+    partial = write_partial(source, tmp_path, "clip.bvh", chunk_size=3)
+
+    assert source.tell() == 7
+    assert partial.path.parent == tmp_path and partial.path.name.endswith(PARTIAL_SUFFIX)
+    assert partial.path.read_bytes() == b"0123456789" and partial.size_bytes == 10
+    assert partial.content_hash == file_content_hash(partial.path)
@@ -0,0 +1,347 @@
+import io
+import math
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+import numpy as np
+
+from models.BvhModels import BVHFileCreate
+from tools.skeletons import known_rig_type, skeleton_fields
+
+# Taille des blocs lus lorsque le flux n'est pas un vrai fichier (ex: upload Streamlit)
+MOTION_CHUNK_SIZE = 4 * 1024 * 1024
+
+FINGER_KEYWORDS = ("finger", "thumb", "index", "middle", "ring", "pinky", "little")
+
+
+class BvhParseError(ValueError):
+    """Erreur levée lorsqu'un fichier BVH est mal formé."""
+
+
+@dataclass
+class BvhJoint:
+    name: str
+    parent: int  # -1 pour la racine
+    offset: tuple
+    channels: list = field(default_factory=list)
+    channel_start: int = 0  # Index de la première colonne de ce joint dans la matrice MOTION
+    end_site: Optional[tuple] = None  # OFFSET du "End Site" éventuel
+
+
+@dataclass
+class BvhClip:
+    joints: list
+    frame_count: int
+    frame_time: float
+    # Matrice (frames x channels) en float32, None si seule la hiérarchie a été lue
+    motion: Optional[np.ndarray] = None
+    # Position (en octets) de la première ligne de données MOTION dans le fichier
+    motion_offset: int = 0
+
+    @property
+    def channel_count(self) -> int:
+        return sum(len(j.channels) for j in self.joints)
+
+    @property
+    def fps(self) -> float:
+        return 1.0 / self.frame_time
+
+    @property
+    def duration_seconds(self) -> float:
+        return self.frame_count * self.frame_time
+
+    @property
+    def joint_names(self) -> list:
+        return [j.name for j in self.joints]
+
+
+def _parse_hierarchy(f: BinaryIO) -> list:
+    """Lit la section HIERARCHY ligne par ligne avec une petite machine à états.
+
+    S'arrête juste après le mot-clé MOTION : le flux est alors positionné
+    sur la ligne "Frames:".
+    """
+    joints = []
+    stack = []  # Pile des index de joints ouverts ('{' rencontrés)
+    pending = None  # Joint ou End Site déclaré, en attente de son '{'
+    in_end_site = False
+    channel_cursor = 0
+    line_no = 0
+
+    for raw in iter(f.readline, b""):
+        line_no += 1
+        tokens = raw.split()
+        if not tokens:
+            continue
+        keyword = tokens[0].upper()
+
+        if keyword == b"HIERARCHY":
+            continue
+        if keyword == b"MOTION":
+            if stack or pending is not None:
+                raise BvhParseError(f"Ligne {line_no}: accolade non fermée avant MOTION")
+            return joints
+
+        if keyword in (b"ROOT", b"JOINT"):
+            if len(tokens) < 2:
+                raise BvhParseError(f"Ligne {line_no}: nom de joint manquant")
+            parent = stack[-1] if stack else -1
+            if keyword == b"JOINT" and parent == -1:
+                raise BvhParseError(f"Ligne {line_no}: JOINT en dehors de ROOT")
+            joints.append(BvhJoint(
+                name=b" ".join(tokens[1:]).decode("utf-8", "replace"),
+                parent=parent,
+                offset=(0.0, 0.0, 0.0),
+            ))
+            pending = len(joints) - 1
+            # Certains exporteurs mettent l'accolade sur la même ligne
+            if tokens[-1] == b"{":
+                joints[-1].name = b" ".join(tokens[1:-1]).decode("utf-8", "replace")
+                stack.append(pending)
+                pending = None
+        elif keyword == b"END":
+            if not stack:
+                raise BvhParseError(f"Ligne {line_no}: End Site en dehors d'un joint")
+            pending = "end"
+            if tokens[-1] == b"{":
+                in_end_site = True
+                pending = None
+        elif keyword == b"{":
+            if pending == "end":
+                in_end_site = True
+            elif pending is not None:
+                stack.append(pending)
+            else:
+                raise BvhParseError(f"Ligne {line_no}: '{{' inattendu")
+            pending = None
+        elif keyword == b"}":
+            if in_end_site:
+                in_end_site = False
+            elif stack:
+                stack.pop()
+            else:
+                raise BvhParseError(f"Ligne {line_no}: '}}' inattendu")
+        elif keyword == b"OFFSET":
+            try:
+                offset = tuple(float(v) for v in tokens[1:4])
+            except ValueError:
+                raise BvhParseError(f"Ligne {line_no}: OFFSET invalide")
+            if len(offset) != 3:
+                raise BvhParseError(f"Ligne {line_no}: OFFSET incomplet")
+            if in_end_site:
+                joints[stack[-1]].end_site = offset
+            elif stack:
+                joints[stack[-1]].offset = offset
+            else:
+                raise BvhParseError(f"Ligne {line_no}: OFFSET hors d'un joint")
+        elif keyword == b"CHANNELS":
+            if not stack or in_end_site:
+                raise BvhParseError(f"Ligne {line_no}: CHANNELS hors d'un joint")
+            count = int(tokens[1])
+            names = [t.decode("ascii") for t in tokens[2:2 + count]]
+            if len(names) != count:
+                raise BvhParseError(f"Ligne {line_no}: nombre de canaux incohérent")
+            joint = joints[stack[-1]]
+            joint.channels = names
+            joint.channel_start = channel_cursor
+            channel_cursor += count
+        else:
+            raise BvhParseError(f"Ligne {line_no}: mot-clé inconnu '{tokens[0].decode('ascii', 'replace')}'")
+
+    raise BvhParseError("Section MOTION introuvable")
+
+
+def _read_motion_header(f: BinaryIO) -> tuple:
+    """Lit les lignes 'Frames:' et 'Frame Time:' qui suivent MOTION."""
+    values = {}
+    while len(values) < 2:
+        raw = f.readline()
+        if not raw:
+            raise BvhParseError("En-tête MOTION incomplet")
+        line = raw.strip()
+        if not line:
+            continue
+        key, _, value = line.partition(b":")
+        values[key.strip().lower()] = value.strip()
+
+    try:
+        frame_count = int(values[b"frames"])
+        frame_time = float(values[b"frame time"])
+    except (KeyError, ValueError):
+        raise BvhParseError("Lignes 'Frames:' / 'Frame Time:' invalides")
+    if frame_count <= 0 or frame_time <= 0:
+        raise BvhParseError("Nombre de frames ou Frame Time non positif")
+    return frame_count, frame_time
+
+
+def _read_motion(f: BinaryIO, frame_count: int, channel_count: int) -> np.ndarray:
+    """Lit le bloc MOTION directement dans une matrice float32 pré-allouée.
+
+    Sur un vrai fichier, NumPy parse le texte en C depuis la position
+    courante (aucune liste Python de floats). Sur un flux en mémoire, on lit
+    par blocs bornés de MOTION_CHUNK_SIZE octets.
+    """
+    expected = frame_count * channel_count
+    try:
+        f.fileno()
+        is_real_file = True
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        is_real_file = False
+
+    if is_real_file:
+        # Resynchronise le descripteur avec la position du buffer Python
+        f.seek(f.tell())
+        data = np.fromfile(f, dtype=np.float32, count=expected, sep=" ")
+    else:
+        data = np.empty(expected, dtype=np.float32)
+        filled = 0
+        remainder = b""
+        while filled < expected:
+            chunk = f.read(MOTION_CHUNK_SIZE)
+            if not chunk:
+                block = remainder
+                remainder = b""
+            else:
+                block = remainder + chunk
+                # Coupe sur le dernier séparateur pour ne pas scinder un nombre
+                cut = max(block.rfind(b" "), block.rfind(b"\n"), block.rfind(b"\t"))
+                if cut < 0:
+                    remainder = block
+                    continue
+                block, remainder = block[:cut], block[cut:]
+            if block.strip():
+                values = np.fromstring(block, dtype=np.float32, sep=" ")
+                take = min(values.size, expected - filled)
+                data[filled:filled + take] = values[:take]
+                filled += take
+            if not chunk:
+                break
+        data = data[:filled]
+
+    if data.size != expected:
+        raise BvhParseError(
+            f"Bloc MOTION tronqué: {data.size} valeurs lues, {expected} attendues"
+        )
+    return data.reshape(frame_count, channel_count)
+
+
+def parse_bvh_stream(f: BinaryIO, with_motion: bool = True) -> BvhClip:
+    """Parse un flux BVH binaire (fichier ouvert en 'rb' ou BytesIO).
+
+    Args:
+        f: Le flux positionné au début du fichier
+        with_motion: Si False, ne lit que la hiérarchie et l'en-tête MOTION
+
+    Returns:
+        Un BvhClip
+    """
+    joints = _parse_hierarchy(f)
+    if not joints:
+        raise BvhParseError("Aucun joint dans la hiérarchie")
+    frame_count, frame_time = _read_motion_header(f)
+    clip = BvhClip(joints=joints, frame_count=frame_count, frame_time=frame_time, motion_offset=f.tell())
+    if with_motion:
+        clip.motion = _read_motion(f, frame_count, clip.channel_count)
+    return clip
+
+
+def parse_bvh(path, with_motion: bool = True) -> BvhClip:
+    """Parse un fichier BVH depuis le disque.
+
+    Args:
+        path: Chemin du fichier .bvh
+        with_motion: Si False, ne lit que la hiérarchie et l'en-tête MOTION
+
+    Returns:
+        Un BvhClip
+    """
+    with open(path, "rb") as f:
+        return parse_bvh_stream(f, with_motion=with_motion)
+
+
+def classify_skeleton(clip: BvhClip, skeleton_hash: Optional[str] = None) -> str:
+    """Type du squelette : celui du rig de référence de même hash, sinon deviné par detect_skeleton_type.
+
+    Args:
+        clip: Clip parsé (la hiérarchie suffit)
+        skeleton_hash: Hash de la hiérarchie s'il est déjà calculé
+    """
+    if skeleton_hash is None:
+        skeleton_hash = skeleton_fields(clip)["skeleton_hash"]
+    return known_rig_type(skeleton_hash) or detect_skeleton_type(clip)
+
+
+def detect_skeleton_type(clip: BvhClip) -> str:
+    """Devine le type de squelette à partir des noms de joints.
+
+    Ne sert que pour un rig inconnu : ni rig de référence (tools.skeletons),
+    ni squelette déjà présent dans la table skeletons, qui impose son type à
+    l'insertion (recherche par hash).
+    """
+    names = [n.lower() for n in clip.joint_names]
+    if any(n.startswith("mixamorig") for n in names):
+        return "MIXAMO"
+    if any(n.startswith("bip01") or n.startswith("bip001") for n in names):
+        return "BIPED"
+    if "lowerback" in names and "lhipjoint" in names:
+        return "CMU"
+    return "CUSTOM"
+
+
+def has_fingers(clip: BvhClip) -> bool:
+    names = [n.lower() for n in clip.joint_names]
+    return any(keyword in name for name in names for keyword in FINGER_KEYWORDS)
+
+
+def build_bvh_file_create(path: Path, clip: Optional[BvhClip] = None, kinematics=None,
+                          with_stats: bool = True) -> BVHFileCreate:
+    """Construit un BVHFileCreate à partir des vraies valeurs du fichier BVH.
+
+    Args:
+        path: Chemin du fichier .bvh
+        clip: Clip déjà parsé avec sa matrice MOTION (évite de relire le fichier)
+        kinematics: Résultat de analyze_clip(clip) s'il est déjà calculé
+        with_stats: Calcule aussi les statistiques de mouvement (champ motion_stats)
+
+    Returns:
+        Un BVHFileCreate rempli avec les métadonnées extraites
+    """
+    # Imports locaux : tools.kinematics et tools.motion_stats dépendent de ce module
+    from tools.kinematics import analyze_clip, height_in_metres
+    from tools.motion_stats import compute_motion_stats
+
+    path = Path(path)
+    if clip is None or clip.motion is None:
+        # La cinématique (hauteur de repos, bouclage) a besoin de toutes les frames
+        clip = parse_bvh(path)
+        kinematics = None
+    if kinematics is None:
+        kinematics = analyze_clip(clip)
+
+    skeleton = skeleton_fields(clip)
+    model = BVHFileCreate(
+        # Nom de fichier
+        original_filename=path.name,
+        file_path=str(path.absolute()),
+
+        # Infos techniques
+        file_size_kb=math.ceil(path.stat().st_size / 1024),
+        duration_seconds=round(clip.duration_seconds, 3),
+        frame_count=clip.frame_count,
+        frame_time=round(clip.frame_time, 6),
+        fps=round(clip.fps, 2),
+
+        # Structure
+        skeleton_type=classify_skeleton(clip, skeleton["skeleton_hash"]),
+        bone_count=len(clip.joints),
+        has_fingers=has_fingers(clip),
+        rest_pose_height=height_in_metres(kinematics.rest_pose_height),
+        **skeleton,
+
+        # Animation
+        loopable=kinematics.loopable,
+    )
+    if with_stats:
+        model.motion_stats = compute_motion_stats(clip, kinematics)
+    return model
@@ -0,0 +1,219 @@
+"""Lecture aléatoire des frames d'un BVH via mmap et un index des lignes MOTION.
+
+L'index (offset en octets du début de chaque frame) est construit une fois
+par un balayage vectorisé des '\\n', puis persisté dans INDEX_DIR : les
+lectures suivantes ne parsent que les lignes demandées. Un index est nommé
+d'après le hash du contenu du fichier quand il est connu, ce qui permet de le
+supprimer avec la ligne en base ; le dossier est borné à INDEX_MAX_BYTES (les
+index les moins récemment utilisés sont supprimés en premier).
+"""
+import hashlib
+import mmap
+import os
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from tools.bvh_parser import BvhClip, BvhParseError, parse_bvh_stream
+
+DEFAULT_INDEX_DIR = os.getenv("FRAME_INDEX_DIR", ".cache/frame_index")
+DEFAULT_INDEX_MAX_BYTES = int(os.getenv("FRAME_INDEX_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Taille des blocs balayés pour trouver les fins de ligne (borne la mémoire)
+SCAN_CHUNK_SIZE = 64 * 1024 * 1024
+
+
+def slice_clip(clip: BvhClip, start: int = 0, stop: Optional[int] = None, step: int = 1) -> BvhClip:
+    """Renvoie un clip restreint aux frames [start:stop:step] (vue, sans copie)."""
+    motion = clip.motion[start:stop:step]
+    return BvhClip(
+        joints=clip.joints,
+        frame_count=motion.shape[0],
+        frame_time=clip.frame_time * step,
+        motion=motion,
+    )
+
+
+def prune_frame_indexes(index_dir=DEFAULT_INDEX_DIR, max_bytes: int = DEFAULT_INDEX_MAX_BYTES) -> int:
+    """Supprime les index les plus anciens jusqu'à repasser sous max_bytes.
+
+    Args:
+        index_dir: Dossier des index de frames
+        max_bytes: Taille totale maximale des index conservés
+
+    Returns:
+        Le nombre d'index supprimés
+    """
+    files = []
+    for path in Path(index_dir).glob("*.npy"):
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            continue
+        files.append((st.st_mtime_ns, st.st_size, path))
+    total = sum(size for _, size, _ in files)
+    removed = 0
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+        removed += 1
+    return removed
+
+
+def remove_frame_indexes(content_hashes, index_dir=DEFAULT_INDEX_DIR) -> int:
+    """Supprime les index des fichiers dont le contenu n'est plus référencé.
+
+    Args:
+        content_hashes: Hashes de contenu dont l'index doit disparaître
+        index_dir: Dossier des index de frames
+
+    Returns:
+        Le nombre d'index supprimés
+    """
+    removed = 0
+    for content_hash in content_hashes:
+        try:
+            (Path(index_dir) / f"{content_hash}.npy").unlink()
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+class BvhFrameReader:
+    """Accès aux frames d'un fichier BVH sans charger tout le bloc MOTION.
+
+    Usage:
+        with BvhFrameReader(path) as reader:
+            window = reader.frames(1200, 1400)
+    """
+
+    def __init__(self, path, index_dir=DEFAULT_INDEX_DIR, content_hash: Optional[str] = None,
+                 max_index_bytes: int = DEFAULT_INDEX_MAX_BYTES):
+        self.path = Path(path)
+        self.content_hash = content_hash
+        self.max_index_bytes = max_index_bytes
+        self._file = open(self.path, "rb")
+        try:
+            self.header = parse_bvh_stream(self._file, with_motion=False)
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        self.index_dir = Path(index_dir) if index_dir else None
+        self.line_offsets = self._load_or_build_index()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+    @property
+    def frame_count(self) -> int:
+        return self.header.frame_count
+
+    @property
+    def frame_time(self) -> float:
+        return self.header.frame_time
+
+    def _index_path(self) -> Optional[Path]:
+        if not self.index_dir:
+            return None
+        if self.content_hash:
+            return self.index_dir / f"{self.content_hash}.npy"
+        st = self.path.stat()
+        key = f"{self.path.absolute()}|{st.st_size}|{st.st_mtime_ns}"
+        return self.index_dir / f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.npy"
+
+    def _load_or_build_index(self) -> np.ndarray:
+        index_path = self._index_path()
+        if index_path is not None and index_path.exists():
+            offsets = np.load(index_path)
+            if offsets.shape == (self.frame_count + 1,):
+                # mtime = dernier usage, pour l'éviction de prune_frame_indexes
+                os.utime(index_path)
+                return offsets
+
+        offsets = self._build_index()
+        if index_path is not None:
+            index_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = index_path.with_suffix(".tmp.npy")
+            np.save(tmp_path, offsets)
+            os.replace(tmp_path, index_path)
+            prune_frame_indexes(self.index_dir, self.max_index_bytes)
+        return offsets
+
+    def _build_index(self) -> np.ndarray:
+        """Offsets des débuts de lignes MOTION (+ fin de la dernière ligne)."""
+        size = len(self._mmap)
+        start = self.header.motion_offset
+        starts = [np.array([start], dtype=np.int64)]
+        found = 1
+        position = start
+        while position < size and found <= self.frame_count:
+            end = min(position + SCAN_CHUNK_SIZE, size)
+            chunk = np.frombuffer(self._mmap, dtype=np.uint8, count=end - position, offset=position)
+            newlines = np.flatnonzero(chunk == 10).astype(np.int64) + position + 1
+            starts.append(newlines)
+            found += newlines.size
+            position = end
+            del chunk  # Libère la vue avant une éventuelle fermeture du mmap
+
+        offsets = np.concatenate(starts)
+        # Une ligne vide (ex: '\n' final) n'est pas une frame
+        lengths = np.diff(np.append(offsets, size))
+        offsets = offsets[(lengths > 1) & (offsets < size)]
+        if offsets.size < self.frame_count:
+            raise BvhParseError(
+                f"Bloc MOTION tronqué: {offsets.size} lignes trouvées, {self.frame_count} attendues"
+            )
+        ends = np.append(offsets[1:], size)[:self.frame_count]
+        return np.append(offsets[:self.frame_count], ends[-1])
+
+    def frames(self, start: int = 0, stop: Optional[int] = None, step: int = 1) -> np.ndarray:
+        """Lit les frames [start:stop:step] en float32 (frames x channels).
+
+        Seules les lignes demandées sont parsées ; le reste du fichier n'est
+        pas touché (hormis les pages du mmap lues par le système).
+        """
+        indices = range(*slice(start, stop, step).indices(self.frame_count))
+        channels = self.header.channel_count
+        if not indices:
+            return np.empty((0, channels), dtype=np.float32)
+
+        if indices.step == 1:
+            # Lignes contiguës : un seul bloc d'octets
+            text = self._mmap[self.line_offsets[indices.start]:self.line_offsets[indices.stop]]
+        else:
+            starts = self.line_offsets[indices.start:indices.stop:indices.step]
+            ends = self.line_offsets[indices.start + 1:indices.stop + 1:indices.step]
+            text = b"\n".join(self._mmap[s:e] for s, e in zip(starts, ends))
+
+        data = np.fromstring(text, dtype=np.float32, sep=" ")
+        if data.size != len(indices) * channels:
+            raise BvhParseError(f"Frames {start}:{stop} mal formées dans {self.path.name}")
+        return data.reshape(len(indices), channels)
+
+    def frames_between(self, start_seconds: float, end_seconds: Optional[float] = None, step: int = 1) -> np.ndarray:
+        """Lit les frames comprises entre deux instants (en secondes)."""
+        start = max(0, int(round(start_seconds / self.frame_time)))
+        stop = None if end_seconds is None else int(round(end_seconds / self.frame_time))
+        return self.frames(start, stop, step)
+
+    def clip(self, start: int = 0, stop: Optional[int] = None, step: int = 1) -> BvhClip:
+        """Renvoie un BvhClip limité aux frames [start:stop:step]."""
+        motion = self.frames(start, stop, step)
+        return BvhClip(
+            joints=self.header.joints,
+            frame_count=motion.shape[0],
+            frame_time=self.frame_time * step,
+            motion=motion,
+        )
@@ -0,0 +1,286 @@
+"""Chargement paginé et filtré du catalogue BVH.
+
+La pagination se fait par "keyset" (WHERE (tri, id) > (dernière valeur, dernier id))
+plutôt que par OFFSET : le coût d'une page ne dépend pas de sa position,
+même avec des centaines de milliers de lignes. Les colonnes de tri nullables
+sont triées sur une clé sans NULL (CATALOG_SORT_KEYS, NULL = +infini) indexée
+avec l'id : la condition et l'ordre correspondent exactement à l'index, parcouru
+dans un sens ou dans l'autre. Les lignes sans valeur viennent donc en dernier
+en tri croissant et en premier en tri décroissant.
+"""
+import re
+from dataclasses import dataclass, field, fields
+from typing import Optional
+
+import pandas
+from sqlalchemy import Engine, select, func, or_, tuple_, text, cast, literal, false
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from sqlalchemy.sql.util import ClauseAdapter
+
+from tools.db_tools import (
+    BVHFile, BVHMotionStats, Skeleton, SEARCH_CONFIG, CATALOG_SORT_KEYS, CATALOG_SORT_NULL_VALUES, search_tsvector
+)
+
+# En dessous de ce nombre de lignes, le COUNT(*) exact est assez rapide
+ESTIMATE_THRESHOLD = 100_000
+
+# Colonnes proposées pour le tri (chacune a un index composite (colonne ou clé de tri, id))
+SORT_COLUMNS = {
+    "id": BVHFile.id,
+    "uploaded_at": BVHFile.uploaded_at,
+    "original_filename": BVHFile.original_filename,
+    "fps": BVHFile.fps,
+    "duration_seconds": BVHFile.duration_seconds,
+}
+
+# Statistiques de mouvement filtrables par intervalle (chacune indexée dans bvh_motion_stats)
+MOTION_STAT_COLUMNS = {
+    "root_speed_mean": BVHMotionStats.root_speed_mean,
+    "root_speed_peak": BVHMotionStats.root_speed_peak,
+    "travel_distance": BVHMotionStats.travel_distance,
+    "vertical_range": BVHMotionStats.vertical_range,
+    "activity": BVHMotionStats.activity,
+}
+
+
+@dataclass(frozen=True)
+class CatalogFilters:
+    styles: tuple = field(default_factory=tuple)
+    skeleton_types: tuple = field(default_factory=tuple)
+    # Rigs (ids de la table skeletons) : jointure indexée sur bvh.skeleton_id
+    skeleton_ids: tuple = field(default_factory=tuple)
+    genders: tuple = field(default_factory=tuple)
+    fps_min: Optional[float] = None
+    fps_max: Optional[float] = None
+    loopable: Optional[bool] = None
+    # Intervalles sur les statistiques de mouvement : ((clé de MOTION_STAT_COLUMNS, min ou None, max ou None), ...)
+    motion_ranges: tuple = field(default_factory=tuple)
+    # Recherche dans la description et le nom / chemin de fichier
+    search: Optional[str] = None
+    # Ajoute la recherche par sous-chaîne et par similarité (fautes de frappe), nécessite pg_trgm
+    trigram: bool = False
+
+    def is_empty(self) -> bool:
+        # trigram ne fait que modifier la recherche, ce n'est pas un filtre en soi
+        return not any(getattr(self, f.name) not in (None, (), "") for f in fields(self) if f.name != "trigram")
+
+
+# Caractère d'échappement des LIKE ("!" plutôt que "\\" qui dépend de standard_conforming_strings
+# quand la requête est compilée avec ses valeurs, comme dans tools.export)
+LIKE_ESCAPE = "!"
+
+
+def _escape_like(value: str) -> str:
+    return value.replace(LIKE_ESCAPE, LIKE_ESCAPE * 2).replace("%", f"{LIKE_ESCAPE}%").replace("_", f"{LIKE_ESCAPE}_")
+
+
+def search_tsquery(query: str):
+    """tsquery "tous les mots, en préfixe" : 'zomb wal' trouve 'zombie walk'."""
+    terms = re.findall(r"\w+", query.lower())
+    if not terms:
+        return None
+    return func.to_tsquery(cast(literal(SEARCH_CONFIG), REGCONFIG), " & ".join(f"{term}:*" for term in terms))
+
+
+def search_condition(query: str, trigram: bool = False):
+    """Condition de recherche sur la description et le nom / chemin de fichier.
+
+    Sans pg_trgm, seule la recherche plein texte (index GIN tsvector) est
+    utilisée. Avec pg_trgm, on y ajoute la sous-chaîne sur nom et chemin et
+    la similarité sur le nom ; chaque branche du OR a son propre index GIN,
+    que PostgreSQL combine en BitmapOr.
+    """
+    conditions = []
+    tsquery = search_tsquery(query)
+    if tsquery is not None:
+        conditions.append(search_tsvector().op("@@")(tsquery))
+    if trigram:
+        pattern = f"%{_escape_like(query)}%"
+        conditions += [
+            BVHFile.original_filename.ilike(pattern, escape=LIKE_ESCAPE),
+            BVHFile.file_path.ilike(pattern, escape=LIKE_ESCAPE),
+            # Opérateur de similarité de pg_trgm (seuil pg_trgm.similarity_threshold, 0.3 par défaut)
+            BVHFile.original_filename.op("%")(query),
+        ]
+    return or_(*conditions) if conditions else false()
+
+
+def apply_filters(stmt, filters: CatalogFilters):
+    """Ajoute les clauses WHERE correspondant aux filtres à une requête sur BVHFile."""
+    if filters.styles:
+        stmt = stmt.where(BVHFile.animation_style.in_(filters.styles))
+    if filters.skeleton_types:
+        stmt = stmt.where(BVHFile.skeleton_type.in_(filters.skeleton_types))
+    if filters.skeleton_ids:
+        stmt = stmt.where(BVHFile.skeleton_id.in_(filters.skeleton_ids))
+    if filters.genders:
+        stmt = stmt.where(BVHFile.actor_gender.in_(filters.genders))
+    if filters.fps_min is not None:
+        stmt = stmt.where(BVHFile.fps >= filters.fps_min)
+    if filters.fps_max is not None:
+        stmt = stmt.where(BVHFile.fps <= filters.fps_max)
+    if filters.loopable is not None:
+        stmt = stmt.where(BVHFile.loopable.is_(filters.loopable))
+    for stat, low, high in filters.motion_ranges:
+        column = MOTION_STAT_COLUMNS[stat]
+        bounds = [column >= low] if low is not None else []
+        if high is not None:
+            bounds.append(column <= high)
+        # Les entrées sans statistiques (pas encore calculées) sont exclues
+        stmt = stmt.where(BVHFile.id.in_(select(BVHMotionStats.bvh_id).where(*bounds)))
+    if filters.search and filters.search.strip():
+        stmt = stmt.where(search_condition(filters.search.strip(), filters.trigram))
+    return stmt
+
+
+def sort_key(sort_by: str):
+    """Expression triée pour une colonne de SORT_COLUMNS (jamais NULL, identique à celle de l'index)."""
+    return CATALOG_SORT_KEYS.get(sort_by, SORT_COLUMNS[sort_by])
+
+
+def catalog_order_by(sort_by: str = "id", descending: bool = False) -> tuple:
+    """Clauses ORDER BY (clé de tri, id) correspondant à un tri du catalogue."""
+    id_order = BVHFile.id.desc() if descending else BVHFile.id.asc()
+    if sort_by == "id":
+        return (id_order,)
+    key = sort_key(sort_by)
+    return (key.desc() if descending else key.asc(), id_order)
+
+
+def _keyset_condition(sort_by: str, after: tuple, descending: bool):
+    """Condition "après la dernière ligne vue" : une comparaison de lignes (clé, id)."""
+    last_value, last_id = after
+    if sort_by == "id":
+        return BVHFile.id < last_id if descending else BVHFile.id > last_id
+    # Curseur d'une ligne sans valeur : sa clé est la valeur de remplacement des NULL
+    value = CATALOG_SORT_NULL_VALUES[sort_by] if last_value is None else literal(last_value, SORT_COLUMNS[sort_by].type)
+    key, after_key = tuple_(sort_key(sort_by), BVHFile.id), tuple_(value, last_id)
+    return key < after_key if descending else key > after_key
+
+
+def fetch_catalog_page(engine: Engine, filters: CatalogFilters, sort_by: str = "id",
+                       descending: bool = False, after: Optional[tuple] = None, limit: int = 100):
+    """Charge une page du catalogue.
+
+    Args:
+        engine: Le moteur de base de données SQLAlchemy
+        filters: Les filtres à appliquer
+        sort_by: Nom de la colonne de tri (clé de SORT_COLUMNS)
+        descending: Tri décroissant
+        after: Curseur (valeur de tri, id) de la dernière ligne de la page précédente
+        limit: Nombre de lignes par page
+
+    Returns:
+        Tuple (DataFrame de la page, curseur de la page suivante ou None)
+    """
+    stmt = apply_filters(select(BVHFile), filters)
+    if after is not None:
+        stmt = stmt.where(_keyset_condition(sort_by, after, descending))
+    order_by = catalog_order_by(sort_by, descending)
+    if filters.search:
+        # Le nombre de résultats d'une recherche est mal estimé : PostgreSQL peut préférer
+        # parcourir l'index de tri en testant chaque ligne (toute la table pour un mot rare).
+        # OFFSET 0 l'empêche de fusionner la sous-requête : les résultats sont lus par
+        # l'index GIN, puis triés.
+        matches = stmt.offset(0).subquery("matches")
+        stmt = select(matches)
+        order_by = [ClauseAdapter(matches).traverse(clause) for clause in order_by]
+    # Une ligne de plus pour savoir s'il existe une page suivante
+    stmt = stmt.order_by(*order_by).limit(limit + 1)
+
+    df = pandas.read_sql_query(sql=stmt, con=engine)
+    next_cursor = None
+    if len(df) > limit:
+        df = df.iloc[:limit]
+        last = df.iloc[-1]
+        last_value = last[sort_by]
+        next_cursor = (None if pandas.isna(last_value) else _to_python(last_value), int(last["id"]))
+    return df, next_cursor
+
+
+def _to_python(value):
+    """Convertit une valeur NumPy/Pandas en valeur Python pour la requête suivante."""
+    if isinstance(value, pandas.Timestamp):
+        return value.to_pydatetime()
+    return value.item() if hasattr(value, "item") else value
+
+
+def count_catalog(engine: Engine, filters: CatalogFilters) -> tuple:
+    """Compte les lignes correspondant aux filtres.
+
+    Sans filtre, on lit l'estimation des statistiques PostgreSQL (instantané)
+    plutôt qu'un COUNT(*) qui parcourt toute la table.
+
+    Returns:
+        Tuple (nombre de lignes, True si c'est une estimation)
+    """
+    with engine.connect() as conn:
+        if filters.is_empty() and engine.dialect.name == "postgresql":
+            estimate = conn.execute(
+                text("SELECT reltuples::bigint FROM pg_class WHERE oid = 'bvh'::regclass")
+            ).scalar()
+            # reltuples vaut -1 tant que la table n'a jamais été analysée ;
+            # sur une petite table le COUNT(*) exact reste négligeable
+            if estimate is not None and estimate >= ESTIMATE_THRESHOLD:
+                return int(estimate), True
+        stmt = apply_filters(select(func.count()).select_from(BVHFile), filters)
+        return conn.execute(stmt).scalar_one(), False
+
+
+def get_filter_options(engine: Engine) -> dict:
+    """Valeurs proposées dans les filtres (styles, types de squelette, rigs).
+
+    "skeletons" est une liste de lignes (id, skeleton_type, joint_count, clips),
+    les rigs les plus utilisés en premier.
+    """
+    with engine.connect() as conn:
+        styles = conn.execute(
+            select(BVHFile.animation_style).where(BVHFile.animation_style.is_not(None))
+            .distinct().order_by(BVHFile.animation_style)
+        ).scalars().all()
+        skeleton_types = conn.execute(
+            select(BVHFile.skeleton_type).where(BVHFile.skeleton_type.is_not(None))
+            .distinct().order_by(BVHFile.skeleton_type)
+        ).scalars().all()
+        clips = func.count(BVHFile.id).label("clips")
+        skeletons = conn.execute(
+            select(Skeleton.id, Skeleton.skeleton_type, Skeleton.joint_count, clips)
+            .outerjoin(BVHFile, BVHFile.skeleton_id == Skeleton.id)
+            .group_by(Skeleton.id).order_by(clips.desc(), Skeleton.id)
+        ).all()
+    return {"styles": styles, "skeleton_types": skeleton_types, "skeletons": skeletons}
+
+
+# Colonnes pour lesquelles search_facets renvoie des comptes
+FACET_COLUMNS = {
+    "animation_style": BVHFile.animation_style,
+    "skeleton_type": BVHFile.skeleton_type,
+}
+
+
+def search_facets(engine: Engine, filters: CatalogFilters) -> dict:
+    """Nombre de résultats par valeur de chaque colonne de FACET_COLUMNS, en une requête.
+
+    Un GROUP BY GROUPING SETS calcule tous les regroupements sur le même
+    parcours des lignes filtrées ; GROUPING() indique à quel regroupement
+    appartient chaque ligne du résultat.
+
+    Returns:
+        Dictionnaire {colonne: {valeur: nombre}} (valeur None = non renseigné), trié par nombre décroissant
+    """
+    columns = list(FACET_COLUMNS.values())
+    stmt = apply_filters(
+        select(*columns, *(func.grouping(c) for c in columns), func.count()).select_from(BVHFile),
+        filters,
+    ).group_by(func.grouping_sets(*(tuple_(c) for c in columns)))
+
+    facets = {name: {} for name in FACET_COLUMNS}
+    names = list(FACET_COLUMNS)
+    with engine.connect() as conn:
+        for row in conn.execute(stmt):
+            values, grouping, count = row[:len(columns)], row[len(columns):-1], row[-1]
+            # GROUPING(c) = 0 pour la colonne regroupée dans ce grouping set
+            index = list(grouping).index(0)
+            facets[names[index]][values[index]] = count
+    return {name: dict(sorted(counts.items(), key=lambda item: -item[1])) for name, counts in facets.items()}
+
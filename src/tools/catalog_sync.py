@@ -0,0 +1,297 @@
+"""Rafraîchissement incrémental du catalogue à partir du suivi des modifications.
+
+Les triggers créés par ensure_schema tiennent à jour bvh.updated_at, écrivent
+un tombstone (bvh_tombstone) pour chaque ligne supprimée et envoient un NOTIFY
+sur CHANGE_CHANNEL à chaque écriture.
+
+Un CatalogTracker (partagé par toutes les sessions) calcule un jeton de
+version du catalogue par une requête de quelques index, et rien du tout
+quand l'écoute LISTEN est active et qu'aucune notification n'est arrivée.
+Une page déjà affichée n'est relue que si le jeton a changé : les lignes
+modifiées depuis son chargement sont alors lues (delta, au plus une page
+plus une ligne), appliquées à la page si possible, sinon la page est
+rechargée.
+
+Configuration par variables d'environnement :
+    CATALOG_LISTEN                  écoute LISTEN/NOTIFY (défaut 1)
+    CATALOG_SYNC_OVERLAP_SECONDS    marge relue à chaque delta (défaut 10)
+    CATALOG_TOMBSTONE_RETENTION_DAYS durée de conservation des tombstones (défaut 7)
+
+Limite : updated_at est l'heure d'écriture de la ligne, pas celle du commit.
+Une transaction validée plus de CATALOG_SYNC_OVERLAP_SECONDS après ses
+écritures peut échapper au delta ; la page sera à jour au prochain
+rechargement (changement de page, de filtre...).
+"""
+import logging
+import os
+import select
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+import pandas
+from sqlalchemy import Engine, select as sql_select, func, delete
+
+from tools.catalog import CatalogFilters
+from tools.db_tools import BVHFile, BVHTombstone, CHANGE_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+LISTEN_ENABLED = os.getenv("CATALOG_LISTEN", "1") not in ("0", "false", "False", "")
+SYNC_OVERLAP = timedelta(seconds=float(os.getenv("CATALOG_SYNC_OVERLAP_SECONDS", "10")))
+TOMBSTONE_RETENTION = timedelta(days=float(os.getenv("CATALOG_TOMBSTONE_RETENTION_DAYS", "7")))
+
+# Délai avant de rouvrir la connexion d'écoute après une erreur
+LISTEN_RETRY_SECONDS = 5
+
+
+@dataclass(frozen=True)
+class ChangeToken:
+    """Version du catalogue : dernière modification / suppression connue.
+
+    Les compteurs de lignes récentes (dans la marge SYNC_OVERLAP) font changer
+    le jeton même si une transaction lente a écrit une date antérieure au max.
+    """
+    updated_at: Optional[datetime]
+    recent_updates: int
+    deleted_at: Optional[datetime]
+    recent_deletes: int
+
+
+@dataclass
+class CatalogDelta:
+    rows: pandas.DataFrame  # Lignes insérées ou modifiées (toutes les colonnes de bvh)
+    deleted_ids: list
+    elapsed_ms: float
+    # Plus de limit lignes modifiées ou supprimées : le delta est incomplet
+    overflow: bool = False
+
+    @property
+    def empty(self) -> bool:
+        return self.rows.empty and not self.deleted_ids
+
+
+@dataclass
+class CatalogPage:
+    key: tuple  # (filtres, tri, curseur de début...) : toute autre clé impose un rechargement
+    df: pandas.DataFrame
+    next_cursor: Optional[tuple]
+    token: ChangeToken
+    loaded_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+def fetch_change_token(engine: Engine) -> ChangeToken:
+    """Lit la version du catalogue (max et comptages servis par les index sur les dates)."""
+    updated_max = sql_select(func.max(BVHFile.updated_at)).scalar_subquery()
+    deleted_max = sql_select(func.max(BVHTombstone.deleted_at)).scalar_subquery()
+    stmt = sql_select(
+        updated_max,
+        sql_select(func.count()).where(BVHFile.updated_at > updated_max - SYNC_OVERLAP).scalar_subquery(),
+        deleted_max,
+        sql_select(func.count()).where(BVHTombstone.deleted_at > deleted_max - SYNC_OVERLAP).scalar_subquery(),
+    )
+    with engine.connect() as conn:
+        return ChangeToken(*conn.execute(stmt).one())
+
+
+def fetch_changes(engine: Engine, since: ChangeToken, limit: int) -> CatalogDelta:
+    """Lignes modifiées et ids supprimés depuis le jeton since (marge SYNC_OVERLAP incluse).
+
+    La marge peut renvoyer des lignes déjà connues : appliquer un delta est idempotent.
+
+    Args:
+        engine: Moteur SQLAlchemy
+        since: Jeton de la page ; since.updated_at ne doit pas être None (catalogue vide au
+            chargement : pas de delta possible, la page se recharge)
+        limit: Nombre maximal de lignes lues par requête ; au-delà, delta.overflow est vrai
+    """
+    if since.updated_at is None:
+        raise ValueError("Pas de delta sans date de dernière modification")
+    start = time.perf_counter()
+    # limit + 1 : une ligne de trop suffit à savoir qu'il faut recharger la page
+    stmt = (sql_select(BVHFile)
+            .where(BVHFile.updated_at > since.updated_at - SYNC_OVERLAP)
+            .limit(limit + 1))
+    deleted_stmt = sql_select(BVHTombstone.bvh_id).limit(limit + 1)
+    if since.deleted_at is not None:
+        deleted_stmt = deleted_stmt.where(BVHTombstone.deleted_at > since.deleted_at - SYNC_OVERLAP)
+    with engine.connect() as conn:
+        rows = pandas.read_sql_query(sql=stmt, con=conn)
+        deleted_ids = list(conn.execute(deleted_stmt).scalars())
+    return CatalogDelta(rows=rows, deleted_ids=deleted_ids, elapsed_ms=(time.perf_counter() - start) * 1000,
+                        overflow=len(rows) > limit or len(deleted_ids) > limit)
+
+
+def prune_tombstones(engine: Engine, retention: timedelta = TOMBSTONE_RETENTION) -> int:
+    """Supprime les tombstones plus anciens que retention."""
+    with engine.begin() as conn:
+        result = conn.execute(
+            delete(BVHTombstone).where(BVHTombstone.deleted_at < func.now() - retention)
+        )
+        return result.rowcount
+
+
+def apply_delta(page: CatalogPage, delta: CatalogDelta, filters: CatalogFilters,
+                sort_by: str) -> Optional[pandas.DataFrame]:
+    """Applique un delta à une page déjà chargée.
+
+    Les lignes supprimées sont retirées et les lignes modifiées remplacées sur
+    place. Quand le delta peut changer la composition ou l'ordre de la page
+    (nouvelle ligne, ligne d'une autre page, valeur de tri modifiée, filtres
+    actifs), on renonce.
+
+    Returns:
+        Le DataFrame mis à jour, ou None si la page doit être rechargée
+    """
+    df = page.df
+    page_ids = set(df["id"])
+    changed = delta.rows[~delta.rows["id"].isin(delta.deleted_ids)]
+    if not changed.empty:
+        if not set(changed["id"]) <= page_ids or not filters.is_empty():
+            return None
+        current = df.set_index("id")
+        updated = changed.set_index("id")[current.columns.intersection(changed.columns)]
+        if sort_by != "id":
+            before, after = current.loc[updated.index, sort_by], updated[sort_by]
+            if not ((before == after) | (before.isna() & after.isna())).all():
+                return None
+        current.loc[updated.index, updated.columns] = updated
+        df = current.reset_index()[df.columns]
+    if delta.deleted_ids:
+        df = df[~df["id"].isin(delta.deleted_ids)].reset_index(drop=True)
+    return df
+
+
+class ChangeListener:
+    """Thread LISTEN sur CHANGE_CHANNEL, sur une connexion dédiée (hors du pool)."""
+
+    def __init__(self, engine: Engine, channel: str = CHANGE_CHANNEL):
+        self.engine = engine
+        self.channel = channel
+        self.connected = False
+        self.notifications = 0
+        self._changed = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="catalog-listen", daemon=True)
+        self._thread.start()
+
+    def consume(self) -> bool:
+        """True si une notification est arrivée depuis le dernier appel."""
+        if self._changed.is_set():
+            self._changed.clear()
+            return True
+        return False
+
+    def _run(self):
+        while not self._stop.is_set():
+            connection = None
+            try:
+                connection = self.engine.raw_connection()
+                dbapi_connection = connection.driver_connection
+                # La connexion ne retourne jamais dans le pool
+                connection.detach()
+                dbapi_connection.autocommit = True
+                with dbapi_connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {self.channel}")
+                self.connected = True
+                # Des notifications ont pu être perdues pendant la reconnexion
+                self._changed.set()
+                while not self._stop.is_set():
+                    if select.select([dbapi_connection], [], [], 1.0) == ([], [], []):
+                        continue
+                    dbapi_connection.poll()
+                    if dbapi_connection.notifies:
+                        self.notifications += len(dbapi_connection.notifies)
+                        dbapi_connection.notifies.clear()
+                        self._changed.set()
+            except Exception as e:
+                logger.warning("Écoute de %s interrompue: %s", self.channel, e)
+            finally:
+                self.connected = False
+                if connection is not None:
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
+            self._stop.wait(LISTEN_RETRY_SECONDS)
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=5)
+
+
+class CatalogTracker:
+    """Jeton de version du catalogue et rafraîchissement incrémental des pages.
+
+    Partagé par toutes les sessions : l'état propre à une session (page
+    affichée, dernière synchro) reste dans st.session_state.
+
+    Usage:
+        tracker = CatalogTracker(engine)
+        page, sync = tracker.refresh_page(previous_page, key, fetch, filters, sort_by, page_size)
+    """
+
+    def __init__(self, engine: Engine, listen: bool = LISTEN_ENABLED):
+        self.engine = engine
+        self.listener = ChangeListener(engine) if listen else None
+        self._token = None
+        self._lock = threading.Lock()
+        self.token_queries = 0
+        prune_tombstones(engine)
+
+    def token(self) -> ChangeToken:
+        """Version courante du catalogue ; sans requête si l'écoute est active et silencieuse."""
+        with self._lock:
+            listening = self.listener is not None and self.listener.connected
+            # consume() avant la requête : une notification reçue pendant la lecture
+            # provoquera une nouvelle lecture au prochain appel
+            if self._token is None or not listening or self.listener.consume():
+                self._token = fetch_change_token(self.engine)
+                self.token_queries += 1
+            return self._token
+
+    def invalidate(self):
+        """Force la relecture du jeton (après une écriture faite par cette instance)."""
+        with self._lock:
+            self._token = None
+
+    def refresh_page(self, page: Optional[CatalogPage], key: tuple, fetch: Callable[[], tuple],
+                     filters: CatalogFilters, sort_by: str, page_size: int) -> tuple:
+        """Page à afficher pour key, en relisant le moins possible.
+
+        Args:
+            page: Page gardée dans la session (ou None)
+            key: Clé de la page demandée
+            fetch: Fonction () -> (DataFrame, curseur suivant) qui charge la page depuis la base
+            filters: Filtres de la page (un delta n'est pas appliqué sur une page filtrée)
+            sort_by: Colonne de tri de la page
+            page_size: Taille de page ; un delta de plus de page_size lignes recharge la page
+
+        Returns:
+            Tuple (CatalogPage, dict de synchro: status "cache" | "delta" | "reload", rows, deleted, elapsed_ms)
+        """
+        start = time.perf_counter()
+        token = self.token()
+        sync = {"status": "reload"}
+        if page is not None and page.key == key:
+            if page.token == token:
+                sync = {"status": "cache", "rows": 0, "deleted": 0}
+            elif (page.token.updated_at is not None
+                  and datetime.now(timezone.utc) - page.loaded_at < TOMBSTONE_RETENTION):
+                delta = fetch_changes(self.engine, page.token, limit=page_size)
+                df = None if delta.overflow else apply_delta(page, delta, filters, sort_by)
+                if df is not None:
+                    page = CatalogPage(key=key, df=df, next_cursor=page.next_cursor, token=token)
+                    sync = {"status": "delta", "rows": len(delta.rows), "deleted": len(delta.deleted_ids)}
+        if sync["status"] == "reload":
+            df, next_cursor = fetch()
+            page = CatalogPage(key=key, df=df, next_cursor=next_cursor, token=token)
+            sync["rows"], sync["deleted"] = len(df), 0
+        sync["elapsed_ms"] = (time.perf_counter() - start) * 1000
+        return page, sync
+
+    def shutdown(self):
+        if self.listener is not None:
+            self.listener.stop()
@@ -0,0 +1,343 @@
+"""Découpe et rééchantillonnage de clips BVH, écrits dans de nouveaux fichiers.
+
+Rééchantillonnage : les canaux de position sont interpolés linéairement ;
+les rotations de chaque joint sont converties de leurs angles d'Euler (dans
+l'ordre de ses CHANNELS) en quaternions, interpolées par slerp puis
+reconverties dans le même ordre. Tout est vectorisé sur les frames, seule la
+boucle sur les joints est en Python (comme tools.kinematics).
+
+Le fichier est écrit par blocs de frames dans un fichier temporaire, haché au
+passage, puis publié comme un fichier envoyé (voir tools.storage).
+
+Usage (depuis src/):
+    python -m tools.clip_edit data/A_test.bvh data/B_test.bvh --start 40 --stop 200 --fps 30
+"""
+import argparse
+import hashlib
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from tools.bvh_parser import BvhClip, build_bvh_file_create, parse_bvh
+from tools.bvh_reader import slice_clip
+from tools.file_catalog import DEFAULT_DATA_DIR
+from tools.kinematics import ROTATION_AXES
+from tools.metadata_cache import HASH_ALGORITHM
+from tools.storage import SavedFile, partial_file, publish_file
+
+DEFAULT_OUTPUT_DIR = os.getenv("CLIP_EDIT_DIR", str(Path(DEFAULT_DATA_DIR) / "edits"))
+
+# Frames formatées et écrites à la fois
+WRITE_CHUNK_FRAMES = 2048
+# Précision des valeurs écrites dans le bloc MOTION (celle des exports courants)
+VALUE_FORMAT = "%.6f"
+INDENT = "\t"
+
+# Permutations paires des axes : le signe des formules de conversion en dépend
+_EVEN_ORDERS = {(0, 1, 2), (1, 2, 0), (2, 0, 1)}
+
+
+@dataclass(frozen=True)
+class ClipEdit:
+    """Découpe [start, stop) en frames de la source, puis rééchantillonnage à fps (None = inchangé)."""
+    path: str
+    start: int = 0
+    stop: Optional[int] = None
+    fps: Optional[float] = None
+
+    def output_name(self) -> str:
+        stem = Path(self.path).stem
+        parts = [stem]
+        if self.start or self.stop is not None:
+            parts.append(f"f{self.start}-{'end' if self.stop is None else self.stop}")
+        if self.fps:
+            parts.append(f"{self.fps:g}fps")
+        return "_".join(parts) + ".bvh"
+
+
+def euler_to_quaternions(angles_deg: np.ndarray, axes: list) -> np.ndarray:
+    """Quaternions (N, 4) (w, x, y, z) des rotations d'Euler intrinsèques (N, k), comme euler_to_matrices."""
+    half = np.deg2rad(angles_deg) / 2
+    result = np.zeros((angles_deg.shape[0], 4))
+    result[:, 0] = 1.0
+    for column, axis in enumerate(axes):
+        rotation = np.zeros_like(result)
+        rotation[:, 0] = np.cos(half[:, column])
+        rotation[:, 1 + axis] = np.sin(half[:, column])
+        result = quaternion_multiply(result, rotation)
+    return result
+
+
+def quaternion_multiply(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    aw, ax, ay, az = a.T
+    bw, bx, by, bz = b.T
+    return np.stack([
+        aw * bw - ax * bx - ay * by - az * bz,
+        aw * bx + ax * bw + ay * bz - az * by,
+        aw * by - ax * bz + ay * bw + az * bx,
+        aw * bz + ax * by - ay * bx + az * bw,
+    ], axis=1)
+
+
+def quaternions_to_euler(quaternions: np.ndarray, axes: list) -> np.ndarray:
+    """Angles d'Euler (N, 3) en degrés, dans l'ordre intrinsèque axes (3 axes distincts)."""
+    w, x, y, z = quaternions.T
+    matrix = np.empty((quaternions.shape[0], 3, 3))
+    matrix[:, 0, 0] = 1 - 2 * (y * y + z * z)
+    matrix[:, 0, 1] = 2 * (x * y - w * z)
+    matrix[:, 0, 2] = 2 * (x * z + w * y)
+    matrix[:, 1, 0] = 2 * (x * y + w * z)
+    matrix[:, 1, 1] = 1 - 2 * (x * x + z * z)
+    matrix[:, 1, 2] = 2 * (y * z - w * x)
+    matrix[:, 2, 0] = 2 * (x * z - w * y)
+    matrix[:, 2, 1] = 2 * (y * z + w * x)
+    matrix[:, 2, 2] = 1 - 2 * (x * x + y * y)
+    i, j, k = axes
+    sign = 1.0 if tuple(axes) in _EVEN_ORDERS else -1.0
+    # R = Ri @ Rj @ Rk
+    middle = np.arcsin(np.clip(sign * matrix[:, i, k], -1.0, 1.0))
+    first = np.arctan2(-sign * matrix[:, j, k], matrix[:, k, k])
+    last = np.arctan2(-sign * matrix[:, i, j], matrix[:, i, i])
+    return np.rad2deg(np.stack([first, middle, last], axis=1))
+
+
+def slerp(q0: np.ndarray, q1: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Interpolation sphérique entre deux séries de quaternions (N, 4), poids (N,) dans [0, 1]."""
+    dot = (q0 * q1).sum(axis=1)
+    # q et -q sont la même rotation : on prend le plus court chemin
+    q1 = np.where(dot[:, None] < 0, -q1, q1)
+    dot = np.abs(dot)
+    theta = np.arccos(np.clip(dot, -1.0, 1.0))
+    sin_theta = np.sin(theta)
+    # Quaternions presque égaux : l'interpolation linéaire suffit et évite la division par ~0
+    linear = sin_theta < 1e-6
+    safe = np.where(linear, 1.0, sin_theta)
+    w0 = np.where(linear, 1 - weights, np.sin((1 - weights) * theta) / safe)
+    w1 = np.where(linear, weights, np.sin(weights * theta) / safe)
+    result = w0[:, None] * q0 + w1[:, None] * q1
+    return result / np.linalg.norm(result, axis=1, keepdims=True)
+
+
+def resample_clip(clip: BvhClip, fps: float) -> BvhClip:
+    """Rééchantillonne un clip à fps, de sa première à sa dernière frame.
+
+    Returns:
+        Un nouveau BvhClip (matrice float32) de même hiérarchie
+    """
+    if fps <= 0:
+        raise ValueError(f"Fréquence invalide: {fps}")
+    motion = np.asarray(clip.motion, dtype=np.float64)
+    frames = motion.shape[0]
+    # Frame Time tel qu'il sera écrit dans le fichier
+    frame_time = float(f"{1.0 / fps:.6f}")
+    span = (frames - 1) * clip.frame_time
+    count = int(math.floor(span / frame_time + 1e-6)) + 1
+    source_position = np.minimum(np.arange(count) * frame_time / clip.frame_time, frames - 1)
+    before = np.floor(source_position).astype(np.int64)
+    after = np.minimum(before + 1, frames - 1)
+    weights = source_position - before
+
+    result = (motion[before] * (1 - weights[:, None]) + motion[after] * weights[:, None])
+    for joint in clip.joints:
+        rotations = [(joint.channel_start + i, ROTATION_AXES[name])
+                     for i, name in enumerate(joint.channels) if name in ROTATION_AXES]
+        axes = [axis for _, axis in rotations]
+        # Un ou deux axes (ou un axe répété) : l'interpolation linéaire des angles est exacte ou suffisante
+        if len(rotations) != 3 or len(set(axes)) != 3:
+            continue
+        columns = [column for column, _ in rotations]
+        quaternions = euler_to_quaternions(motion[:, columns], axes)
+        angles = quaternions_to_euler(slerp(quaternions[before], quaternions[after], weights), axes)
+        # Même rotation, angles ramenés au plus près de la source (pas de saut de 360° dans le fichier)
+        reference = motion[before][:, columns]
+        result[:, columns] = angles + 360.0 * np.round((reference - angles) / 360.0)
+    return BvhClip(joints=clip.joints, frame_count=count, frame_time=frame_time,
+                   motion=result.astype(np.float32))
+
+
+def edit_clip(clip: BvhClip, start: int = 0, stop: Optional[int] = None, fps: Optional[float] = None) -> BvhClip:
+    """Découpe [start, stop) puis rééchantillonne si fps est donné."""
+    edited = slice_clip(clip, start, stop)
+    if edited.frame_count == 0:
+        raise ValueError(f"Intervalle de frames vide: {start}:{stop} sur {clip.frame_count} frame(s)")
+    if fps and abs(fps - clip.fps) > 1e-6:
+        edited = resample_clip(edited, fps)
+    return edited
+
+
+def hierarchy_lines(clip: BvhClip):
+    """Lignes de la section HIERARCHY (la hiérarchie est imbriquée selon les parents)."""
+    children = {}
+    for index, joint in enumerate(clip.joints):
+        children.setdefault(joint.parent, []).append(index)
+
+    def offset(values):
+        return " ".join(f"{value:.6f}" for value in values)
+
+    def walk(index, depth):
+        joint = clip.joints[index]
+        pad = INDENT * depth
+        yield f"{pad}{'ROOT' if joint.parent < 0 else 'JOINT'} {joint.name}"
+        yield f"{pad}{{"
+        yield f"{pad}{INDENT}OFFSET {offset(joint.offset)}"
+        yield f"{pad}{INDENT}CHANNELS {len(joint.channels)} {' '.join(joint.channels)}"
+        for child in children.get(index, []):
+            yield from walk(child, depth + 1)
+        if joint.end_site is not None:
+            yield f"{pad}{INDENT}End Site"
+            yield f"{pad}{INDENT}{{"
+            yield f"{pad}{INDENT * 2}OFFSET {offset(joint.end_site)}"
+            yield f"{pad}{INDENT}}}"
+        yield f"{pad}}}"
+
+    yield "HIERARCHY"
+    for root in children.get(-1, []):
+        yield from walk(root, 0)
+
+
+def write_bvh(clip: BvhClip, out, chunk_frames: int = WRITE_CHUNK_FRAMES) -> int:
+    """Écrit un clip au format BVH dans un fichier binaire, par blocs de chunk_frames frames.
+
+    Returns:
+        Le nombre d'octets écrits
+    """
+    header = "\n".join(hierarchy_lines(clip)) + (
+        f"\nMOTION\nFrames: {clip.frame_count}\nFrame Time: {clip.frame_time:.6f}\n"
+    )
+    written = out.write(header.encode("ascii"))
+    row_format = " ".join([VALUE_FORMAT] * clip.channel_count) + "\n"
+    for start in range(0, clip.frame_count, chunk_frames):
+        chunk = clip.motion[start:start + chunk_frames]
+        # Un seul formatage (en C) pour tout le bloc
+        written += out.write(((row_format * len(chunk)) % tuple(chunk.ravel().tolist())).encode("ascii"))
+    return written
+
+
+class _HashingWriter:
+    """Fichier binaire qui hache ce qui y est écrit."""
+
+    def __init__(self, f):
+        self.f = f
+        self.digest = hashlib.new(HASH_ALGORITHM)
+
+    def write(self, data: bytes) -> int:
+        self.digest.update(data)
+        return self.f.write(data)
+
+
+def save_clip(clip: BvhClip, dest_dir, filename: str, find_duplicate=None) -> SavedFile:
+    """Écrit un clip dans dest_dir/filename (écriture atomique, nom suffixé si pris).
+
+    Returns:
+        Un SavedFile (duplicate=True si un fichier de même contenu existait déjà)
+    """
+    dest_dir = Path(dest_dir)
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = partial_file(dest_dir, filename)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            writer = _HashingWriter(f)
+            size = write_bvh(clip, writer)
+            f.flush()
+            os.fsync(f.fileno())
+        return publish_file(tmp_path, dest_dir, filename, writer.digest.hexdigest(), size, find_duplicate)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+
+def run_edit(edit: ClipEdit, dest_dir=DEFAULT_OUTPUT_DIR) -> tuple:
+    """Applique une découpe / un rééchantillonnage et écrit le résultat (tâche du pool de processus).
+
+    Returns:
+        Tuple (ClipEdit, BVHFileCreate du fichier écrit ou None, SavedFile ou None, erreur ou None)
+    """
+    try:
+        source = parse_bvh(edit.path)
+        clip = edit_clip(source, edit.start, edit.stop, edit.fps)
+        saved = save_clip(clip, dest_dir, edit.output_name())
+        model = build_bvh_file_create(saved.path, clip)
+        model.content_hash = saved.content_hash
+        model.description = (f"Dérivé de {Path(edit.path).name}: frames {edit.start}:"
+                             f"{'' if edit.stop is None else edit.stop}, {model.fps:g} fps")
+        return edit, model, saved, None
+    except Exception as e:
+        return edit, None, None, f"{type(e).__name__}: {e}"
+
+
+def process_edits(edits: list, dest_dir=DEFAULT_OUTPUT_DIR, workers: int = None, engine=None, log=print) -> dict:
+    """Applique une liste de ClipEdit, en parallèle dans un pool de processus, et enregistre les résultats.
+
+    Args:
+        edits: Liste de ClipEdit
+        dest_dir: Répertoire des fichiers créés
+        workers: Nombre de processus (défaut: nombre de CPU ; un seul fichier est traité sans pool)
+        engine: Moteur SQLAlchemy ; si donné, les fichiers créés sont enregistrés dans la table bvh
+        log: Fonction utilisée pour afficher la progression
+
+    Returns:
+        Un dictionnaire de statistiques (written, duplicates, registered, failures, elapsed)
+    """
+    start = time.perf_counter()
+    if len(edits) == 1 or workers == 1:
+        results = [run_edit(edit, dest_dir) for edit in edits]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(run_edit, edits, [dest_dir] * len(edits)))
+
+    models = []
+    failures = []
+    duplicates = 0
+    for edit, model, saved, error in results:
+        if error:
+            failures.append((edit.path, error))
+            log(f"  ❌ {edit.path}: {error}")
+            continue
+        duplicates += saved.duplicate
+        models.append(model)
+        log(f"  {saved.path.name}: {model.frame_count} frame(s) à {model.fps:g} fps"
+            + (" (fichier identique existant)" if saved.duplicate else ""))
+
+    registered = 0
+    if engine is not None and models:
+        from tools.db_tools import get_registered_content_hashes, bulk_insert_bvh_files
+
+        # Un fichier identique à un fichier déjà enregistré n'est pas enregistré deux fois
+        known_hashes = get_registered_content_hashes(engine)
+        registered = bulk_insert_bvh_files(engine, [model for model in models if model.content_hash not in known_hashes])
+    return {"written": len(models) - duplicates, "duplicates": duplicates, "registered": registered,
+            "failures": failures, "elapsed": time.perf_counter() - start}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Découpe et rééchantillonne des fichiers BVH")
+    parser.add_argument("paths", nargs="+", type=Path, help="Fichiers .bvh source")
+    parser.add_argument("--start", type=int, default=0, help="Première frame gardée")
+    parser.add_argument("--stop", type=int, default=None, help="Frame de fin (exclue)")
+    parser.add_argument("--fps", type=float, default=None, help="Nouvelle fréquence (ex: 30, 60)")
+    parser.add_argument("--out", type=Path, default=Path(DEFAULT_OUTPUT_DIR), help="Répertoire des fichiers créés")
+    parser.add_argument("--workers", type=int, default=None, help="Nombre de processus (défaut: nombre de CPU)")
+    parser.add_argument("--no-register", action="store_true", help="Écrit les fichiers sans les enregistrer en base")
+    args = parser.parse_args(argv)
+
+    engine = None
+    if not args.no_register:
+        from tools.db_tools import get_postgis_connection
+        engine = get_postgis_connection()
+
+    edits = [ClipEdit(str(path.absolute()), args.start, args.stop, args.fps) for path in args.paths]
+    stats = process_edits(edits, args.out, args.workers, engine)
+    print(f"{stats['written']} fichier(s) écrit(s), {stats['duplicates']} identique(s) existant(s), "
+          f"{stats['registered']} enregistré(s) en base en {stats['elapsed']:.1f}s")
+    return 1 if stats["failures"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+"""Accès à la base : moteur avec pool configuré, sessions et métriques SQL.
+
+Configuration par variables d'environnement (en plus des POSTGRES_*) :
+    DB_POOL_SIZE            connexions gardées ouvertes (défaut 5)
+    DB_MAX_OVERFLOW         connexions supplémentaires temporaires (défaut 10)
+    DB_POOL_TIMEOUT         attente max d'une connexion libre, en s (défaut 30)
+    DB_POOL_RECYCLE         durée de vie max d'une connexion, en s (défaut 1800)
+    DB_STATEMENT_TIMEOUT_MS timeout PostgreSQL par requête, 0 = aucun (défaut 30000)
+    DB_SLOW_QUERY_MS        seuil de log des requêtes lentes (défaut 500)
+"""
+import logging
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy import URL, Engine, create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "500"))
+
+# Nombre de requêtes gardées en mémoire pour les statistiques
+METRICS_HISTORY = 5000
+
+
+@dataclass
+class QueryStat:
+    statement: str
+    duration_ms: float
+    rowcount: int
+    executemany: bool
+    timestamp: float
+
+
+class QueryMetrics:
+    """Collecte la latence et le nombre de lignes de chaque requête d'un moteur.
+
+    Les listeners (fonction QueryStat -> None) sont appelés après chaque
+    requête : log, affichage, export...
+    """
+
+    def __init__(self, history: int = METRICS_HISTORY):
+        self._stats = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._listeners = []
+        self.total_queries = 0
+        self.total_ms = 0.0
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self._listeners.remove(listener)
+
+    def record(self, stat: QueryStat):
+        with self._lock:
+            self._stats.append(stat)
+            self.total_queries += 1
+            self.total_ms += stat.duration_ms
+        for listener in list(self._listeners):
+            listener(stat)
+
+    def recent(self, limit: int = 100) -> list:
+        """Les dernières requêtes, de la plus récente à la plus ancienne."""
+        with self._lock:
+            stats = list(self._stats)
+        return stats[::-1][:limit]
+
+    def summary(self) -> dict:
+        """Statistiques sur les requêtes gardées en mémoire."""
+        with self._lock:
+            durations = np.array([stat.duration_ms for stat in self._stats])
+            rows = sum(max(stat.rowcount, 0) for stat in self._stats)
+        if durations.size == 0:
+            return {"queries": self.total_queries, "avg_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0,
+                    "max_ms": 0.0, "rows": 0}
+        return {
+            "queries": self.total_queries,
+            "avg_ms": float(durations.mean()),
+            "p50_ms": float(np.percentile(durations, 50)),
+            "p95_ms": float(np.percentile(durations, 95)),
+            "max_ms": float(durations.max()),
+            "rows": rows,
+        }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self.total_queries = 0
+            self.total_ms = 0.0
+
+
+_metrics = weakref.WeakKeyDictionary()
+
+
+def _log_slow_query(stat: QueryStat):
+    if stat.duration_ms >= SLOW_QUERY_MS:
+        logger.warning("Requête lente (%.0f ms, %d ligne(s)): %s",
+                       stat.duration_ms, stat.rowcount, " ".join(stat.statement.split())[:300])
+
+
+def instrument_engine(engine: Engine) -> QueryMetrics:
+    """Branche la mesure de latence / nombre de lignes sur un moteur."""
+    metrics = QueryMetrics()
+    metrics.add_listener(_log_slow_query)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["query_start"].pop()
+        metrics.record(QueryStat(
+            statement=statement,
+            duration_ms=(time.perf_counter() - start) * 1000,
+            rowcount=cursor.rowcount,
+            executemany=executemany,
+            timestamp=time.time(),
+        ))
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        # Une requête en erreur n'atteint pas after_cursor_execute
+        if context.connection is not None and context.connection.info.get("query_start"):
+            context.connection.info["query_start"].pop()
+
+    _metrics[engine] = metrics
+    return metrics
+
+
+def database_url() -> URL:
+    return URL.create(
+        "postgresql",
+        username=os.getenv('POSTGRES_USER'),
+        password=os.getenv('POSTGRES_PASSWORD'),
+        host=os.getenv('POSTGRES_HOST', os.getenv('POSTGRES_HOST_LOCALHOST')),
+        port=os.getenv('POSTGRES_PORT'),
+        database=os.getenv('POSTGRES_DB'),
+    )
+
+
+def create_db_engine(url=None, statement_timeout_ms: int = STATEMENT_TIMEOUT_MS, **pool_options) -> Engine:
+    """Crée un moteur avec un pool explicite et les métriques SQL branchées.
+
+    Args:
+        url: URL de connexion (par défaut construite depuis POSTGRES_*)
+        statement_timeout_ms: Timeout PostgreSQL par requête (0 = aucun)
+        **pool_options: Surcharge de pool_size, max_overflow, pool_timeout, pool_recycle
+
+    Returns:
+        Un Engine SQLAlchemy
+    """
+    options = {
+        "pool_size": POOL_SIZE,
+        "max_overflow": MAX_OVERFLOW,
+        "pool_timeout": POOL_TIMEOUT,
+        "pool_recycle": POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+    options.update(pool_options)
+    connect_args = {}
+    if statement_timeout_ms:
+        connect_args["options"] = f"-c statement_timeout={int(statement_timeout_ms)}"
+
+    engine = create_engine(url or database_url(), connect_args=connect_args, **options)
+    instrument_engine(engine)
+    return engine
+
+
+def get_metrics(engine: Engine) -> QueryMetrics:
+    """Métriques SQL d'un moteur créé par create_db_engine."""
+    return _metrics[engine]
+
+
+_session_factories = weakref.WeakKeyDictionary()
+_session_factories_lock = threading.Lock()
+
+
+def get_session_factory(engine: Engine) -> sessionmaker:
+    """sessionmaker réutilisable, un par moteur."""
+    with _session_factories_lock:
+        factory = _session_factories.get(engine)
+        if factory is None:
+            factory = sessionmaker(bind=engine, expire_on_commit=False)
+            _session_factories[engine] = factory
+        return factory
+
+
+@contextmanager
+def session_scope(engine: Engine) -> Session:
+    """Session transactionnelle : commit en sortie, rollback en cas d'erreur."""
+    session = get_session_factory(engine)()
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
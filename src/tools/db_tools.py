@@ -3,15 +3,23 @@ import os
 import uuid
 import enum
 
+import pandas
 from dotenv import load_dotenv
 from sqlalchemy import (
-    Column, Integer, String, Boolean, Numeric, Text,
-    DateTime, func, Index, Enum as SAEnum, URL, create_engine, Engine
+    Column, Integer, BigInteger, String, Boolean, Numeric, Text, ForeignKey,
+    DateTime, Float, REAL, func, Index, Enum as SAEnum, Engine,
+    select, insert, update, delete, inspect, text, values, column, cast, case, literal, literal_column, or_
 )
-from sqlalchemy.dialects.postgresql import UUID, ARRAY
-from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.dialects.postgresql import UUID, ARRAY, REGCONFIG, insert as pg_insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import declarative_base
 
 from models.BvhModels import BVHFileCreate
+from tools.bvh_reader import remove_frame_indexes
+from tools.database import create_db_engine, session_scope
+from tools.motion_stats import STATS_VERSION
+from tools.profiler import profiler
+from tools.skeletons import known_rigs
 
 load_dotenv()
 
@@ -24,6 +32,24 @@ class GenderEnum(str, enum.Enum):
     Other = "Other"
 
 
+class Skeleton(Base):
+    __tablename__ = 'skeletons'
+
+    # Une ligne par hiérarchie distincte (forme canonique, voir tools.skeletons),
+    # partagée par toutes les captures faites sur ce rig
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    hierarchy_hash = Column(String(64), nullable=False, unique=True)
+    # Type du rig (MIXAMO, CMU, BIPED, CUSTOM...) : imposé aux captures qui le référencent
+    skeleton_type = Column(String(50))
+    joint_count = Column(Integer)
+    has_fingers = Column(Boolean, default=False)
+    definition = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<Skeleton(id={self.id}, type='{self.skeleton_type}', joints={self.joint_count})>"
+
+
 class BVHFile(Base):
     __tablename__ = 'bvh'
 
@@ -39,6 +65,9 @@ class BVHFile(Base):
     original_filename = Column(String(255), nullable=False)
     # 'func.now()' utilise l'heure du serveur DB
     uploaded_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Date de dernière modification, tenue à jour par le trigger bvh_touch_updated_at
+    # (y compris pour les UPDATE faits hors de l'application)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # 3. INFOS TECHNIQUES
     file_size_kb = Column(Integer)
@@ -49,6 +78,7 @@ class BVHFile(Base):
     fps = Column(Numeric(5, 2))
 
     # 4. STRUCTURE DU SQUELETTE
+    skeleton_id = Column(Integer, ForeignKey('skeletons.id', ondelete='SET NULL'))
     skeleton_type = Column(String(50))
     bone_count = Column(Integer)
     has_fingers = Column(Boolean, default=False)
@@ -63,117 +93,495 @@ class BVHFile(Base):
 
     loopable = Column(Boolean, default=False)
 
+    # 6. DÉDOUBLONNAGE
+    # Hash sha256 du contenu : un même fichier sous un autre nom n'est enregistré qu'une fois
+    content_hash = Column(String(64))
+
     # DÉFINITION DES INDEX
     __table_args__ = (
         # Index standard sur le style
         Index('idx_bvh_style', 'animation_style'),
         # Index standard sur les FPS
         Index('idx_bvh_fps', 'fps'),
+        # Recherche des doublons par contenu
+        Index('idx_bvh_content_hash', 'content_hash'),
+        # Filtres du catalogue paginé
+        Index('idx_bvh_skeleton_type', 'skeleton_type'),
+        # Toutes les captures d'un rig (jointure skeletons -> bvh)
+        Index('idx_bvh_skeleton_id', 'skeleton_id'),
+        Index('idx_bvh_actor_gender', 'actor_gender'),
+        # Tri + pagination keyset (colonne, id) ; colonnes nullables : voir CATALOG_SORT_KEYS
+        Index('idx_bvh_filename_id', 'original_filename', 'id'),
+        # Synchronisation incrémentale du catalogue (lignes modifiées depuis ...)
+        Index('idx_bvh_updated_at', 'updated_at'),
     )
 
     def __repr__(self):
         return f"<BVHFile(id={self.id}, name='{self.original_filename}', style='{self.animation_style}')>"
 
 
+# Configuration texte de la recherche plein texte : 'simple' ne dépend pas de la langue
+# (descriptions en français et en anglais), sans racinisation ni mots vides
+SEARCH_CONFIG = 'simple'
+
+
+def search_tsvector():
+    """Expression tsvector de la recherche (identique à celle de l'index GIN).
+
+    Contient les mots de la description et ceux du nom de fichier (découpé sur
+    la ponctuation), pour que la recherche par nom reste indexée même sans pg_trgm.
+    """
+    filename_words = func.regexp_replace(BVHFile.original_filename, '[^[:alnum:]]+', ' ', 'g')
+    document = func.coalesce(BVHFile.description, '').concat(' ').concat(filename_words)
+    return func.to_tsvector(cast(literal(SEARCH_CONFIG), REGCONFIG), document)
+
+
+# Recherche plein texte (description + nom de fichier)
+Index('idx_bvh_search_fts', search_tsvector(), postgresql_using='gin')
+
+# Clés de tri du catalogue des colonnes nullables : NULL remplacé par +infini. La clé
+# n'est jamais NULL, donc (clé, id) > (valeur, id) est une comparaison de lignes que
+# l'index (clé, id) sert par un parcours d'intervalle, dans les deux sens de tri
+CATALOG_SORT_NULL_VALUES = {
+    'uploaded_at': literal_column("'infinity'::timestamptz", DateTime(timezone=True)),
+    'fps': literal_column("'Infinity'::numeric", Numeric),
+    'duration_seconds': literal_column("'Infinity'::numeric", Numeric),
+}
+CATALOG_SORT_KEYS = {
+    name: func.coalesce(getattr(BVHFile, name), null_value, type_=null_value.type)
+    for name, null_value in CATALOG_SORT_NULL_VALUES.items()
+}
+
+Index('idx_bvh_uploaded_at_key', CATALOG_SORT_KEYS['uploaded_at'], BVHFile.id)
+Index('idx_bvh_fps_key', CATALOG_SORT_KEYS['fps'], BVHFile.id)
+Index('idx_bvh_duration_key', CATALOG_SORT_KEYS['duration_seconds'], BVHFile.id)
+
+# Index (colonne, id) remplacés par les index des clés de tri, supprimés par ensure_schema
+OBSOLETE_INDEXES = ('idx_bvh_uploaded_at_id', 'idx_bvh_fps_id', 'idx_bvh_duration_id')
+
+# Index trigrammes (ILIKE '%...%' et similarité) : ils nécessitent l'extension pg_trgm,
+# ils sont donc créés à part par ensure_trigram_indexes et pas par create_all
+TRIGRAM_INDEXES = {
+    'idx_bvh_filename_trgm': 'CREATE INDEX IF NOT EXISTS idx_bvh_filename_trgm ON bvh USING gin (original_filename gin_trgm_ops)',
+    'idx_bvh_file_path_trgm': 'CREATE INDEX IF NOT EXISTS idx_bvh_file_path_trgm ON bvh USING gin (file_path gin_trgm_ops)',
+}
+
+
+class BVHArchive(Base):
+    __tablename__ = 'bvh_archive'
+
+    # Une archive binaire (.bvha) par entrée bvh, supprimée avec elle
+    bvh_id = Column(Integer, ForeignKey('bvh.id', ondelete='CASCADE'), primary_key=True)
+    archive_path = Column(String(512), nullable=False)
+    size_bytes = Column(BigInteger)
+    format_version = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<BVHArchive(bvh_id={self.bvh_id}, path='{self.archive_path}')>"
+
+
+class BVHMotionStats(Base):
+    __tablename__ = 'bvh_motion_stats'
+
+    # Statistiques de mouvement d'une entrée bvh (voir tools.motion_stats), supprimées avec elle
+    bvh_id = Column(Integer, ForeignKey('bvh.id', ondelete='CASCADE'), primary_key=True)
+    stats_version = Column(Integer, nullable=False)
+    # Racine, sur le plan horizontal, dans l'unité du fichier
+    root_speed_mean = Column(Float)
+    root_speed_peak = Column(Float)
+    travel_distance = Column(Float)
+    displacement = Column(Float)
+    vertical_range = Column(Float)
+    # Taille de la boîte englobant tout le mouvement
+    extent_x = Column(Float)
+    extent_y = Column(Float)
+    extent_z = Column(Float)
+    # Vitesse moyenne des joints autour de la racine, en hauteurs de squelette par seconde
+    activity = Column(Float)
+    # Une valeur par canal MOTION
+    channel_min = Column(ARRAY(REAL))
+    channel_max = Column(ARRAY(REAL))
+    channel_mean = Column(ARRAY(REAL))
+    # Descripteur de similarité (tools.motion_descriptor), chargé en mémoire par tools.similarity
+    descriptor = Column(ARRAY(REAL))
+    computed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Filtres du catalogue par intervalle ; computed_at pour la mise à jour incrémentale de l'index
+    __table_args__ = (
+        Index('idx_motion_stats_root_speed_mean', 'root_speed_mean'),
+        Index('idx_motion_stats_root_speed_peak', 'root_speed_peak'),
+        Index('idx_motion_stats_travel_distance', 'travel_distance'),
+        Index('idx_motion_stats_vertical_range', 'vertical_range'),
+        Index('idx_motion_stats_activity', 'activity'),
+        Index('idx_motion_stats_computed_at', 'computed_at'),
+    )
+
+    def __repr__(self):
+        return f"<BVHMotionStats(bvh_id={self.bvh_id}, activity={self.activity})>"
+
+
+
+class BVHTombstone(Base):
+    __tablename__ = 'bvh_tombstone'
+
+    # Une ligne par entrée bvh supprimée, écrite par le trigger bvh_record_tombstones :
+    # les caches du catalogue retirent ces ids sans tout recharger
+    bvh_id = Column(Integer, primary_key=True, autoincrement=False)
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index('idx_bvh_tombstone_deleted_at', 'deleted_at'),
+    )
+
+    def __repr__(self):
+        return f"<BVHTombstone(bvh_id={self.bvh_id}, deleted_at={self.deleted_at})>"
+
+
+# Canal NOTIFY signalant toute modification de la table bvh (payload : INSERT, UPDATE ou DELETE)
+CHANGE_CHANNEL = 'bvh_changes'
+
+# Suivi des modifications, fait par des triggers pour couvrir toutes les écritures
+CHANGE_TRACKING_FUNCTIONS = [
+    """
+    CREATE OR REPLACE FUNCTION bvh_touch_updated_at() RETURNS trigger AS $$
+    BEGIN
+        NEW.updated_at := clock_timestamp();
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    # Une seule insertion par DELETE grâce à la table de transition deleted_rows
+    """
+    CREATE OR REPLACE FUNCTION bvh_record_tombstones() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO bvh_tombstone (bvh_id, deleted_at)
+        SELECT id, clock_timestamp() FROM deleted_rows
+        ON CONFLICT (bvh_id) DO UPDATE SET deleted_at = EXCLUDED.deleted_at;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION bvh_notify_change() RETURNS trigger AS $$
+    BEGIN
+        PERFORM pg_notify('{CHANGE_CHANNEL}', TG_OP);
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+]
+
+# Créés seulement s'ils manquent : (re)créer un trigger verrouille la table bvh
+CHANGE_TRACKING_TRIGGERS = {
+    'bvh_touch_updated_at': """
+    CREATE OR REPLACE TRIGGER bvh_touch_updated_at BEFORE UPDATE ON bvh
+    FOR EACH ROW WHEN (OLD.* IS DISTINCT FROM NEW.*)
+    EXECUTE FUNCTION bvh_touch_updated_at()
+    """,
+    'bvh_record_tombstones': """
+    CREATE OR REPLACE TRIGGER bvh_record_tombstones AFTER DELETE ON bvh
+    REFERENCING OLD TABLE AS deleted_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bvh_record_tombstones()
+    """,
+    'bvh_notify_change': """
+    CREATE OR REPLACE TRIGGER bvh_notify_change AFTER INSERT OR UPDATE OR DELETE ON bvh
+    FOR EACH STATEMENT EXECUTE FUNCTION bvh_notify_change()
+    """,
+}
+
 
 @st.cache_resource
 def get_postgis_connection():
-    db_url = URL.create(
-        "postgresql",
-        username=os.getenv('POSTGRES_USER'),
-        password=os.getenv('POSTGRES_PASSWORD'),
-        host=os.getenv('POSTGRES_HOST',os.getenv('POSTGRES_HOST_LOCALHOST')),
-        port=os.getenv('POSTGRES_PORT'),
-        database=os.getenv('POSTGRES_DB'),
-    )
-    engine = create_engine(db_url)
-    Base.metadata.create_all(engine)
+    """Moteur partagé par toute l'application (pool configuré, schéma créé une fois)."""
+    engine = create_db_engine()
+    ensure_schema(engine)
 
     return engine
 
-def save_bvh_file_to_db(engine : Engine, bvh_data: BVHFileCreate) -> BVHFile:
-    """Enregistre un BVHFileCreate dans la base de données."""
 
-    Session = sessionmaker(bind=engine)
-    session = Session()
+def ensure_schema(engine: Engine):
+    """Crée les tables, puis ajoute les colonnes et index manquants.
 
+    create_all ne modifie pas une table existante : les colonnes ajoutées
+    au modèle après coup sont créées ici avec ALTER TABLE. Les fonctions de
+    suivi des modifications sont remplacées à chaque appel, les triggers qui
+    les appellent ne sont créés que s'ils manquent.
+    """
+    Base.metadata.create_all(engine)
+
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        # La création d'un index sur une grosse table peut dépasser le statement_timeout
+        conn.execute(text('SET LOCAL statement_timeout = 0'))
+        for table in Base.metadata.sorted_tables:
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    default = ''
+                    if column.server_default is not None:
+                        # Les lignes existantes reçoivent aussi la valeur par défaut
+                        default = f' DEFAULT {column.server_default.arg.compile(dialect=engine.dialect)}'
+                    for foreign_key in column.foreign_keys:
+                        default += f' REFERENCES {foreign_key.column.table.name} ({foreign_key.column.name})'
+                        if foreign_key.ondelete:
+                            default += f' ON DELETE {foreign_key.ondelete}'
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}{default}'))
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+        for index_name in OBSOLETE_INDEXES:
+            conn.execute(text(f'DROP INDEX IF EXISTS {index_name}'))
+        # Rigs de référence : présents dès le départ, leur type s'impose par hash aux captures
+        if known_rigs():
+            conn.execute(
+                pg_insert(Skeleton).values(list(known_rigs().values()))
+                .on_conflict_do_nothing(index_elements=['hierarchy_hash'])
+            )
+        # Les fonctions se remplacent sans verrouiller bvh ; les triggers ne sont créés qu'une fois
+        for ddl in CHANGE_TRACKING_FUNCTIONS:
+            conn.execute(text(ddl))
+        existing_triggers = set(conn.execute(
+            text("SELECT tgname FROM pg_trigger WHERE tgrelid = 'bvh'::regclass AND NOT tgisinternal")
+        ).scalars())
+        for trigger_name, ddl in CHANGE_TRACKING_TRIGGERS.items():
+            if trigger_name not in existing_triggers:
+                conn.execute(text(ddl))
+
+    ensure_trigram_indexes(engine)
+
+
+def ensure_trigram_indexes(engine: Engine) -> bool:
+    """Active pg_trgm et crée les index trigrammes, si l'extension est disponible.
+
+    Returns:
+        True si la recherche par trigrammes est disponible
+    """
     try:
-        # Créer l'objet ORM à partir des données Pydantic
-        new_bvh = BVHFile(**bvh_data.model_dump())
+        with engine.begin() as conn:
+            conn.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+    except DBAPIError:
+        # Extension absente du serveur ou droits insuffisants : recherche sans trigrammes
+        return False
+    with engine.begin() as conn:
+        conn.execute(text('SET LOCAL statement_timeout = 0'))
+        for ddl in TRIGRAM_INDEXES.values():
+            conn.execute(text(ddl))
+    return True
+
+
+@profiler.profiled()
+def has_extension(engine: Engine, name: str) -> bool:
+    """Indique si une extension PostgreSQL est installée dans la base."""
+    with engine.connect() as conn:
+        return conn.execute(
+            text('SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = :name)'), {'name': name}
+        ).scalar()
+
+# Champs de BVHFileCreate qui ne sont pas des colonnes de bvh : ils désignent le squelette
+SKELETON_FIELDS = {'skeleton_hash', 'skeleton_definition'}
+# ... ou sont écrits dans bvh_motion_stats
+MOTION_STATS_FIELD = 'motion_stats'
+
+
+def _skeleton_specs(bvh_data_list: list) -> dict:
+    """Lignes skeletons à créer pour un lot de BVHFileCreate, par hash de hiérarchie."""
+    return {
+        bvh_data.skeleton_hash: {
+            'hierarchy_hash': bvh_data.skeleton_hash,
+            'definition': bvh_data.skeleton_definition,
+            'skeleton_type': bvh_data.skeleton_type,
+            'joint_count': bvh_data.bone_count,
+            'has_fingers': bvh_data.has_fingers,
+        }
+        for bvh_data in bvh_data_list if bvh_data.skeleton_hash and bvh_data.skeleton_definition
+    }
+
+
+def resolve_skeletons(conn, specs: dict) -> dict:
+    """Retrouve ou crée les squelettes d'un lot, en deux requêtes quel que soit le lot.
+
+    Le type d'un squelette déjà connu l'emporte sur celui proposé dans specs
+    (deviné d'après les noms de joints) : les captures d'un même rig sont
+    toujours classées pareil.
 
-        # Ajouter à la session et commiter
-        session.add(new_bvh)
-        session.commit()
+    Args:
+        conn: Connexion SQLAlchemy, dans la transaction de l'insertion
+        specs: {hash: valeurs de la ligne skeletons}, voir _skeleton_specs
+
+    Returns:
+        Dictionnaire {hash: (id du squelette, type du squelette)}
+    """
+    if not specs:
+        return {}
+    conn.execute(
+        pg_insert(Skeleton).values(list(specs.values()))
+        .on_conflict_do_nothing(index_elements=['hierarchy_hash'])
+    )
+    rows = conn.execute(
+        select(Skeleton.hierarchy_hash, Skeleton.id, Skeleton.skeleton_type)
+        .where(Skeleton.hierarchy_hash.in_(list(specs)))
+    )
+    return {hierarchy_hash: (skeleton_id, skeleton_type) for hierarchy_hash, skeleton_id, skeleton_type in rows}
 
-        # Rafraîchir pour obtenir l'ID généré
-        session.refresh(new_bvh)
 
-        return new_bvh
+def _bvh_row(bvh_data: BVHFileCreate, skeletons: dict, **dump_options) -> dict:
+    """Valeurs des colonnes bvh d'un BVHFileCreate, squelette résolu."""
+    row = bvh_data.model_dump(exclude=SKELETON_FIELDS | {MOTION_STATS_FIELD}, **dump_options)
+    skeleton_id, skeleton_type = skeletons.get(bvh_data.skeleton_hash, (None, None))
+    row['skeleton_id'] = skeleton_id
+    if skeleton_type:
+        row['skeleton_type'] = skeleton_type
+    return row
 
-    except Exception as e:
-        session.rollback()
-        raise e
-    finally:
-        session.close()
 
+@profiler.profiled()
+def save_bvh_file_to_db(engine : Engine, bvh_data: BVHFileCreate) -> BVHFile:
+    """Enregistre un BVHFileCreate dans la base de données."""
 
-def update_bvh_records_from_dataframe(engine: Engine, updated_df):
+    with session_scope(engine) as session:
+        skeletons = resolve_skeletons(session.connection(), _skeleton_specs([bvh_data]))
+        # Créer l'objet ORM à partir des données Pydantic
+        new_bvh = BVHFile(**_bvh_row(bvh_data, skeletons))
+
+        # Ajouter à la session ; flush pour obtenir l'ID généré avant le commit
+        session.add(new_bvh)
+        session.flush()
+        if bvh_data.motion_stats:
+            session.add(BVHMotionStats(bvh_id=new_bvh.id, **bvh_data.motion_stats))
+
+    return new_bvh
+
+
+# Colonnes modifiables depuis l'éditeur de données
+EDITABLE_COLUMNS = [
+    'original_filename', 'file_path', 'file_size_kb', 'duration_seconds', 'frame_count',
+    'frame_time', 'fps', 'skeleton_type', 'bone_count', 'has_fingers', 'rest_pose_height',
+    'animation_style', 'description', 'actor_gender', 'loopable',
+]
+
+
+def _coerce_cell(column_name: str, value):
+    """Convertit une cellule du DataFrame vers le type Python attendu par la colonne."""
+    if value is None or (not isinstance(value, str) and pandas.isna(value)):
+        return None
+    column_type = BVHFile.__table__.c[column_name].type
+    if isinstance(column_type, SAEnum):
+        return GenderEnum(value.value if isinstance(value, enum.Enum) else value)
+    if isinstance(column_type, Boolean):
+        return bool(value)
+    if isinstance(column_type, Integer):
+        return int(value)
+    if isinstance(column_type, Numeric):
+        return float(value)
+    return str(value)
+
+
+def _changed_cells(updated_df, original_df, columns: list):
+    """Masque booléen (id x colonnes) des cellules modifiées, calculé de façon vectorisée."""
+    new = updated_df.set_index('id')[columns]
+    if original_df is None:
+        return pandas.DataFrame(True, index=new.index, columns=columns)
+    old = original_df.set_index('id')[columns].reindex(new.index)
+    # NaN != NaN : deux cellules vides ne sont pas une modification
+    same = (new == old) | (new.isna() & old.isna())
+    return ~same.astype(bool)
+
+
+@profiler.profiled()
+def update_bvh_records_from_dataframe(engine: Engine, updated_df, original_df=None):
     """Met à jour les enregistrements BVH dans la base de données à partir d'un DataFrame.
 
+    Seules les cellules qui diffèrent de original_df sont envoyées, en un seul
+    UPDATE ... FROM (VALUES ...). Sans original_df, toutes les lignes sont réécrites.
+
     Args:
         engine: Le moteur de base de données SQLAlchemy
         updated_df: Le DataFrame Pandas avec les modifications
+        original_df: Le DataFrame tel qu'il a été chargé depuis la base
 
     Returns:
         Tuple (nombre de lignes mises à jour, liste des erreurs)
     """
-    Session = sessionmaker(bind=engine)
-    session = Session()
+    columns = [c for c in EDITABLE_COLUMNS if c in updated_df.columns]
+    changed = _changed_cells(updated_df, original_df, columns)
+    changed = changed.loc[changed.any(axis=1), changed.any(axis=0)]
+    if changed.empty:
+        return 0, []
 
-    updated_count = 0
     errors = []
+    new_values = updated_df.set_index('id').loc[changed.index, changed.columns]
+    changed_columns = list(changed.columns)
+    # Une colonne modifiée sur toutes les lignes n'a pas besoin d'indicateur
+    flagged_columns = [c for c in changed_columns if not changed[c].all()]
+
+    rows = []
+    for record_id, row_values, row_changed in zip(
+            changed.index, new_values.itertuples(index=False), changed.itertuples(index=False)):
+        try:
+            cells = [_coerce_cell(c, v) if flag else None
+                     for c, v, flag in zip(changed_columns, row_values, row_changed)]
+            flags = [bool(getattr(row_changed, c)) for c in flagged_columns] if flagged_columns else []
+            rows.append((int(record_id), *cells, *flags))
+        except Exception as e:
+            errors.append(f"Erreur ligne id={record_id}: {str(e)}")
+
+    if not rows:
+        return 0, errors
+
+    table = BVHFile.__table__
+    changes = values(
+        column('id', Integer),
+        *[column(c, table.c[c].type) for c in changed_columns],
+        *[column(f'{c}__changed', Boolean) for c in flagged_columns],
+        name='changes',
+    ).data(rows)
+
+    assignments = {}
+    for c in changed_columns:
+        new_value = cast(changes.c[c], table.c[c].type)
+        if c in flagged_columns:
+            # Conserve la valeur actuelle pour les lignes où cette cellule n'a pas bougé
+            new_value = case((changes.c[f'{c}__changed'], new_value), else_=table.c[c])
+        assignments[c] = new_value
+
+    stmt = (
+        update(BVHFile)
+        .where(BVHFile.id == changes.c.id)
+        .values(assignments)
+        .returning(BVHFile.id)
+    )
 
-    try:
-        for _, row in updated_df.iterrows():
-            try:
-                # Récupérer l'enregistrement existant par ID
-                bvh_record = session.query(BVHFile).filter_by(id=row['id']).first()
-
-                if bvh_record:
-                    # Mettre à jour tous les champs modifiables
-                    bvh_record.original_filename = row['original_filename']
-                    bvh_record.file_path = row['file_path']
-                    bvh_record.file_size_kb = int(row['file_size_kb']) if row['file_size_kb'] else None
-                    bvh_record.duration_seconds = float(row['duration_seconds']) if row['duration_seconds'] else None
-                    bvh_record.frame_count = int(row['frame_count']) if row['frame_count'] else None
-                    bvh_record.frame_time = float(row['frame_time']) if row['frame_time'] else None
-                    bvh_record.fps = float(row['fps']) if row['fps'] else None
-                    bvh_record.skeleton_type = row['skeleton_type']
-                    bvh_record.bone_count = int(row['bone_count']) if row['bone_count'] else None
-                    bvh_record.has_fingers = bool(row['has_fingers'])
-                    bvh_record.rest_pose_height = float(row['rest_pose_height']) if row['rest_pose_height'] else None
-                    bvh_record.animation_style = row['animation_style']
-                    bvh_record.description = row['description']
-                    bvh_record.actor_gender = row['actor_gender']
-                    bvh_record.loopable = bool(row['loopable'])
-
-                    updated_count += 1
-
-            except Exception as e:
-                errors.append(f"Erreur ligne id={row.get('id', '?')}: {str(e)}")
-
-        # Commit toutes les modifications
-        session.commit()
-
-        return updated_count, errors
-
-    except Exception as e:
-        session.rollback()
-        raise e
-    finally:
-        session.close()
+    with engine.begin() as conn:
+        updated_ids = set(conn.execute(stmt).scalars())
+
+    for record_id, *_ in rows:
+        if record_id not in updated_ids:
+            errors.append(f"Erreur ligne id={record_id}: enregistrement introuvable")
 
+    return len(updated_ids), errors
 
+
+def _delete_returning_paths(engine: Engine, ids_to_delete: list) -> list:
+    """DELETE ... RETURNING en une requête, avec le chemin de l'archive de chaque ligne.
+
+    Les archives sont supprimées par ON DELETE CASCADE ; la jointure voit encore
+    leurs lignes car toute la requête partage le même snapshot.
+    """
+    deleted = (
+        delete(BVHFile)
+        .where(BVHFile.id.in_(ids_to_delete))
+        .returning(BVHFile.id, BVHFile.file_path, BVHFile.content_hash)
+        .cte("deleted")
+    )
+    with engine.begin() as conn:
+        return conn.execute(
+            select(deleted.c.id, deleted.c.file_path, deleted.c.content_hash, BVHArchive.archive_path)
+            .outerjoin(BVHArchive, BVHArchive.bvh_id == deleted.c.id)
+        ).all()
+
+
+@profiler.profiled()
 def delete_bvh_records(engine: Engine, ids_to_delete: list) -> int:
     """Supprime les enregistrements BVH avec les IDs spécifiés.
 
@@ -184,15 +592,314 @@ def delete_bvh_records(engine: Engine, ids_to_delete: list) -> int:
     Returns:
         Le nombre d'enregistrements supprimés
     """
-    Session = sessionmaker(bind=engine)
-    session = Session()
+    if not ids_to_delete:
+        return 0
+    return len(_delete_returning_paths(engine, ids_to_delete))
+
+
+@profiler.profiled()
+def delete_bvh_records_and_files(engine: Engine, ids_to_delete: list, batch_size: int = 1000) -> tuple:
+    """Supprime des enregistrements BVH puis les fichiers devenus orphelins.
+
+    Un fichier .bvh ou .bvha, ou l'index de frames d'un contenu, n'est
+    supprimé du disque que si aucune autre ligne ne le référence encore.
+
+    Returns:
+        Tuple (nombre d'enregistrements supprimés, nombre de fichiers supprimés)
+    """
+    if not ids_to_delete:
+        return 0, 0
+    rows = _delete_returning_paths(engine, ids_to_delete)
+    file_paths = {row.file_path for row in rows}
+    archive_paths = {row.archive_path for row in rows if row.archive_path}
+    content_hashes = {row.content_hash for row in rows if row.content_hash}
+    removed = remove_orphan_files(engine, file_paths, archive_paths, batch_size, content_hashes)
+    return len(rows), removed
 
-    deleted_count = 0
 
+@profiler.profiled()
+def remove_orphan_files(engine: Engine, file_paths, archive_paths=(), batch_size: int = 1000,
+                        content_hashes=()) -> int:
+    """Supprime du disque les fichiers qui ne sont plus référencés en base.
+
+    Les chemins sont vérifiés par lots (une requête par lot et par type).
+
+    Args:
+        engine: Le moteur de base de données SQLAlchemy
+        file_paths: Chemins de fichiers BVH candidats
+        archive_paths: Chemins d'archives .bvha candidats
+        batch_size: Nombre de chemins vérifiés par requête
+        content_hashes: Hashes de contenu dont l'index de frames est supprimé
+            si plus aucune ligne ne les référence
 
-    # Supprimer tous les enregistrements avec les IDs fournis
-    deleted_count = session.query(BVHFile).filter(BVHFile.id.in_(ids_to_delete)).delete(synchronize_session=False)
-    session.commit()
+    Returns:
+        Le nombre de fichiers BVH et d'archives supprimés
+    """
+    removed = 0
+    for candidates, referenced_column in ((list(file_paths), BVHFile.file_path),
+                                          (list(archive_paths), BVHArchive.archive_path)):
+        for start in range(0, len(candidates), batch_size):
+            batch = candidates[start:start + batch_size]
+            with engine.connect() as conn:
+                referenced = set(conn.execute(
+                    select(referenced_column).where(referenced_column.in_(batch)).distinct()
+                ).scalars())
+            for path in batch:
+                if path in referenced:
+                    continue
+                try:
+                    os.unlink(path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+
+    candidates = list(content_hashes)
+    for start in range(0, len(candidates), batch_size):
+        batch = candidates[start:start + batch_size]
+        with engine.connect() as conn:
+            referenced = set(conn.execute(
+                select(BVHFile.content_hash).where(BVHFile.content_hash.in_(batch)).distinct()
+            ).scalars())
+        remove_frame_indexes(h for h in batch if h not in referenced)
+    return removed
+
+
+@profiler.profiled()
+def duplicate_bvh_records(engine: Engine, ids_to_duplicate: list) -> list:
+    """Duplique des enregistrements BVH et leurs lignes dépendantes, en une seule requête.
+
+    Une CTE copies réserve les nouveaux ids sur la séquence de bvh.id (ancien
+    id, nouvel id) ; trois INSERT ... SELECT joints à cette correspondance,
+    dans des CTE modifiantes de la même requête, copient bvh puis
+    bvh_motion_stats et bvh_archive (la copie partage le fichier d'archive de
+    l'original). Les clés étrangères ne sont vérifiées qu'en fin de requête :
+    les lignes dépendantes peuvent référencer les copies insérées à côté.
+    Les copies reçoivent un nouvel uuid (gen_random_uuid côté serveur) et de
+    nouvelles dates d'upload, de modification et de calcul des statistiques
+    (l'index de similarité les prend ainsi dans sa prochaine mise à jour
+    incrémentale) ; les autres colonnes sont copiées.
+
+    Args:
+        engine: Le moteur de base de données SQLAlchemy
+        ids_to_duplicate: Liste des IDs à dupliquer
+
+    Returns:
+        La liste des IDs des copies créées, dans l'ordre des IDs d'origine
+    """
+    if not ids_to_duplicate:
+        return []
+    regenerated = {'id', 'uuid', 'uploaded_at', 'updated_at', 'bvh_id', 'computed_at', 'created_at'}
+    id_sequence = func.pg_get_serial_sequence(BVHFile.__tablename__, 'id')
+    # nextval est volatile : la CTE est évaluée une seule fois pour toutes ses références
+    copies = (
+        select(BVHFile.id.label('old_id'), func.nextval(id_sequence).label('new_id'))
+        .where(BVHFile.id.in_(ids_to_duplicate))
+        .cte('copies')
+    )
+    copy_statements = []
+    for table, key, id_column in ((BVHFile.__table__, BVHFile.id, 'id'),
+                                  (BVHMotionStats.__table__, BVHMotionStats.bvh_id, 'bvh_id'),
+                                  (BVHArchive.__table__, BVHArchive.bvh_id, 'bvh_id')):
+        columns = [c for c in table.columns if c.name not in regenerated]
+        copy_statements.append(
+            insert(table).from_select(
+                [id_column] + [c.name for c in columns],
+                select(copies.c.new_id, *columns).join_from(table, copies, key == copies.c.old_id),
+                # Sinon le défaut Python uuid4 serait évalué une seule fois pour toutes les copies
+                include_defaults=False,
+            ).cte(f'copy_{table.name}')
+        )
+    stmt = select(copies.c.new_id).order_by(copies.c.old_id).add_cte(*copy_statements)
+    with engine.begin() as conn:
+        return list(conn.execute(stmt).scalars())
+
+
+def get_registered_file_paths(engine: Engine) -> set:
+    """Retourne l'ensemble des file_path déjà enregistrés dans la table bvh."""
+    with engine.connect() as conn:
+        return set(conn.execute(select(BVHFile.file_path)).scalars())
+
+
+def get_archived_file_paths(engine: Engine) -> set:
+    """Retourne l'ensemble des file_path qui ont déjà une archive .bvha."""
+    with engine.connect() as conn:
+        return set(conn.execute(
+            select(BVHFile.file_path).join(BVHArchive, BVHArchive.bvh_id == BVHFile.id)
+        ).scalars())
+
+
+def get_registered_content_hashes(engine: Engine) -> set:
+    """Retourne l'ensemble des hash de contenu déjà enregistrés dans la table bvh."""
+    with engine.connect() as conn:
+        return set(conn.execute(
+            select(BVHFile.content_hash).where(BVHFile.content_hash.is_not(None)).distinct()
+        ).scalars())
+
+
+def find_bvh_by_content_hash(engine: Engine, content_hash: str):
+    """Retourne l'enregistrement BVH ayant ce hash de contenu, ou None."""
+    with engine.connect() as conn:
+        return conn.execute(
+            select(BVHFile.id, BVHFile.file_path).where(BVHFile.content_hash == content_hash).limit(1)
+        ).first()
+
+
+@profiler.profiled()
+def bulk_insert_bvh_files(engine: Engine, bvh_data_list: list) -> int:
+    """Insère une liste de BVHFileCreate en une seule transaction.
+
+    SQLAlchemy regroupe les lignes en INSERT multi-lignes ("insertmanyvalues"),
+    ce qui évite un aller-retour par fichier.
+
+    Args:
+        engine: Le moteur de base de données SQLAlchemy
+        bvh_data_list: Liste de BVHFileCreate à insérer
+
+    Returns:
+        Le nombre de lignes insérées
+    """
+    if not bvh_data_list:
+        return 0
+
+    with engine.begin() as conn:
+        skeletons = resolve_skeletons(conn, _skeleton_specs(bvh_data_list))
+        rows = [_bvh_row(bvh_data, skeletons, mode="json") for bvh_data in bvh_data_list]
+        # Les id sont renvoyés dans l'ordre des lignes pour y rattacher les statistiques
+        ids = conn.execute(insert(BVHFile).returning(BVHFile.id, sort_by_parameter_order=True), rows).scalars().all()
+        stats_rows = [{'bvh_id': bvh_id, **bvh_data.motion_stats}
+                      for bvh_id, bvh_data in zip(ids, bvh_data_list) if bvh_data.motion_stats]
+        if stats_rows:
+            conn.execute(insert(BVHMotionStats), stats_rows)
+    return len(rows)
+
+
+def find_bvh_without_motion_stats(engine: Engine, after_id: int = 0, limit: int = 500) -> list:
+    """Lot d'entrées (id, file_path) sans statistiques de mouvement à jour, par id croissant."""
+    with engine.connect() as conn:
+        return conn.execute(
+            select(BVHFile.id, BVHFile.file_path)
+            .outerjoin(BVHMotionStats, BVHMotionStats.bvh_id == BVHFile.id)
+            .where(or_(BVHMotionStats.bvh_id.is_(None), BVHMotionStats.stats_version < STATS_VERSION),
+                   BVHFile.id > after_id)
+            .order_by(BVHFile.id).limit(limit)
+        ).all()
+
+
+def save_motion_stats(engine: Engine, stats_by_id: dict) -> int:
+    """Écrit (ou remplace) les statistiques de mouvement de plusieurs entrées, en une requête.
 
+    Args:
+        engine: Le moteur de base de données SQLAlchemy
+        stats_by_id: {id bvh: dictionnaire renvoyé par tools.motion_stats.compute_motion_stats}
+
+    Returns:
+        Le nombre de lignes écrites
+    """
+    if not stats_by_id:
+        return 0
+    rows = [{'bvh_id': bvh_id, **stats} for bvh_id, stats in stats_by_id.items()]
+    stmt = pg_insert(BVHMotionStats)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[BVHMotionStats.bvh_id],
+        set_={c.name: stmt.excluded[c.name] for c in BVHMotionStats.__table__.columns if c.name != 'bvh_id'},
+    )
+    with engine.begin() as conn:
+        conn.execute(stmt, rows)
+    return len(rows)
+
+
+def find_bvh_without_skeleton(engine: Engine, after_id: int = 0, limit: int = 500) -> list:
+    """Lot d'entrées (id, file_path) sans squelette, par id croissant après after_id."""
+    with engine.connect() as conn:
+        return conn.execute(
+            select(BVHFile.id, BVHFile.file_path)
+            .where(BVHFile.skeleton_id.is_(None), BVHFile.id > after_id)
+            .order_by(BVHFile.id).limit(limit)
+        ).all()
+
+
+def assign_skeletons(engine: Engine, assignments: dict) -> int:
+    """Rattache des entrées existantes à leur squelette, en un UPDATE ... FROM (VALUES ...).
+
+    Args:
+        engine: Le moteur de base de données SQLAlchemy
+        assignments: {id bvh: valeurs de la ligne skeletons}, comme les specs de resolve_skeletons
+
+    Returns:
+        Le nombre de lignes mises à jour
+    """
+    if not assignments:
+        return 0
+    with engine.begin() as conn:
+        skeletons = resolve_skeletons(conn, {spec['hierarchy_hash']: spec for spec in assignments.values()})
+        changes = values(
+            column('id', Integer), column('skeleton_id', Integer), column('skeleton_type', String),
+            name='assignments',
+        ).data([(bvh_id, *skeletons[spec['hierarchy_hash']]) for bvh_id, spec in assignments.items()])
+        stmt = (
+            update(BVHFile)
+            .where(BVHFile.id == changes.c.id)
+            .values(skeleton_id=changes.c.skeleton_id,
+                    skeleton_type=func.coalesce(changes.c.skeleton_type, BVHFile.skeleton_type))
+        )
+        return conn.execute(stmt).rowcount
+
+
+@profiler.profiled()
+def set_skeleton_type(engine: Engine, skeleton_id: int, skeleton_type: str) -> int:
+    """Reclasse un squelette et toutes les captures qui le référencent, en une transaction.
+
+    Returns:
+        Le nombre d'entrées bvh mises à jour
+    """
+    with engine.begin() as conn:
+        conn.execute(update(Skeleton).where(Skeleton.id == skeleton_id).values(skeleton_type=skeleton_type))
+        return conn.execute(
+            update(BVHFile).where(BVHFile.skeleton_id == skeleton_id).values(skeleton_type=skeleton_type)
+        ).rowcount
+
+
+def register_archives(engine: Engine, archives: list, format_version: int) -> int:
+    """Associe des archives .bvha aux entrées bvh correspondantes, en une requête.
+
+    Les id sont résolus côté base par jointure sur file_path
+    (INSERT ... SELECT ... JOIN (VALUES ...)), une archive existante est remplacée.
+
+    Args:
+        engine: Le moteur de base de données SQLAlchemy
+        archives: Liste de tuples (file_path du BVH, chemin de l'archive, taille en octets)
+        format_version: Version du format d'archive
+
+    Returns:
+        Le nombre d'archives enregistrées
+    """
+    if not archives:
+        return 0
+
+    archive_values = values(
+        column('file_path', String),
+        column('archive_path', String),
+        column('size_bytes', BigInteger),
+        name='archive_values',
+    ).data(archives)
+
+    stmt = pg_insert(BVHArchive).from_select(
+        ['bvh_id', 'archive_path', 'size_bytes', 'format_version'],
+        select(
+            BVHFile.id,
+            archive_values.c.archive_path,
+            archive_values.c.size_bytes,
+            literal(format_version),
+        ).join(archive_values, BVHFile.file_path == archive_values.c.file_path),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['bvh_id'],
+        set_={
+            'archive_path': stmt.excluded.archive_path,
+            'size_bytes': stmt.excluded.size_bytes,
+            'format_version': stmt.excluded.format_version,
+        },
+    )
 
-    session.close()
+    with engine.begin() as conn:
+        return conn.execute(stmt).rowcount
@@ -0,0 +1,202 @@
+"""Export du catalogue BVH en CSV ou Parquet, en flux depuis PostgreSQL.
+
+CSV : COPY (SELECT ...) TO STDOUT, écrit directement dans le fichier par
+psycopg2 sans passer par Python ligne à ligne.
+Parquet : curseur côté serveur (stream_results) lu par lots, chaque lot
+devenant un row group du fichier.
+
+Dans les deux cas la mémoire utilisée ne dépend pas de la taille du catalogue.
+La lecture se fait dans une transaction sans statement_timeout : un gros
+export dépasse facilement le timeout par requête du moteur partagé.
+
+Les exports restent dans EXPORT_DIR (défaut .cache/exports) le temps d'être
+téléchargés : chaque nouvel export supprime ceux de plus de
+EXPORT_RETENTION_MINUTES (défaut 60). Au-delà de EXPORT_DOWNLOAD_MAX_MB
+(défaut 100), un export n'est pas proposé au téléchargement dans le
+navigateur (le fichier est chargé en mémoire au clic).
+"""
+import os
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import timedelta
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import (
+    Engine, select, cast, func, text, Integer, BigInteger, Boolean, Numeric, Float, DateTime, String, Text,
+    Enum as SAEnum
+)
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import UUID, ARRAY
+
+from tools.catalog import CatalogFilters, apply_filters, catalog_order_by
+from tools.db_tools import BVHFile
+
+EXPORT_FORMATS = ("csv", "parquet")
+DEFAULT_EXPORT_DIR = os.getenv("EXPORT_DIR", ".cache/exports")
+EXPORT_RETENTION = timedelta(minutes=float(os.getenv("EXPORT_RETENTION_MINUTES", "60")))
+EXPORT_DOWNLOAD_MAX_BYTES = int(float(os.getenv("EXPORT_DOWNLOAD_MAX_MB", "100")) * 1024 * 1024)
+# Lignes lues par lot (et par row group Parquet)
+CHUNK_ROWS = 20_000
+
+
+@dataclass
+class ExportResult:
+    path: Path
+    format: str
+    rows: int
+    size_bytes: int
+    elapsed_ms: float
+
+
+def export_statement(filters: CatalogFilters, sort_by: str = "id", descending: bool = False):
+    """SELECT de toutes les colonnes du catalogue, filtré et trié comme l'affichage."""
+    return apply_filters(select(*BVHFile.__table__.columns), filters).order_by(*catalog_order_by(sort_by, descending))
+
+
+def _arrow_type(column_type):
+    if isinstance(column_type, BigInteger):
+        return pa.int64()
+    if isinstance(column_type, Integer):
+        return pa.int32()
+    if isinstance(column_type, Boolean):
+        return pa.bool_()
+    if isinstance(column_type, Numeric):
+        return pa.float64()
+    if isinstance(column_type, DateTime):
+        return pa.timestamp("us", tz="UTC") if column_type.timezone else pa.timestamp("us")
+    if isinstance(column_type, ARRAY):
+        return pa.list_(_arrow_type(column_type.item_type))
+    if isinstance(column_type, (UUID, SAEnum, String, Text)):
+        return pa.string()
+    raise TypeError(f"Type de colonne non géré pour l'export: {column_type!r}")
+
+
+def arrow_schema() -> pa.Schema:
+    return pa.schema([(c.name, _arrow_type(c.type)) for c in BVHFile.__table__.columns])
+
+
+def _arrow_friendly(column):
+    """Colonne castée côté serveur vers un type lu rapidement par psycopg2 et pyarrow.
+
+    Returns:
+        Tuple (expression SQL, type Arrow des valeurs reçues)
+    """
+    if isinstance(column.type, Numeric):
+        return cast(column, Float).label(column.name), pa.float64()
+    if isinstance(column.type, (UUID, SAEnum)):
+        return cast(column, Text).label(column.name), pa.string()
+    if isinstance(column.type, DateTime):
+        # Le parsing des timestamptz par psycopg2 domine sinon le temps d'export
+        micros = cast(func.extract("epoch", column) * 1_000_000, BigInteger)
+        return micros.label(column.name), pa.int64()
+    return column, _arrow_type(column.type)
+
+
+def write_csv(engine: Engine, stmt, out) -> int:
+    """Écrit le résultat de stmt en CSV (avec en-tête) via COPY TO STDOUT.
+
+    Args:
+        engine: Le moteur de base de données SQLAlchemy (PostgreSQL / psycopg2)
+        stmt: Requête SELECT SQLAlchemy
+        out: Fichier binaire ou texte ouvert en écriture
+
+    Returns:
+        Le nombre de lignes exportées
+    """
+    # Les valeurs des filtres sont échappées par le compilateur SQLAlchemy
+    sql = str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    raw = engine.raw_connection()
+    try:
+        with raw.cursor() as cursor:
+            # SET LOCAL : limité à la transaction de l'export, la connexion retourne au pool inchangée
+            cursor.execute("SET LOCAL statement_timeout = 0")
+            cursor.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER true)", out)
+            rows = cursor.rowcount
+        raw.commit()
+    finally:
+        raw.close()
+    return rows
+
+
+def write_parquet(engine: Engine, stmt, out, chunk_rows: int = CHUNK_ROWS) -> int:
+    """Écrit le résultat de stmt en Parquet, un row group par lot de chunk_rows lignes.
+
+    Returns:
+        Le nombre de lignes exportées
+    """
+    schema = arrow_schema()
+    expressions, wire_types = zip(*(_arrow_friendly(c) for c in stmt.selected_columns))
+    stmt = stmt.with_only_columns(*expressions)
+    rows = 0
+    with engine.begin() as conn, pq.ParquetWriter(out, schema, compression="zstd") as writer:
+        conn.execute(text("SET LOCAL statement_timeout = 0"))
+        result = conn.execution_options(stream_results=True, yield_per=chunk_rows).execute(stmt)
+        for partition in result.partitions():
+            columns = zip(*partition)
+            arrays = [pa.array(values, type=wire_type).cast(field.type)
+                      for values, wire_type, field in zip(columns, wire_types, schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            rows += len(partition)
+    return rows
+
+
+def prune_exports(dest_dir=DEFAULT_EXPORT_DIR, retention: timedelta = EXPORT_RETENTION) -> int:
+    """Supprime les exports (et les fichiers temporaires abandonnés) plus anciens que retention.
+
+    Returns:
+        Le nombre de fichiers supprimés
+    """
+    dest_dir = Path(dest_dir)
+    if not dest_dir.is_dir():
+        return 0
+    cutoff = time.time() - retention.total_seconds()
+    removed = 0
+    for path in [*dest_dir.glob("bvh_export_*"), *dest_dir.glob("*.tmp")]:
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            # Supprimé entre-temps par une autre session
+            pass
+    return removed
+
+
+def export_catalog(engine: Engine, filters: CatalogFilters, export_format: str = "csv",
+                   sort_by: str = "id", descending: bool = False, dest_dir=DEFAULT_EXPORT_DIR) -> ExportResult:
+    """Exporte le catalogue filtré dans un fichier de dest_dir.
+
+    Le fichier est écrit sous un nom temporaire puis renommé : un export
+    interrompu ne laisse pas de fichier tronqué. Les exports de plus de
+    EXPORT_RETENTION sont d'abord supprimés de dest_dir.
+
+    Returns:
+        Un ExportResult
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Format d'export inconnu: {export_format}")
+    dest_dir = Path(dest_dir)
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    prune_exports(dest_dir)
+    # Suffixe aléatoire : deux exports lancés dans la même seconde ne s'écrasent pas
+    path = dest_dir / f"bvh_export_{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}.{export_format}"
+    stmt = export_statement(filters, sort_by, descending)
+
+    start = time.perf_counter()
+    fd, tmp_path = tempfile.mkstemp(dir=dest_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            if export_format == "csv":
+                rows = write_csv(engine, stmt, f)
+            else:
+                rows = write_parquet(engine, stmt, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+    return ExportResult(path=path, format=export_format, rows=rows, size_bytes=path.stat().st_size,
+                        elapsed_ms=(time.perf_counter() - start) * 1000)
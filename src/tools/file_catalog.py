@@ -0,0 +1,198 @@
+"""Index persistant des fichiers .bvh du répertoire de données (DATA_DIR).
+
+Le premier scan est récursif et complet ; les suivants ne relisent que les
+répertoires dont le mtime a changé (un ajout, une suppression ou un
+renommage modifie le mtime du répertoire parent). L'index est sauvegardé
+en JSON dans FILE_CATALOG_DIR et rechargé au démarrage.
+
+Limite : la modification du contenu d'un fichier existant ne change pas le
+mtime de son répertoire ; taille et mtime indexés peuvent alors être en
+retard jusqu'au prochain scan complet (refresh(full=True)).
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+DEFAULT_DATA_DIR = os.getenv("DATA_DIR", "data")
+DEFAULT_INDEX_DIR = os.getenv("FILE_CATALOG_DIR", ".cache/file_catalog")
+REFRESH_INTERVAL = float(os.getenv("FILE_CATALOG_REFRESH_SECONDS", "30"))
+
+INDEX_VERSION = 1
+BVH_SUFFIX = ".bvh"
+
+
+@dataclass(frozen=True)
+class FileEntry:
+    path: str  # Chemin relatif à la racine, séparateur "/"
+    size: int
+    mtime_ns: int
+
+
+class FileCatalog:
+    """Liste des .bvh d'un répertoire, rafraîchie de façon incrémentale.
+
+    Usage:
+        catalog = FileCatalog("data")
+        catalog.refresh_if_due()
+        matches = catalog.search("walk", limit=50)
+    """
+
+    def __init__(self, root=DEFAULT_DATA_DIR, index_dir=DEFAULT_INDEX_DIR,
+                 refresh_interval: float = REFRESH_INTERVAL):
+        self.root = Path(root).absolute()
+        self.refresh_interval = refresh_interval
+        self.index_path = None
+        if index_dir:
+            key = hashlib.sha1(str(self.root).encode("utf-8")).hexdigest()[:16]
+            self.index_path = Path(index_dir) / f"{key}.json"
+        self._lock = threading.Lock()
+        # répertoire relatif -> mtime_ns ; "" est la racine
+        self._dirs = {}
+        # répertoire relatif -> sous-répertoires relatifs
+        self._subdirs = {}
+        # répertoire relatif -> {nom: (taille, mtime_ns)}
+        self._files = {}
+        self._sorted = None
+        self.last_refresh = 0.0
+        self.last_scan_stats = {}
+        self._load()
+
+    def _load(self):
+        if self.index_path is None or not self.index_path.exists():
+            return
+        try:
+            data = json.loads(self.index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if data.get("version") != INDEX_VERSION or data.get("root") != str(self.root):
+            return
+        self._dirs = data["dirs"]
+        self._subdirs = data["subdirs"]
+        self._files = {d: {name: tuple(info) for name, info in files.items()}
+                       for d, files in data["files"].items()}
+
+    def _save(self):
+        if self.index_path is None:
+            return
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        data = {"version": INDEX_VERSION, "root": str(self.root), "dirs": self._dirs,
+                "subdirs": self._subdirs, "files": self._files}
+        fd, tmp_path = tempfile.mkstemp(dir=self.index_path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, self.index_path)
+
+    def refresh(self, full: bool = False) -> dict:
+        """Met l'index à jour.
+
+        Args:
+            full: Relit tous les répertoires, même ceux dont le mtime n'a pas changé
+
+        Returns:
+            Statistiques du scan (répertoires visités / relus, fichiers, durée)
+        """
+        start = time.perf_counter()
+        with self._lock:
+            visited = rescanned = 0
+            changed = False
+            seen_dirs = set()
+            pending = [""]
+            while pending:
+                rel_dir = pending.pop()
+                abs_dir = self.root / rel_dir if rel_dir else self.root
+                try:
+                    mtime = abs_dir.stat().st_mtime_ns
+                except (FileNotFoundError, NotADirectoryError):
+                    continue
+                visited += 1
+                seen_dirs.add(rel_dir)
+
+                if not full and self._dirs.get(rel_dir) == mtime and rel_dir in self._files:
+                    # Répertoire inchangé : seuls les sous-répertoires sont à visiter
+                    pending.extend(self._subdirs.get(rel_dir, []))
+                    continue
+
+                rescanned += 1
+                changed = True
+                files = {}
+                subdirs = []
+                try:
+                    with os.scandir(abs_dir) as entries:
+                        for entry in entries:
+                            if entry.name.startswith("."):
+                                continue
+                            if entry.is_dir(follow_symlinks=False):
+                                subdirs.append(f"{rel_dir}/{entry.name}" if rel_dir else entry.name)
+                            elif entry.name.lower().endswith(BVH_SUFFIX) and entry.is_file():
+                                st = entry.stat()
+                                files[entry.name] = (st.st_size, st.st_mtime_ns)
+                except PermissionError:
+                    pass
+                self._dirs[rel_dir] = mtime
+                self._files[rel_dir] = files
+                self._subdirs[rel_dir] = subdirs
+                pending.extend(subdirs)
+
+            # Répertoires disparus (ou devenus inaccessibles)
+            for rel_dir in set(self._dirs) - seen_dirs:
+                del self._dirs[rel_dir]
+                self._subdirs.pop(rel_dir, None)
+                self._files.pop(rel_dir, None)
+                changed = True
+
+            if changed:
+                self._sorted = None
+                self._save()
+            self.last_refresh = time.time()
+            self.last_scan_stats = {
+                "dirs_visited": visited,
+                "dirs_rescanned": rescanned,
+                "files": sum(len(files) for files in self._files.values()),
+                "elapsed_ms": (time.perf_counter() - start) * 1000,
+            }
+            return self.last_scan_stats
+
+    def refresh_if_due(self) -> bool:
+        """Rafraîchit l'index si le dernier scan date de plus de refresh_interval."""
+        if time.time() - self.last_refresh < self.refresh_interval:
+            return False
+        self.refresh()
+        return True
+
+    def invalidate(self):
+        """Force un rafraîchissement au prochain refresh_if_due (ex: après une écriture)."""
+        self.last_refresh = 0.0
+
+    def entries(self) -> list:
+        """Toutes les entrées, triées par chemin."""
+        with self._lock:
+            if self._sorted is None:
+                self._sorted = sorted(
+                    (FileEntry(f"{d}/{name}" if d else name, size, mtime)
+                     for d, files in self._files.items() for name, (size, mtime) in files.items()),
+                    key=lambda entry: entry.path.lower(),
+                )
+            return self._sorted
+
+    def search(self, query: str = "", limit: int = 200) -> list:
+        """Entrées dont le chemin contient tous les mots de query (sans casse)."""
+        terms = query.lower().split()
+        matches = []
+        for entry in self.entries():
+            path = entry.path.lower()
+            if all(term in path for term in terms):
+                matches.append(entry)
+                if len(matches) >= limit:
+                    break
+        return matches
+
+    def absolute_path(self, entry: FileEntry) -> Path:
+        return self.root / entry.path
+
+    def __len__(self) -> int:
+        return len(self.entries())
@@ -0,0 +1,312 @@
+"""Ingestion en masse d'un répertoire de fichiers BVH dans la table bvh.
+
+Usage (depuis src/):
+    python -m tools.ingest /app/data --workers 8 --batch-size 1000
+
+Le script est relançable : les fichiers déjà enregistrés (même file_path
+ou même contenu) sont ignorés et chaque lot est commité séparément. Le cache
+de métadonnées évite de re-parser les fichiers inchangés.
+
+Avec --archive DIR, chaque capture est aussi convertie en archive binaire
+.bvha (voir tools.motion_archive) ; les fichiers déjà enregistrés sans
+archive sont alors repris pour être archivés.
+
+Avec --backfill-skeletons, les entrées enregistrées avant la table skeletons
+sont rattachées à leur squelette (seule la hiérarchie des fichiers est relue).
+Avec --backfill-stats, les statistiques de mouvement manquantes ou calculées
+par une version précédente sont (re)calculées.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from tools.bvh_parser import BvhParseError, build_bvh_file_create, classify_skeleton, has_fingers, parse_bvh
+from tools.kinematics import analyze_clip
+from tools.metadata_cache import MetadataCache, DEFAULT_CACHE_PATH, file_content_hash
+from tools.motion_archive import ensure_archive, FORMAT_VERSION as ARCHIVE_FORMAT_VERSION
+from tools.motion_stats import compute_motion_stats
+from tools.skeletons import skeleton_fields
+
+# État propre à chaque processus du pool (initialisé par _init_worker)
+_worker_cache = None
+_worker_archive_dir = None
+
+
+def _init_worker(cache_path, archive_dir):
+    global _worker_cache, _worker_archive_dir
+    _worker_cache = MetadataCache(cache_path) if cache_path else None
+    _worker_archive_dir = archive_dir
+
+
+def iter_bvh_files(root: Path):
+    """Parcourt récursivement root et renvoie les chemins absolus des .bvh."""
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            if filename.lower().endswith(".bvh"):
+                yield Path(dirpath, filename).absolute()
+
+
+def extract_metadata(path: Path):
+    """Tâche exécutée dans un processus du pool.
+
+    Returns:
+        Tuple (chemin, BVHFileCreate ou None, message d'erreur ou None, statut du cache,
+        (chemin de l'archive, taille) ou None)
+    """
+    parsed = {}
+
+    def compute(p):
+        # Le clip parsé est gardé pour écrire l'archive sans relire le fichier
+        parsed["clip"] = parse_bvh(p)
+        return build_bvh_file_create(p, parsed["clip"])
+
+    try:
+        if _worker_cache is None:
+            model = compute(path)
+            model.content_hash = file_content_hash(path)
+            status = "disabled"
+        else:
+            model, _, status = _worker_cache.get_or_compute(path, compute)
+        archive = None
+        if _worker_archive_dir:
+            archive = ensure_archive(parsed.get("clip"), path, model.content_hash, _worker_archive_dir)
+        return path, model, None, status, archive
+    except Exception as e:
+        return path, None, f"{type(e).__name__}: {e}", "error", None
+
+
+def ingest_directory(engine, root: Path, workers: int = None, batch_size: int = 1000,
+                     dry_run: bool = False, cache_path=DEFAULT_CACHE_PATH, archive_dir=None,
+                     log=print) -> dict:
+    """Parse tous les .bvh de root en parallèle et les insère par lots.
+
+    Args:
+        engine: Le moteur de base de données SQLAlchemy
+        root: Répertoire à parcourir récursivement
+        workers: Nombre de processus (défaut: nombre de CPU)
+        batch_size: Nombre de lignes par INSERT
+        dry_run: Parse les fichiers sans rien écrire en base
+        cache_path: Chemin du cache de métadonnées (None pour le désactiver)
+        archive_dir: Répertoire des archives .bvha (None pour ne pas archiver)
+        log: Fonction utilisée pour afficher la progression
+
+    Returns:
+        Un dictionnaire de statistiques (scanned, skipped, duplicates, inserted,
+        archived, cache, failures, elapsed, files_per_sec)
+    """
+    from tools.db_tools import (
+        get_registered_file_paths, get_registered_content_hashes, get_archived_file_paths,
+        bulk_insert_bvh_files, register_archives
+    )
+
+    start = time.perf_counter()
+    registered = get_registered_file_paths(engine)
+    known_hashes = get_registered_content_hashes(engine)
+    archived = get_archived_file_paths(engine) if archive_dir else set()
+    candidates = []
+    found = 0
+    skipped = 0
+    for path in iter_bvh_files(root):
+        found += 1
+        if str(path) not in registered:
+            candidates.append(path)
+        elif archive_dir and str(path) not in archived:
+            # Déjà enregistré mais pas encore archivé : repris pour l'archivage seul
+            candidates.append(path)
+            skipped += 1
+        else:
+            skipped += 1
+    log(f"{found} fichier(s) trouvé(s), {skipped} déjà enregistré(s), {len(candidates)} à traiter")
+
+    inserted = 0
+    archived_count = 0
+    parsed = 0
+    duplicates = 0
+    cache_stats = {"hit": 0, "hash_hit": 0, "miss": 0}
+    failures = []
+    batch = []
+    archives = []
+
+    def flush():
+        nonlocal inserted, archived_count
+        if not dry_run:
+            if batch:
+                inserted += bulk_insert_bvh_files(engine, batch)
+            # Après l'INSERT : les archives sont liées aux lignes bvh par file_path
+            if archives:
+                archived_count += register_archives(engine, archives, ARCHIVE_FORMAT_VERSION)
+        batch.clear()
+        archives.clear()
+        elapsed = time.perf_counter() - start
+        log(f"  {parsed}/{len(candidates)} parsé(s), {inserted} inséré(s), {duplicates} doublon(s), "
+            f"{len(failures)} échec(s) - {parsed / elapsed:.1f} fichiers/s")
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(cache_path, archive_dir)) as pool:
+        # chunksize > 1 pour amortir le coût d'IPC sur des milliers de petits fichiers
+        chunksize = max(1, min(64, len(candidates) // ((workers or os.cpu_count() or 1) * 8)))
+        for path, bvh_model, error, status, archive in pool.map(extract_metadata, candidates, chunksize=chunksize):
+            parsed += 1
+            if status in cache_stats:
+                cache_stats[status] += 1
+            if error:
+                failures.append((str(path), error))
+            elif str(path) in registered:
+                archives.append((str(path), *archive))
+            elif bvh_model.content_hash and bvh_model.content_hash in known_hashes:
+                # Même contenu déjà enregistré sous un autre nom
+                duplicates += 1
+            else:
+                if bvh_model.content_hash:
+                    known_hashes.add(bvh_model.content_hash)
+                batch.append(bvh_model)
+                if archive:
+                    archives.append((str(path), *archive))
+            if len(batch) + len(archives) >= batch_size:
+                flush()
+    flush()
+
+    elapsed = time.perf_counter() - start
+    return {
+        "scanned": found,
+        "skipped": skipped,
+        "duplicates": duplicates,
+        "inserted": inserted,
+        "archived": archived_count,
+        "cache": cache_stats,
+        "failures": failures,
+        "elapsed": elapsed,
+        "files_per_sec": parsed / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def backfill_skeletons(engine, batch_size: int = 500, log=print) -> dict:
+    """Rattache à leur squelette les entrées bvh qui n'en ont pas encore.
+
+    Les entrées sont parcourues par lots (id croissant) ; pour chacune seule la
+    hiérarchie du fichier est lue, puis tout le lot est résolu et mis à jour
+    en une transaction.
+
+    Returns:
+        Un dictionnaire de statistiques (assigned, failures, elapsed)
+    """
+    from tools.db_tools import find_bvh_without_skeleton, assign_skeletons
+
+    start = time.perf_counter()
+    assigned = 0
+    failures = []
+    after_id = 0
+    while rows := find_bvh_without_skeleton(engine, after_id, batch_size):
+        after_id = rows[-1].id
+        assignments = {}
+        for bvh_id, file_path in rows:
+            try:
+                clip = parse_bvh(file_path, with_motion=False)
+            except (OSError, BvhParseError) as e:
+                failures.append((file_path, f"{type(e).__name__}: {e}"))
+                continue
+            fields = skeleton_fields(clip)
+            assignments[bvh_id] = {
+                "hierarchy_hash": fields["skeleton_hash"],
+                "definition": fields["skeleton_definition"],
+                "skeleton_type": classify_skeleton(clip, fields["skeleton_hash"]),
+                "joint_count": len(clip.joints),
+                "has_fingers": has_fingers(clip),
+            }
+        assigned += assign_skeletons(engine, assignments)
+        log(f"  {assigned} entrée(s) rattachée(s) à leur squelette, {len(failures)} échec(s)")
+    return {"assigned": assigned, "failures": failures, "elapsed": time.perf_counter() - start}
+
+
+def _compute_stats_task(task):
+    """Tâche exécutée dans un processus du pool : (id, chemin) -> (id, stats ou None, erreur ou None)."""
+    bvh_id, file_path = task
+    try:
+        clip = parse_bvh(file_path)
+        return bvh_id, compute_motion_stats(clip, analyze_clip(clip)), None
+    except Exception as e:
+        return bvh_id, None, f"{type(e).__name__}: {e}"
+
+
+def backfill_motion_stats(engine, workers: int = None, batch_size: int = 500, log=print) -> dict:
+    """Calcule les statistiques de mouvement des entrées qui n'en ont pas (ou d'une ancienne version).
+
+    Les fichiers de chaque lot sont parsés en parallèle dans un pool de
+    processus, puis les statistiques du lot sont écrites en une requête.
+
+    Returns:
+        Un dictionnaire de statistiques (computed, failures, elapsed)
+    """
+    from tools.db_tools import find_bvh_without_motion_stats, save_motion_stats
+
+    start = time.perf_counter()
+    computed = 0
+    failures = []
+    after_id = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while rows := find_bvh_without_motion_stats(engine, after_id, batch_size):
+            after_id = rows[-1].id
+            tasks = [tuple(row) for row in rows]
+            paths = dict(tasks)
+            stats_by_id = {}
+            for bvh_id, stats, error in pool.map(_compute_stats_task, tasks):
+                if error:
+                    failures.append((paths[bvh_id], error))
+                else:
+                    stats_by_id[bvh_id] = stats
+            computed += save_motion_stats(engine, stats_by_id)
+            log(f"  {computed} statistique(s) de mouvement calculée(s), {len(failures)} échec(s)")
+    return {"computed": computed, "failures": failures, "elapsed": time.perf_counter() - start}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Ingestion en masse de fichiers BVH dans la base de données")
+    parser.add_argument("directory", type=Path, help="Répertoire à parcourir récursivement")
+    parser.add_argument("--workers", type=int, default=None, help="Nombre de processus de parsing")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Nombre de lignes par INSERT")
+    parser.add_argument("--dry-run", action="store_true", help="Parse sans écrire en base")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="Chemin du cache de métadonnées")
+    parser.add_argument("--no-cache", action="store_true", help="Désactive le cache de métadonnées")
+    parser.add_argument("--archive", metavar="DIR", default=None,
+                        help="Écrit aussi une archive binaire .bvha de chaque capture dans DIR")
+    parser.add_argument("--backfill-skeletons", action="store_true",
+                        help="Rattache aussi les entrées déjà enregistrées à leur squelette")
+    parser.add_argument("--backfill-stats", action="store_true",
+                        help="Calcule aussi les statistiques de mouvement manquantes des entrées déjà enregistrées")
+    args = parser.parse_args(argv)
+
+    if not args.directory.is_dir():
+        parser.error(f"{args.directory} n'est pas un répertoire")
+
+    from tools.db_tools import get_postgis_connection
+
+    engine = get_postgis_connection()
+    stats = ingest_directory(engine, args.directory, workers=args.workers,
+                             batch_size=args.batch_size, dry_run=args.dry_run,
+                             cache_path=None if args.no_cache else args.cache,
+                             archive_dir=args.archive)
+
+    print(f"Terminé en {stats['elapsed']:.1f}s: {stats['inserted']} inséré(s), "
+          f"{stats['skipped']} ignoré(s), {stats['duplicates']} doublon(s), {stats['archived']} archivé(s), "
+          f"{len(stats['failures'])} échec(s), {stats['files_per_sec']:.1f} fichiers/s")
+    cache = stats["cache"]
+    print(f"Cache: {cache['hit']} hit(s), {cache['hash_hit']} hit(s) par hash, {cache['miss']} miss")
+    failures = list(stats["failures"])
+    if args.backfill_skeletons and not args.dry_run:
+        backfill = backfill_skeletons(engine)
+        print(f"Squelettes: {backfill['assigned']} entrée(s) rattachée(s) en {backfill['elapsed']:.1f}s")
+        failures += backfill["failures"]
+    if args.backfill_stats and not args.dry_run:
+        backfill = backfill_motion_stats(engine, workers=args.workers)
+        print(f"Statistiques: {backfill['computed']} entrée(s) calculée(s) en {backfill['elapsed']:.1f}s")
+        failures += backfill["failures"]
+    for path, error in failures:
+        print(f"  ÉCHEC {path}: {error}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+"""File d'ingestion en arrière-plan pour les fichiers envoyés depuis l'interface.
+
+Chaque job passe par les étapes save (écriture par blocs avec hash dans un
+fichier .part puis publication, voir tools.storage), parse, metadata (extraction via le cache de métadonnées),
+stats (statistiques de mouvement, voir tools.motion_stats) et insert
+(déduplication par hash puis INSERT). Les jobs tournent dans un pool de threads : le
+script Streamlit ne fait que soumettre et afficher l'état.
+"""
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from tools.bvh_parser import build_bvh_file_create, parse_bvh
+from tools.db_tools import find_bvh_by_content_hash, save_bvh_file_to_db
+from tools.kinematics import analyze_clip
+from tools.motion_stats import compute_motion_stats
+from tools.storage import PartialFile, publish_file, remove_stale_partials, write_partial
+
+STAGES = ("save", "parse", "metadata", "stats", "insert")
+
+DEFAULT_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+# Nombre de jobs terminés gardés pour l'affichage
+MAX_FINISHED_JOBS = 200
+
+
+@dataclass
+class IngestJob:
+    id: str
+    filename: str
+    status: str = "queued"  # queued | running | done | duplicate | error
+    stage: Optional[str] = None
+    progress: float = 0.0
+    timings: dict = field(default_factory=dict)  # étape -> durée en ms
+    message: Optional[str] = None
+    bvh_id: Optional[int] = None
+    model: object = None
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "duplicate", "error")
+
+    @property
+    def total_ms(self) -> float:
+        return sum(self.timings.values())
+
+    def _enter(self, stage: str):
+        self.stage = stage
+        self.progress = STAGES.index(stage) / len(STAGES)
+
+
+class IngestQueue:
+    """Pool de workers qui enregistre les fichiers BVH sur disque et en base.
+
+    Usage:
+        queue = IngestQueue(engine, metadata_cache, Path("data"))
+        job = queue.submit_upload(uploaded_file.name, uploaded_file)
+    """
+
+    def __init__(self, engine, metadata_cache, data_dir, max_workers: int = DEFAULT_WORKERS):
+        self.engine = engine
+        self.metadata_cache = metadata_cache
+        self.data_dir = Path(data_dir)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        # Vérification du hash + INSERT atomiques entre workers (deux envois du même contenu)
+        self._insert_lock = threading.Lock()
+        remove_stale_partials(self.data_dir)
+
+    def submit_upload(self, filename: str, source, register: bool = True) -> IngestJob:
+        """Soumet un fichier envoyé (objet fichier binaire, ex: UploadedFile).
+
+        Le contenu est copié par blocs dans un fichier .part de data_dir sur le
+        thread appelant, puis seul ce fichier est mis en file : le worker ne lit
+        jamais l'objet du widget, que le script peut relire (aperçu) pendant la
+        sauvegarde, et le contenu n'est pas recopié en mémoire.
+
+        Args:
+            filename: Nom du fichier à créer dans data_dir
+            source: Contenu du fichier
+            register: Enregistre aussi le fichier en base (sinon seule l'étape save est faite)
+        """
+        filename = Path(filename).name  # Jamais de chemin venant du client
+        start = time.perf_counter()
+        partial = write_partial(source, self.data_dir, filename)
+        job = self._new_job(filename)
+        job.timings["save"] = (time.perf_counter() - start) * 1000
+        try:
+            self._executor.submit(self._run, job, partial, None, register)
+        except BaseException:
+            partial.path.unlink(missing_ok=True)
+            raise
+        return job
+
+    def submit_path(self, path) -> IngestJob:
+        """Soumet un fichier déjà présent sur disque (l'étape save est sautée)."""
+        path = Path(path)
+        job = self._new_job(path.name)
+        self._executor.submit(self._run, job, None, path, True)
+        return job
+
+    def _new_job(self, filename: str) -> IngestJob:
+        job = IngestJob(id=uuid.uuid4().hex, filename=filename)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        return job
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def _run(self, job: IngestJob, partial: Optional[PartialFile], path: Optional[Path], register: bool):
+        job.status = "running"
+        job.started_at = time.time()
+        content_hash = None
+        try:
+            if partial is not None:
+                job._enter("save")
+                start = time.perf_counter()
+                saved = publish_file(partial.path, self.data_dir, job.filename, partial.content_hash,
+                                     partial.size_bytes, find_duplicate=self._registered_path)
+                job.timings["save"] += (time.perf_counter() - start) * 1000
+                path, content_hash = saved.path, saved.content_hash
+                if not register:
+                    job.status = "duplicate" if saved.duplicate else "done"
+                    job.message = (f"Contenu déjà présent dans {path}" if saved.duplicate
+                                   else f"Fichier sauvegardé dans {path}")
+                    return
+
+            # parse et stats ne sont appelés par le cache qu'en cas de miss
+            parse_ms = stats_ms = None
+
+            def compute(p):
+                nonlocal parse_ms, stats_ms
+                job._enter("parse")
+                step_start = time.perf_counter()
+                clip = parse_bvh(p)
+                parse_ms = (time.perf_counter() - step_start) * 1000
+                job._enter("metadata")
+                kinematics = analyze_clip(clip)
+                model = build_bvh_file_create(p, clip, kinematics, with_stats=False)
+                # Les positions calculées pour les métadonnées servent aussi aux statistiques
+                job._enter("stats")
+                step_start = time.perf_counter()
+                model.motion_stats = compute_motion_stats(clip, kinematics)
+                stats_ms = (time.perf_counter() - step_start) * 1000
+                return model
+
+            job._enter("metadata")
+            start = time.perf_counter()
+            model, content_hash, cache_status = self.metadata_cache.get_or_compute(path, compute, content_hash)
+            job.timings["metadata"] = (time.perf_counter() - start) * 1000
+            for stage, elapsed_ms in (("parse", parse_ms), ("stats", stats_ms)):
+                if elapsed_ms is not None:
+                    job.timings[stage] = elapsed_ms
+                    job.timings["metadata"] -= elapsed_ms
+            job.model = model
+
+            job._enter("insert")
+            start = time.perf_counter()
+            with self._insert_lock:
+                existing = find_bvh_by_content_hash(self.engine, content_hash)
+                if existing:
+                    job.status = "duplicate"
+                    job.bvh_id = existing.id
+                    job.message = f"Contenu déjà enregistré (id={existing.id}, {existing.file_path})"
+                else:
+                    job.bvh_id = save_bvh_file_to_db(self.engine, model).id
+                    job.status = "done"
+                    job.message = f"Ajouté à la base (id={job.bvh_id}, cache: {cache_status})"
+            job.timings["insert"] = (time.perf_counter() - start) * 1000
+        except Exception as e:
+            job.status = "error"
+            job.message = f"{type(e).__name__}: {e}"
+        finally:
+            if partial is not None:
+                # Déjà renommé ou supprimé si la publication a abouti
+                partial.path.unlink(missing_ok=True)
+            job.progress = 1.0
+            job.finished_at = time.time()
+
+    def _registered_path(self, content_hash: str) -> Optional[str]:
+        existing = find_bvh_by_content_hash(self.engine, content_hash)
+        return existing.file_path if existing else None
+
+    def jobs(self) -> list:
+        """Tous les jobs connus, du plus récent au plus ancien."""
+        with self._lock:
+            return list(self._jobs.values())[::-1]
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        return self._jobs.get(job_id)
+
+    @property
+    def queue_depth(self) -> int:
+        """Jobs en attente d'un worker."""
+        with self._lock:
+            return sum(job.status == "queued" for job in self._jobs.values())
+
+    @property
+    def active_count(self) -> int:
+        with self._lock:
+            return sum(job.status == "running" for job in self._jobs.values())
+
+    def stage_stats(self) -> dict:
+        """Durée moyenne et max de chaque étape sur les jobs terminés (en ms)."""
+        with self._lock:
+            timings = [job.timings for job in self._jobs.values() if job.finished]
+        stats = {}
+        for stage in STAGES:
+            values = np.array([t[stage] for t in timings if stage in t])
+            if values.size:
+                stats[stage] = {"count": int(values.size), "avg_ms": float(values.mean()),
+                                "max_ms": float(values.max())}
+        return stats
+
+    def clear_finished(self):
+        with self._lock:
+            for job_id in [job_id for job_id, job in self._jobs.items() if job.finished]:
+                del self._jobs[job_id]
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
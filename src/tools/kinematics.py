@@ -0,0 +1,193 @@
+"""Cinématique directe vectorisée sur toutes les frames d'un clip BVH.
+
+Les rotations d'Euler sont composées dans l'ordre déclaré par CHANNELS
+(ex: "Yrotation Xrotation Zrotation" -> R = Ry @ Rx @ Rz), comme le fait
+le BVHLoader de three.js. Seule la boucle sur les joints est en Python ;
+toutes les frames sont traitées d'un coup.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from tools.bvh_parser import BvhClip
+
+POSITION_CHANNELS = {"Xposition": 0, "Yposition": 1, "Zposition": 2}
+ROTATION_AXES = {"Xrotation": 0, "Yrotation": 1, "Zrotation": 2}
+
+# Seuil du score de bouclage au-delà duquel un clip est marqué "loopable"
+LOOPABLE_THRESHOLD = 0.5
+# Échelles de tolérance (relatives à la hauteur du squelette) pour le score de bouclage
+LOOP_POSE_TOLERANCE = 0.05
+LOOP_VELOCITY_TOLERANCE = 0.5
+
+# Unités de longueur possibles d'un fichier (mètres par unité) et taille de référence d'un
+# squelette humain : l'unité retenue est celle qui ramène la hauteur au plus près de la référence
+FILE_UNITS_IN_METRES = {"m": 1.0, "cm": 0.01, "mm": 0.001}
+REFERENCE_HEIGHT_M = 1.7
+# Plus grande valeur de la colonne bvh.rest_pose_height (Numeric(5, 2))
+MAX_STORED_HEIGHT_M = 999.99
+
+
+@dataclass
+class ClipKinematics:
+    positions: np.ndarray  # (frames, joints, 3) positions monde des joints
+    rest_pose_height: float
+    bounds_min: np.ndarray  # (3,)
+    bounds_max: np.ndarray  # (3,)
+    loop_score: float  # 1.0 = première et dernière pose/vitesse identiques
+
+    @property
+    def loopable(self) -> bool:
+        return self.loop_score >= LOOPABLE_THRESHOLD
+
+
+def axis_rotation_matrices(axis: int, angles_deg: np.ndarray) -> np.ndarray:
+    """Matrices de rotation (N, 3, 3) autour d'un axe (0=X, 1=Y, 2=Z)."""
+    radians = np.deg2rad(angles_deg)
+    c, s = np.cos(radians), np.sin(radians)
+    matrices = np.zeros(angles_deg.shape + (3, 3), dtype=np.float64)
+    i, j = [(1, 2), (2, 0), (0, 1)][axis]
+    matrices[..., axis, axis] = 1.0
+    matrices[..., i, i] = c
+    matrices[..., j, j] = c
+    matrices[..., i, j] = -s
+    matrices[..., j, i] = s
+    return matrices
+
+
+def euler_to_matrices(angles_deg: np.ndarray, axes: list) -> np.ndarray:
+    """Compose des rotations d'Euler intrinsèques (N, k) dans l'ordre donné.
+
+    Args:
+        angles_deg: Angles en degrés, une colonne par axe
+        axes: Axes des colonnes (0=X, 1=Y, 2=Z), dans l'ordre des CHANNELS
+
+    Returns:
+        Matrices de rotation (N, 3, 3)
+    """
+    result = np.broadcast_to(np.eye(3), (angles_deg.shape[0], 3, 3)).copy()
+    for column, axis in enumerate(axes):
+        result = result @ axis_rotation_matrices(axis, angles_deg[:, column])
+    return result
+
+
+def _joint_channels(joint):
+    """Sépare les colonnes de position et de rotation d'un joint."""
+    positions = [(joint.channel_start + i, POSITION_CHANNELS[name])
+                 for i, name in enumerate(joint.channels) if name in POSITION_CHANNELS]
+    rotations = [(joint.channel_start + i, ROTATION_AXES[name])
+                 for i, name in enumerate(joint.channels) if name in ROTATION_AXES]
+    return positions, rotations
+
+
+def forward_kinematics(clip: BvhClip, include_end_sites: bool = True) -> np.ndarray:
+    """Positions monde de tous les joints pour toutes les frames.
+
+    Args:
+        clip: Clip avec sa matrice MOTION
+        include_end_sites: Ajoute les "End Site" après les joints
+
+    Returns:
+        Tableau (frames, joints [+ end sites], 3) en float64
+    """
+    motion = np.asarray(clip.motion, dtype=np.float64)
+    frames = motion.shape[0]
+    joint_count = len(clip.joints)
+    global_rotations = np.empty((joint_count, frames, 3, 3))
+    global_positions = np.empty((joint_count, frames, 3))
+    end_sites = []
+
+    # Les parents précèdent toujours leurs enfants dans l'ordre du fichier
+    for index, joint in enumerate(clip.joints):
+        local_translation = np.broadcast_to(np.asarray(joint.offset, dtype=np.float64), (frames, 3)).copy()
+        position_columns, rotation_columns = _joint_channels(joint)
+        for column, axis in position_columns:
+            local_translation[:, axis] += motion[:, column]
+
+        if rotation_columns:
+            columns = [column for column, _ in rotation_columns]
+            local_rotation = euler_to_matrices(motion[:, columns], [axis for _, axis in rotation_columns])
+        else:
+            local_rotation = np.broadcast_to(np.eye(3), (frames, 3, 3))
+
+        if joint.parent < 0:
+            global_rotations[index] = local_rotation
+            global_positions[index] = local_translation
+        else:
+            parent_rotation = global_rotations[joint.parent]
+            global_rotations[index] = parent_rotation @ local_rotation
+            global_positions[index] = global_positions[joint.parent] + np.einsum(
+                "fij,fj->fi", parent_rotation, local_translation
+            )
+
+        if include_end_sites and joint.end_site is not None:
+            end_sites.append(global_positions[index] + np.einsum(
+                "fij,j->fi", global_rotations[index], np.asarray(joint.end_site, dtype=np.float64)
+            ))
+
+    positions = global_positions
+    if end_sites:
+        positions = np.concatenate([positions, np.stack(end_sites)], axis=0)
+    return positions.transpose(1, 0, 2)
+
+
+def rest_pose_positions(clip: BvhClip) -> np.ndarray:
+    """Positions (joints [+ end sites], 3) en pose de repos (rotations nulles)."""
+    rest = BvhClip(joints=clip.joints, frame_count=1, frame_time=clip.frame_time,
+                   motion=np.zeros((1, clip.channel_count), dtype=np.float32))
+    return forward_kinematics(rest)[0]
+
+
+def loop_score(positions: np.ndarray, scale: float, frame_time: float) -> float:
+    """Score de bouclage entre la première et la dernière frame.
+
+    Compare les poses relatives à la racine (la translation de la racine est
+    ignorée, un cycle de marche qui avance reste bouclable) et les vitesses
+    des joints, normalisées par la taille du squelette.
+    """
+    if positions.shape[0] < 3 or scale <= 0:
+        return 0.0
+    relative = positions - positions[:, :1, :]
+    pose_error = np.linalg.norm(relative[-1] - relative[0], axis=-1).mean() / scale
+    # Vitesses en "hauteurs de squelette par seconde", indépendantes du framerate
+    first_velocity = (relative[1] - relative[0]) / frame_time
+    last_velocity = (relative[-1] - relative[-2]) / frame_time
+    velocity_error = np.linalg.norm(last_velocity - first_velocity, axis=-1).mean() / scale
+    return float(1.0 / (1.0 + (pose_error / LOOP_POSE_TOLERANCE) ** 2
+                        + (velocity_error / LOOP_VELOCITY_TOLERANCE) ** 2))
+
+
+def guess_file_unit(height: float) -> str:
+    """Unité de longueur probable d'un fichier (clé de FILE_UNITS_IN_METRES) d'après la hauteur de repos.
+
+    Le format BVH ne précise pas l'unité des OFFSET : un humain mesure environ
+    1.7 en mètres, 170 en centimètres et 1700 en millimètres. Les limites entre
+    unités sont donc vers 17 et 540 unités.
+    """
+    if height <= 0:
+        return "m"
+    return min(FILE_UNITS_IN_METRES,
+               key=lambda unit: abs(np.log(height * FILE_UNITS_IN_METRES[unit] / REFERENCE_HEIGHT_M)))
+
+
+def height_in_metres(height: float):
+    """Hauteur de repos convertie en mètres (arrondie au cm), ou None si elle ne tient pas en base."""
+    metres = round(height * FILE_UNITS_IN_METRES[guess_file_unit(height)], 2)
+    return metres if metres <= MAX_STORED_HEIGHT_M else None
+
+
+def analyze_clip(clip: BvhClip) -> ClipKinematics:
+    """Calcule positions, hauteur de repos, boîte englobante et score de bouclage.
+
+    Tout est dans l'unité du fichier ; height_in_metres convertit la hauteur pour la base.
+    """
+    positions = forward_kinematics(clip)
+    rest = rest_pose_positions(clip)
+    height = float(rest[:, 1].max() - rest[:, 1].min())
+    return ClipKinematics(
+        positions=positions,
+        rest_pose_height=height,
+        bounds_min=positions.min(axis=(0, 1)),
+        bounds_max=positions.max(axis=(0, 1)),
+        loop_score=loop_score(positions, height, clip.frame_time),
+    )
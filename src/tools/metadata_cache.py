@@ -0,0 +1,212 @@
+"""Cache persistant des métadonnées BVH (sidecar SQLite).
+
+Une entrée est retrouvée par (chemin, taille, mtime). Si le fichier a été
+touché ou renommé, on retombe sur le hash du contenu : un même contenu
+déjà analysé sous un autre nom n'est pas re-parsé.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+from models.BvhModels import BVHFileCreate
+
+HASH_ALGORITHM = "sha256"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# À incrémenter quand l'extraction des métadonnées change (invalide le cache)
+CACHE_VERSION = 6
+
+DEFAULT_CACHE_PATH = os.getenv("METADATA_CACHE_PATH", ".cache/bvh_metadata.sqlite")
+DEFAULT_MAX_ENTRIES = int(os.getenv("METADATA_CACHE_MAX_ENTRIES", "200000"))
+
+# Champs propres à l'emplacement du fichier, jamais réutilisés d'une autre entrée
+_PATH_FIELDS = ("file_path", "original_filename", "file_size_kb", "content_hash")
+
+
+def stream_content_hash(f: BinaryIO, chunk_size: int = HASH_CHUNK_SIZE) -> str:
+    """Calcule le hash du contenu d'un flux binaire, bloc par bloc."""
+    digest = hashlib.new(HASH_ALGORITHM)
+    for chunk in iter(lambda: f.read(chunk_size), b""):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_content_hash(path) -> str:
+    """Calcule le hash du contenu d'un fichier."""
+    with open(path, "rb") as f:
+        return stream_content_hash(f)
+
+
+class MetadataCache:
+    """Cache (path, size, mtime) -> métadonnées, avec repli sur le hash du contenu.
+
+    La taille est bornée (éviction LRU sur last_access) et les compteurs
+    hit/miss sont cumulés dans la base pour suivre les rescans successifs.
+    """
+
+    def __init__(self, db_path=DEFAULT_CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.db_path = Path(db_path)
+        self.max_entries = max_entries
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                metadata TEXT NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_entries_hash ON entries (content_hash);
+            CREATE INDEX IF NOT EXISTS idx_entries_access ON entries (last_access);
+            CREATE TABLE IF NOT EXISTS counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+        """)
+        self._conn.commit()
+        # Compteurs de la session courante (les totaux sont dans la table counters)
+        self.hits = 0
+        self.hash_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def close(self):
+        self._conn.close()
+
+    def _count(self, name: str, amount: int = 1):
+        setattr(self, name, getattr(self, name) + amount)
+        self._conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount),
+        )
+
+    @staticmethod
+    def _model_for(path: Path, metadata: dict, size: int, content_hash: str) -> BVHFileCreate:
+        data = dict(metadata)
+        data["content_hash"] = content_hash
+        data["original_filename"] = path.name
+        data["file_path"] = str(path)
+        data["file_size_kb"] = -(-size // 1024)
+        return BVHFileCreate(**data)
+
+    def lookup(self, path, content_hash: Optional[str] = None):
+        """Cherche les métadonnées d'un fichier sans jamais le parser.
+
+        Args:
+            path: Chemin du fichier
+            content_hash: Hash déjà connu (évite de relire le fichier)
+
+        Returns:
+            Tuple (BVHFileCreate ou None, hash du contenu ou None, statut 'hit' | 'hash_hit' | 'miss')
+        """
+        path = Path(path).absolute()
+        st = path.stat()
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content_hash, metadata FROM entries "
+                "WHERE path = ? AND size = ? AND mtime_ns = ? AND version = ?",
+                (str(path), st.st_size, st.st_mtime_ns, CACHE_VERSION),
+            ).fetchone()
+            if row:
+                self._conn.execute("UPDATE entries SET last_access = ? WHERE path = ?", (now, str(path)))
+                self._count("hits")
+                self._conn.commit()
+                return self._model_for(path, json.loads(row[1]), st.st_size, row[0]), row[0], "hit"
+
+        if content_hash is None:
+            content_hash = file_content_hash(path)
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT metadata FROM entries WHERE content_hash = ? AND version = ? LIMIT 1",
+                (content_hash, CACHE_VERSION),
+            ).fetchone()
+            if row:
+                metadata = json.loads(row[0])
+                self._store(path, st, content_hash, metadata, now)
+                self._count("hash_hits")
+                self._evict()
+                self._conn.commit()
+                return self._model_for(path, metadata, st.st_size, content_hash), content_hash, "hash_hit"
+        return None, content_hash, "miss"
+
+    def get_or_compute(self, path, compute, content_hash: Optional[str] = None):
+        """Renvoie les métadonnées en cache ou les calcule avec compute(path).
+
+        Args:
+            path: Chemin du fichier
+            compute: Fonction path -> BVHFileCreate appelée en cas de miss
+            content_hash: Hash déjà connu (évite de relire le fichier)
+
+        Returns:
+            Tuple (BVHFileCreate, hash du contenu, statut 'hit' | 'hash_hit' | 'miss')
+        """
+        path = Path(path).absolute()
+        model, content_hash, status = self.lookup(path, content_hash)
+        if model is not None:
+            return model, content_hash, status
+
+        model = compute(path)
+        model.content_hash = content_hash
+        metadata = model.model_dump(mode="json", exclude=set(_PATH_FIELDS), exclude_none=True)
+        with self._lock:
+            self._store(path, path.stat(), content_hash, metadata, time.time())
+            self._count("misses")
+            self._evict()
+            self._conn.commit()
+        return model, content_hash, "miss"
+
+    def _store(self, path: Path, st, content_hash: str, metadata: dict, now: float):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO entries "
+            "(path, size, mtime_ns, content_hash, version, metadata, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (str(path), st.st_size, st.st_mtime_ns, content_hash, CACHE_VERSION,
+             json.dumps(metadata), now),
+        )
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        if count <= self.max_entries:
+            return
+        # On descend à 90% de la capacité pour ne pas évincer à chaque insertion
+        excess = count - int(self.max_entries * 0.9)
+        self._conn.execute(
+            "DELETE FROM entries WHERE path IN "
+            "(SELECT path FROM entries ORDER BY last_access LIMIT ?)",
+            (excess,),
+        )
+        self._count("evictions", excess)
+
+    def stats(self) -> dict:
+        """Compteurs de la session et totaux cumulés depuis la création du cache."""
+        with self._lock:
+            totals = dict(self._conn.execute("SELECT name, value FROM counters").fetchall())
+            entries = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        lookups = self.hits + self.hash_hits + self.misses
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "hash_hits": self.hash_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.hash_hits) / lookups if lookups else 0.0,
+            "total_hits": totals.get("hits", 0),
+            "total_hash_hits": totals.get("hash_hits", 0),
+            "total_misses": totals.get("misses", 0),
+            "total_evictions": totals.get("evictions", 0),
+        }
@@ -0,0 +1,184 @@
+"""Archive binaire colonnaire des captures BVH (.bvha).
+
+Format d'un fichier :
+    8 octets   magic b"BVHARCH1"
+    4 octets   longueur de l'en-tête (uint32, little-endian)
+    n octets   en-tête JSON (hiérarchie, frame_count, frame_time, dtype, data_offset)
+    padding    jusqu'à un multiple de 64 octets
+    données    matrice MOTION (frames x channels) float32 little-endian, ordre C
+
+Les données ne sont pas compressées : le chargement est un simple np.memmap,
+sans copie ni parsing, et le fichier fait environ 2 à 3 fois moins que le texte.
+"""
+import json
+import os
+import struct
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from tools.bvh_parser import BvhClip, BvhJoint, parse_bvh
+
+MAGIC = b"BVHARCH1"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+ARCHIVE_SUFFIX = ".bvha"
+
+DEFAULT_ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archives")
+
+
+class ArchiveFormatError(ValueError):
+    """Erreur levée lorsqu'un fichier n'est pas une archive .bvha valide."""
+
+
+def archive_path_for(archive_dir, content_hash: str) -> Path:
+    """Chemin de l'archive d'un contenu (un même contenu n'est archivé qu'une fois)."""
+    return Path(archive_dir) / content_hash[:2] / f"{content_hash}{ARCHIVE_SUFFIX}"
+
+
+def write_archive(clip: BvhClip, path) -> int:
+    """Écrit un clip dans une archive .bvha (écriture atomique).
+
+    Args:
+        clip: Clip parsé avec sa matrice MOTION
+        path: Chemin de l'archive à créer
+
+    Returns:
+        La taille de l'archive en octets
+    """
+    if clip.motion is None:
+        raise ValueError("Le clip ne contient pas de données MOTION")
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    motion = np.ascontiguousarray(clip.motion, dtype="<f4")
+    header = {
+        "version": FORMAT_VERSION,
+        "joints": [
+            {
+                "name": joint.name,
+                "parent": joint.parent,
+                "offset": joint.offset,
+                "channels": joint.channels,
+                "channel_start": joint.channel_start,
+                "end_site": joint.end_site,
+            }
+            for joint in clip.joints
+        ],
+        "frame_count": int(motion.shape[0]),
+        "frame_time": clip.frame_time,
+        "channel_count": int(motion.shape[1]),
+        "dtype": "<f4",
+    }
+    # data_offset dépend de la taille de l'en-tête qui le contient : on itère jusqu'à stabilité
+    data_offset = 0
+    while True:
+        header["data_offset"] = data_offset
+        header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+        prefix = len(MAGIC) + 4 + len(header_bytes)
+        aligned = -(-prefix // ALIGNMENT) * ALIGNMENT
+        if aligned == data_offset:
+            break
+        data_offset = aligned
+
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<I", len(header_bytes)))
+            f.write(header_bytes)
+            f.write(b"\0" * (data_offset - prefix))
+            f.write(motion.tobytes())
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+    return path.stat().st_size
+
+
+def read_archive_header(path) -> dict:
+    """Lit uniquement l'en-tête JSON d'une archive."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ArchiveFormatError(f"{path} n'est pas une archive {ARCHIVE_SUFFIX}")
+        (header_len,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(header_len))
+    if header.get("version") != FORMAT_VERSION:
+        raise ArchiveFormatError(f"Version d'archive non supportée: {header.get('version')}")
+    return header
+
+
+def load_archive(path, mmap: bool = True) -> BvhClip:
+    """Charge une archive en BvhClip.
+
+    Args:
+        path: Chemin de l'archive
+        mmap: Si True, la matrice MOTION est un np.memmap en lecture seule (zéro copie)
+
+    Returns:
+        Un BvhClip
+    """
+    header = read_archive_header(path)
+    shape = (header["frame_count"], header["channel_count"])
+    if mmap:
+        motion = np.memmap(path, dtype=header["dtype"], mode="r", offset=header["data_offset"], shape=shape)
+    else:
+        with open(path, "rb") as f:
+            f.seek(header["data_offset"])
+            motion = np.fromfile(f, dtype=header["dtype"], count=shape[0] * shape[1]).reshape(shape)
+
+    joints = [
+        BvhJoint(
+            name=joint["name"],
+            parent=joint["parent"],
+            offset=tuple(joint["offset"]),
+            channels=joint["channels"],
+            channel_start=joint["channel_start"],
+            end_site=tuple(joint["end_site"]) if joint["end_site"] is not None else None,
+        )
+        for joint in header["joints"]
+    ]
+    return BvhClip(joints=joints, frame_count=shape[0], frame_time=header["frame_time"], motion=motion)
+
+
+def load_clip(engine, bvh_id: int, mmap: bool = True) -> BvhClip:
+    """Charge le clip d'une entrée de la table bvh.
+
+    Utilise l'archive si elle existe, sinon re-parse le fichier BVH texte.
+    """
+    from sqlalchemy import select
+    from tools.db_tools import BVHFile, BVHArchive
+
+    with engine.connect() as conn:
+        row = conn.execute(
+            select(BVHFile.file_path, BVHArchive.archive_path)
+            .outerjoin(BVHArchive, BVHArchive.bvh_id == BVHFile.id)
+            .where(BVHFile.id == bvh_id)
+        ).first()
+    if row is None:
+        raise KeyError(f"Aucune entrée bvh avec id={bvh_id}")
+    if row.archive_path and Path(row.archive_path).exists():
+        return load_archive(row.archive_path, mmap=mmap)
+    return parse_bvh(row.file_path)
+
+
+def ensure_archive(clip: Optional[BvhClip], bvh_path, content_hash: str, archive_dir=DEFAULT_ARCHIVE_DIR):
+    """Écrit l'archive d'un contenu si elle n'existe pas encore.
+
+    Args:
+        clip: Clip déjà parsé, ou None pour parser bvh_path si nécessaire
+        bvh_path: Chemin du fichier BVH source
+        content_hash: Hash du contenu (nom de l'archive)
+        archive_dir: Répertoire racine des archives
+
+    Returns:
+        Tuple (chemin de l'archive, taille en octets)
+    """
+    path = archive_path_for(archive_dir, content_hash).absolute()
+    if not path.exists():
+        if clip is None or clip.motion is None:
+            clip = parse_bvh(bvh_path)
+        write_archive(clip, path)
+    return str(path), path.stat().st_size
@@ -0,0 +1,108 @@
+"""Descripteur de mouvement de taille fixe, pour la recherche de clips similaires.
+
+Les rigs du catalogue n'ont ni le même nombre de joints ni les mêmes noms :
+le descripteur ne dépend donc que de grandeurs calculables sur n'importe quel
+squelette, normalisées par sa hauteur de repos. Pour chaque frame :
+    - hauteur, vitesse horizontale et vitesse verticale de la racine ;
+    - allonge horizontale, point le plus haut et le plus bas de la pose
+      (relatifs à la racine) ;
+    - vitesse moyenne des joints autour de la racine ;
+    - vitesse angulaire moyenne des rotations locales des joints (rad/s).
+Chaque signal est résumé par sa moyenne, son écart-type et l'amplitude de son
+spectre dans des bandes de fréquence fixes (en Hz) : le résumé ne dépend ni de
+la durée du clip, ni de la phase du mouvement (un cycle de marche qui démarre
+pied gauche ou pied droit donne le même descripteur).
+
+La réduction (ACP) et la recherche des plus proches voisins sont faites sur
+l'ensemble du catalogue par tools.similarity.
+"""
+import numpy as np
+
+from tools.bvh_parser import BvhClip
+from tools.kinematics import ROTATION_AXES, euler_to_matrices
+
+FRAME_FEATURES = (
+    "root_height", "root_speed", "root_vertical_speed", "reach", "pose_top", "pose_bottom",
+    "joint_speed", "joint_angular_speed",
+)
+# Bandes de fréquence (Hz) : [0.25, 0.75), [0.75, 1.25)... couvrent les cadences de marche à course
+SPECTRUM_BANDS = np.arange(0.25, 3.26, 0.5)
+SUMMARY_SIZE = 2 + len(SPECTRUM_BANDS) - 1
+DESCRIPTOR_SIZE = len(FRAME_FEATURES) * SUMMARY_SIZE
+
+
+def joint_angular_speed(clip: BvhClip) -> np.ndarray:
+    """Vitesse angulaire moyenne (rad/s) des rotations locales des joints hors racine, par frame."""
+    motion = np.asarray(clip.motion, dtype=np.float64)
+    speeds = []
+    for joint in clip.joints:
+        if joint.parent < 0:
+            continue
+        rotations = [(joint.channel_start + i, ROTATION_AXES[name])
+                     for i, name in enumerate(joint.channels) if name in ROTATION_AXES]
+        if not rotations:
+            continue
+        matrices = euler_to_matrices(motion[:, [column for column, _ in rotations]], [axis for _, axis in rotations])
+        # trace(Rt^T Rt+1) = 1 + 2 cos(angle entre deux frames consécutives)
+        traces = np.einsum("fij,fij->f", matrices[:-1], matrices[1:])
+        speeds.append(np.arccos(np.clip((traces - 1) / 2, -1.0, 1.0)))
+    if not speeds:
+        return np.zeros(motion.shape[0])
+    per_step = np.mean(speeds, axis=0) / clip.frame_time
+    # Une valeur par frame, comme les autres signaux
+    return np.concatenate([per_step[:1], per_step])
+
+
+def frame_features(clip: BvhClip, kinematics) -> np.ndarray:
+    """Signaux par frame (frames, len(FRAME_FEATURES)), en hauteurs de squelette quand c'est une longueur."""
+    positions = kinematics.positions
+    scale = kinematics.rest_pose_height if kinematics.rest_pose_height > 0 else 1.0
+    root = positions[:, 0]
+    local = positions - root[:, None, :]
+    frames = positions.shape[0]
+
+    if frames > 1:
+        root_velocity = np.gradient(root, clip.frame_time, axis=0)
+        joint_speed = np.linalg.norm(np.gradient(local, clip.frame_time, axis=0), axis=2).mean(axis=1)
+    else:
+        root_velocity = np.zeros_like(root)
+        joint_speed = np.zeros(frames)
+
+    features = np.stack([
+        root[:, 1] - root[:, 1].min(),
+        np.linalg.norm(root_velocity[:, [0, 2]], axis=1),
+        root_velocity[:, 1],
+        np.linalg.norm(local[:, :, [0, 2]], axis=2).max(axis=1),
+        local[:, :, 1].max(axis=1),
+        local[:, :, 1].min(axis=1),
+        joint_speed,
+    ], axis=1) / scale
+    angular = joint_angular_speed(clip) if frames > 1 else np.zeros(frames)
+    return np.column_stack([features, angular])
+
+
+def summarize(features: np.ndarray, frame_time: float) -> np.ndarray:
+    """Moyenne, écart-type et amplitude par bande de fréquence de chaque signal (colonne)."""
+    frames = features.shape[0]
+    centered = features - features.mean(axis=0)
+    bands = np.zeros((len(SPECTRUM_BANDS) - 1, features.shape[1]))
+    if frames >= 4:
+        amplitudes = np.abs(np.fft.rfft(centered, axis=0)) * 2 / frames
+        band_index = np.digitize(np.fft.rfftfreq(frames, frame_time), SPECTRUM_BANDS) - 1
+        for band in range(len(SPECTRUM_BANDS) - 1):
+            in_band = band_index == band
+            if in_band.any():
+                bands[band] = np.sqrt((amplitudes[in_band] ** 2).sum(axis=0))
+    return np.vstack([features.mean(axis=0), features.std(axis=0), bands])
+
+
+def compute_motion_descriptor(clip: BvhClip, kinematics) -> list:
+    """Descripteur de DESCRIPTOR_SIZE valeurs d'un clip (liste de floats, stockée en REAL[]).
+
+    Args:
+        clip: Clip avec sa matrice MOTION
+        kinematics: Résultat de tools.kinematics.analyze_clip pour ce clip
+    """
+    summary = summarize(frame_features(clip, kinematics), clip.frame_time)
+    # Ordre : pour chaque signal, ses SUMMARY_SIZE valeurs
+    return summary.T.ravel().round(5).tolist()
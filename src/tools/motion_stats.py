@@ -0,0 +1,74 @@
+"""Statistiques de mouvement d'un clip, calculées une fois à l'ingestion.
+
+Elles sont stockées dans la table bvh_motion_stats (une ligne par entrée bvh)
+pour filtrer le catalogue par le contenu du mouvement avec de simples
+requêtes SQL par intervalle, sans relire les fichiers.
+
+Les distances et vitesses sont en mètres et mètres par seconde : comme la
+hauteur de repos stockée, elles sont converties depuis l'unité devinée du
+fichier (tools.kinematics.guess_file_unit). Vitesses et distances parcourues
+sont mesurées sur le plan horizontal X/Z (Y est la verticale en BVH). L'activité est la
+vitesse moyenne des joints par rapport à la racine, en hauteurs de squelette
+par seconde : elle se compare d'un rig et d'une unité à l'autre.
+
+La même ligne porte le descripteur de similarité (voir tools.motion_descriptor).
+"""
+import numpy as np
+
+from tools.bvh_parser import BvhClip
+from tools.kinematics import FILE_UNITS_IN_METRES, guess_file_unit
+from tools.motion_descriptor import compute_motion_descriptor
+
+# À incrémenter quand le calcul change (les lignes plus anciennes sont recalculables)
+STATS_VERSION = 3
+
+# Le pic de vitesse est un centile : une frame aberrante (saut de la racine) ne le fausse pas
+PEAK_PERCENTILE = 99
+# En dessous de cette activité (hauteurs / s), un clip est considéré comme "idle"
+IDLE_ACTIVITY_THRESHOLD = 0.1
+
+
+def compute_motion_stats(clip: BvhClip, kinematics) -> dict:
+    """Calcule les statistiques de mouvement d'un clip.
+
+    Args:
+        clip: Clip avec sa matrice MOTION
+        kinematics: Résultat de tools.kinematics.analyze_clip pour ce clip (positions réutilisées)
+
+    Returns:
+        Dictionnaire des colonnes de bvh_motion_stats (hors bvh_id), sérialisable en JSON
+    """
+    positions = kinematics.positions
+    root = positions[:, 0]
+    frame_time = clip.frame_time
+    metres = FILE_UNITS_IN_METRES[guess_file_unit(kinematics.rest_pose_height)]
+
+    if len(root) > 1:
+        steps = np.linalg.norm(np.diff(root[:, [0, 2]], axis=0), axis=1)
+        speeds = steps / frame_time
+        local = positions - root[:, None, :]
+        joint_speeds = np.linalg.norm(np.diff(local, axis=0), axis=2) / frame_time
+        activity = joint_speeds.mean() / kinematics.rest_pose_height if kinematics.rest_pose_height > 0 else 0.0
+    else:
+        steps = speeds = np.zeros(1)
+        activity = 0.0
+
+    motion = np.asarray(clip.motion, dtype=np.float64)
+    extent = kinematics.bounds_max - kinematics.bounds_min
+    return {
+        "stats_version": STATS_VERSION,
+        "root_speed_mean": float(speeds.mean() * metres),
+        "root_speed_peak": float(np.percentile(speeds, PEAK_PERCENTILE) * metres),
+        "travel_distance": float(steps.sum() * metres),
+        "displacement": float(np.linalg.norm(root[-1, [0, 2]] - root[0, [0, 2]]) * metres),
+        "vertical_range": float(np.ptp(root[:, 1]) * metres),
+        "extent_x": float(extent[0] * metres),
+        "extent_y": float(extent[1] * metres),
+        "extent_z": float(extent[2] * metres),
+        "activity": float(activity),
+        # Une valeur par canal, dans l'ordre des colonnes MOTION
+        "channel_min": motion.min(axis=0).round(4).tolist(),
+        "channel_max": motion.max(axis=0).round(4).tolist(),
+        "channel_mean": motion.mean(axis=0).round(4).tolist(),
+        "descriptor": compute_motion_descriptor(clip, kinematics),
+    }
@@ -0,0 +1,104 @@
+"""Encodage compact des clips BVH pour le viewer three.js (viewer.html).
+
+Au lieu d'envoyer le texte BVH complet en base64, on envoie la hiérarchie
+en JSON et les canaux MOTION dans un buffer binaire quantifié, éventuellement
+décimé. Le viewer reconstruit directement le squelette et l'AnimationClip.
+"""
+import base64
+import json
+import time
+from dataclasses import dataclass
+from functools import cached_property
+
+import numpy as np
+
+from tools.bvh_parser import BvhClip
+
+QUANTIZATIONS = ("int16", "float16", "float32")
+
+HEADER_PLACEHOLDER = "__PREVIEW_HEADER_PLACEHOLDER__"
+BUFFER_PLACEHOLDER = "__PREVIEW_BUFFER_PLACEHOLDER__"
+
+
+@dataclass
+class PreviewPayload:
+    header: dict
+    buffer: bytes
+    encode_ms: float
+
+    @cached_property
+    def buffer_b64(self) -> str:
+        # Calculé une seule fois : un aperçu en cache est ré-affiché sans ré-encodage
+        return base64.b64encode(self.buffer).decode("ascii")
+
+    @cached_property
+    def header_json(self) -> str:
+        # "</" est échappé pour ne jamais fermer la balise <script> du viewer
+        return json.dumps(self.header, separators=(",", ":")).replace("</", "<\\/")
+
+    @property
+    def size_bytes(self) -> int:
+        # Taille réellement envoyée au navigateur (buffer en base64 + en-tête JSON)
+        return len(self.buffer_b64) + len(self.header_json)
+
+
+def encode_preview(clip: BvhClip, decimate: int = 1, quantization: str = "int16") -> PreviewPayload:
+    """Encode un clip pour le viewer.
+
+    Args:
+        clip: Clip parsé avec sa matrice MOTION
+        decimate: Ne garde qu'une frame sur `decimate`
+        quantization: 'int16' (min/max par canal), 'float16' ou 'float32'
+
+    Returns:
+        Un PreviewPayload
+    """
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Quantification inconnue: {quantization}")
+    if clip.motion is None:
+        raise ValueError("Le clip ne contient pas de données MOTION")
+    decimate = max(1, int(decimate))
+
+    start = time.perf_counter()
+    motion = clip.motion[::decimate]
+    header = {
+        "joints": [
+            {
+                "name": joint.name,
+                "parent": joint.parent,
+                "offset": joint.offset,
+                "channels": joint.channels,
+                "channelStart": joint.channel_start,
+                "endSite": joint.end_site,
+            }
+            for joint in clip.joints
+        ],
+        "frameCount": int(motion.shape[0]),
+        "frameTime": clip.frame_time * decimate,
+        "channelCount": clip.channel_count,
+        "quantization": quantization,
+    }
+
+    if quantization == "int16":
+        # Quantification linéaire par canal sur [-32767, 32767]
+        lo = motion.min(axis=0)
+        hi = motion.max(axis=0)
+        center = (hi + lo) / 2
+        scale = np.where(hi > lo, (hi - lo) / (2 * 32767), 1.0).astype(np.float32)
+        quantized = np.rint((motion - center) / scale).astype("<i2")
+        header["center"] = center.astype(float).tolist()
+        header["scale"] = scale.astype(float).tolist()
+        buffer = quantized.tobytes()
+    elif quantization == "float16":
+        buffer = motion.astype("<f2").tobytes()
+    else:
+        buffer = motion.astype("<f4").tobytes()
+
+    return PreviewPayload(header=header, buffer=buffer, encode_ms=(time.perf_counter() - start) * 1000)
+
+
+def render_viewer_html(template: str, payload: PreviewPayload) -> str:
+    """Injecte un PreviewPayload dans le template viewer.html."""
+    return (template
+            .replace(HEADER_PLACEHOLDER, payload.header_json)
+            .replace(BUFFER_PLACEHOLDER, payload.buffer_b64))
@@ -0,0 +1,171 @@
+"""Cache des aperçus encodés, indexé par hash de contenu.
+
+Niveau mémoire LRU borné en octets, avec un niveau disque optionnel
+(PREVIEW_CACHE_DIR) qui survit aux redémarrages du process Streamlit.
+"""
+import json
+import os
+import struct
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from tools.metadata_cache import file_content_hash
+from tools.preview import PreviewPayload
+
+DEFAULT_MAX_BYTES = int(os.getenv("PREVIEW_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+DEFAULT_DISK_DIR = os.getenv("PREVIEW_CACHE_DIR") or None
+DEFAULT_DISK_MAX_BYTES = int(os.getenv("PREVIEW_CACHE_DISK_MAX_BYTES", str(1024 * 1024 * 1024)))
+# Nombre de fichiers dont le hash est mémorisé (LRU, un hash par chemin)
+DEFAULT_MAX_FILE_HASHES = int(os.getenv("PREVIEW_CACHE_MAX_FILE_HASHES", "10000"))
+
+
+def preview_key(content_hash: str, decimate: int, quantization: str,
+                start_seconds: float = 0.0, end_seconds: Optional[float] = None) -> str:
+    """Clé d'un aperçu : même contenu, même fenêtre et mêmes paramètres d'encodage."""
+    key = f"{content_hash}_{quantization}_{decimate}"
+    if start_seconds or end_seconds is not None:
+        key += f"_{start_seconds:g}-{'end' if end_seconds is None else f'{end_seconds:g}'}"
+    return key
+
+
+def _payload_bytes(payload: PreviewPayload) -> int:
+    # Buffer brut + sa version base64 mise en cache dans le payload
+    return len(payload.buffer) + payload.size_bytes
+
+
+class PreviewCache:
+    """Cache LRU (mémoire, budget en octets) + niveau disque optionnel."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, disk_dir=DEFAULT_DISK_DIR,
+                 disk_max_bytes: int = DEFAULT_DISK_MAX_BYTES, max_file_hashes: int = DEFAULT_MAX_FILE_HASHES):
+        self.max_bytes = max_bytes
+        self.max_file_hashes = max_file_hashes
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.disk_max_bytes = disk_max_bytes
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # chemin -> ((taille, mtime), hash), pour ne pas relire un fichier inchangé ;
+        # LRU borné à max_file_hashes, un fichier modifié remplace son entrée
+        self._file_hashes = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def hash_for_file(self, path) -> str:
+        """Hash du contenu d'un fichier, mémorisé tant que taille et mtime ne changent pas."""
+        st = os.stat(path)
+        path_key, stamp = str(path), (st.st_size, st.st_mtime_ns)
+        with self._lock:
+            cached = self._file_hashes.get(path_key)
+            if cached is not None and cached[0] == stamp:
+                self._file_hashes.move_to_end(path_key)
+                return cached[1]
+        # Lecture du fichier hors du verrou
+        content_hash = file_content_hash(path)
+        with self._lock:
+            self._file_hashes[path_key] = (stamp, content_hash)
+            self._file_hashes.move_to_end(path_key)
+            while len(self._file_hashes) > self.max_file_hashes:
+                self._file_hashes.popitem(last=False)
+        return content_hash
+
+    def get(self, key: str) -> Optional[PreviewPayload]:
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return payload
+
+        payload = self._read_disk(key)
+        if payload is not None:
+            self.disk_hits += 1
+            self._put_memory(key, payload)
+        return payload
+
+    def put(self, key: str, payload: PreviewPayload):
+        self._put_memory(key, payload)
+        self._write_disk(key, payload)
+
+    def get_or_build(self, key: str, build) -> PreviewPayload:
+        """Renvoie l'aperçu en cache, ou le construit avec build() et le met en cache."""
+        payload = self.get(key)
+        if payload is None:
+            self.misses += 1
+            payload = build()
+            self.put(key, payload)
+        return payload
+
+    def _put_memory(self, key: str, payload: PreviewPayload):
+        size = _payload_bytes(payload)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= _payload_bytes(previous)
+            self._entries[key] = payload
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= _payload_bytes(evicted)
+                self.evictions += 1
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / f"{key}.preview"
+
+    def _read_disk(self, key: str) -> Optional[PreviewPayload]:
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        # Format : longueur de l'en-tête (uint32) + en-tête JSON + buffer brut
+        (header_len,) = struct.unpack_from("<I", data)
+        header = json.loads(data[4:4 + header_len])
+        os.utime(path)  # Marque l'entrée comme récemment utilisée pour l'éviction disque
+        return PreviewPayload(header=header, buffer=data[4 + header_len:], encode_ms=0.0)
+
+    def _write_disk(self, key: str, payload: PreviewPayload):
+        if not self.disk_dir:
+            return
+        header = json.dumps(payload.header).encode("utf-8")
+        fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(struct.pack("<I", len(header)))
+            f.write(header)
+            f.write(payload.buffer)
+        os.replace(tmp_path, self._disk_path(key))
+        self._prune_disk()
+
+    def _prune_disk(self):
+        files = [(p.stat().st_mtime, p.stat().st_size, p) for p in self.disk_dir.glob("*.preview")]
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "file_hashes": len(self._file_hashes),
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,252 @@
+"""Profilage des reruns de l'application : durée de sections nommées et requêtes SQL.
+
+Désactivé par défaut. Un rerun profilé est découpé en sections (span) imbriquées.
+Chaque section garde sa durée, ainsi que le nombre et la durée des requêtes SQL
+exécutées par le thread du script pendant qu'elle est ouverte. Les requêtes des
+threads de fond (file d'ingestion, LISTEN du catalogue) ne sont pas comptées.
+Les derniers reruns restent en mémoire pour les percentiles de la page profiler.
+Chaque rerun terminé est aussi ajouté, en JSON lines, au fichier de log.
+
+Configuration par variables d'environnement :
+    PROFILING        1 = activé au démarrage (défaut 0, activable depuis la page profiler)
+    PROFILE_LOG      fichier JSON lines des reruns profilés, vide = pas d'export
+                     (défaut .cache/profiler/spans.jsonl)
+    PROFILE_HISTORY  nombre de reruns gardés en mémoire (défaut 200)
+"""
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+import numpy as np
+
+from tools.database import QueryMetrics, QueryStat
+
+logger = logging.getLogger(__name__)
+
+PROFILING_ENABLED = os.getenv("PROFILING", "0") == "1"
+PROFILE_LOG = os.getenv("PROFILE_LOG", ".cache/profiler/spans.jsonl")
+PROFILE_HISTORY = int(os.getenv("PROFILE_HISTORY", "200"))
+
+
+@dataclass
+class Span:
+    name: str
+    depth: int
+    # Début relatif au début du rerun
+    start_ms: float
+    duration_ms: float = 0.0
+    sql_count: int = 0
+    sql_ms: float = 0.0
+
+
+@dataclass
+class RerunProfile:
+    page: str
+    session: str
+    started_at: float
+    spans: list = field(default_factory=list)
+    total_ms: float = 0.0
+    sql_count: int = 0
+    sql_ms: float = 0.0
+    # "complete", ou "interrupted" si le script s'est arrêté avant la fin (st.rerun, exception)
+    status: str = "running"
+    _start: float = field(default_factory=time.perf_counter, repr=False)
+    _open: list = field(default_factory=list, repr=False)
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._start) * 1000
+
+    def to_dict(self) -> dict:
+        return {
+            "page": self.page,
+            "session": self.session,
+            "started_at": self.started_at,
+            "status": self.status,
+            "total_ms": round(self.total_ms, 3),
+            "sql_count": self.sql_count,
+            "sql_ms": round(self.sql_ms, 3),
+            "spans": [{key: round(value, 3) if isinstance(value, float) else value
+                       for key, value in asdict(span).items()} for span in self.spans],
+        }
+
+
+class Profiler:
+    """Sections chronométrées et requêtes SQL par rerun, avec historique.
+
+    Un rerun est suivi par session (le script d'une session peut être relancé
+    dans un nouveau thread) ; les sections et les requêtes sont rattachées au
+    rerun en cours du thread courant.
+    """
+
+    def __init__(self, enabled: bool = PROFILING_ENABLED, history: int = PROFILE_HISTORY,
+                 log_path: str = PROFILE_LOG):
+        self.enabled = enabled
+        self.log_path = Path(log_path) if log_path else None
+        self._history = deque(maxlen=history)
+        self._pending = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+
+    def _current(self):
+        profile = getattr(self._local, "profile", None)
+        return profile if profile is not None and profile.status == "running" else None
+
+    def start_rerun(self, page: str, session: str):
+        """Commence le profil d'un rerun ; termine celui de la même session resté ouvert."""
+        with self._lock:
+            previous = self._pending.pop(session, None)
+        if previous is not None:
+            self._finish(previous, "interrupted")
+        if not self.enabled:
+            self._local.profile = None
+            return
+        profile = RerunProfile(page=page, session=session, started_at=time.time())
+        self._local.profile = profile
+        with self._lock:
+            self._pending[session] = profile
+
+    def finish_rerun(self):
+        """Termine le profil du rerun en cours (fin normale du script).
+
+        Returns:
+            Le RerunProfile terminé, ou None si le profilage était désactivé
+        """
+        profile = self._current()
+        self._local.profile = None
+        if profile is None:
+            return None
+        with self._lock:
+            self._pending.pop(profile.session, None)
+        self._finish(profile, "complete")
+        return profile
+
+    def _finish(self, profile: RerunProfile, status: str):
+        if status == "complete":
+            profile.total_ms = profile.elapsed_ms()
+        else:
+            # Le script s'est arrêté dans une section : le rerun s'arrête à la dernière section fermée
+            profile.total_ms = max((span.start_ms + span.duration_ms for span in profile.spans), default=0.0)
+        profile.status = status
+        with self._lock:
+            self._history.append(profile)
+        self._export(profile)
+
+    def _export(self, profile: RerunProfile):
+        if self.log_path is None:
+            return
+        line = json.dumps(profile.to_dict(), separators=(",", ":"))
+        try:
+            with self._log_lock:
+                self.log_path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+        except OSError as e:
+            logger.warning("Export du profil impossible (%s): %s", self.log_path, e)
+
+    @contextmanager
+    def span(self, name: str):
+        """Chronomètre le bloc comme une section du rerun en cours (sans effet hors rerun profilé)."""
+        profile = self._current()
+        if profile is None:
+            yield
+            return
+        span = Span(name=name, depth=len(profile._open), start_ms=profile.elapsed_ms())
+        profile.spans.append(span)
+        profile._open.append(span)
+        try:
+            yield
+        finally:
+            span.duration_ms = profile.elapsed_ms() - span.start_ms
+            profile._open.remove(span)
+
+    def profiled(self, name: str = None):
+        """Décorateur : chaque appel de la fonction est une section (par défaut "module.fonction")."""
+        def decorator(fn):
+            span_name = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__qualname__}"
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if self._current() is None:
+                    return fn(*args, **kwargs)
+                with self.span(span_name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record_query(self, stat: QueryStat):
+        """Listener de QueryMetrics : compte la requête dans le rerun et ses sections ouvertes."""
+        profile = self._current()
+        if profile is None:
+            return
+        profile.sql_count += 1
+        profile.sql_ms += stat.duration_ms
+        # Sections imbriquées : une requête compte pour chacune des sections englobantes
+        for span in profile._open:
+            span.sql_count += 1
+            span.sql_ms += stat.duration_ms
+
+    def watch(self, metrics: QueryMetrics):
+        """Branche le comptage SQL sur les métriques d'un moteur (une seule fois par moteur)."""
+        if self.record_query not in metrics._listeners:
+            metrics.add_listener(self.record_query)
+
+    def history(self, page: str = None, session: str = None) -> list:
+        """Reruns terminés, du plus récent au plus ancien."""
+        with self._lock:
+            profiles = list(self._history)
+        return [profile for profile in profiles[::-1]
+                if (page is None or profile.page == page) and (session is None or profile.session == session)]
+
+    def last_rerun(self, page: str = None, session: str = None):
+        profiles = self.history(page, session)
+        return profiles[0] if profiles else None
+
+    def span_percentiles(self, page: str = None) -> list:
+        """Percentiles de durée par section sur l'historique (une ligne par nom, plus "rerun").
+
+        Returns:
+            Une liste de dicts (name, reruns, p50_ms, p95_ms, max_ms, sql_count, sql_ms), triée par p95 décroissant
+        """
+        durations, sql_counts, sql_ms = {}, {}, {}
+        for profile in self.history(page):
+            # Une section appelée plusieurs fois dans un rerun compte pour la somme de ses appels
+            per_rerun = {"rerun": [profile.total_ms, profile.sql_count, profile.sql_ms]}
+            for span in profile.spans:
+                totals = per_rerun.setdefault(span.name, [0.0, 0, 0.0])
+                totals[0] += span.duration_ms
+                totals[1] += span.sql_count
+                totals[2] += span.sql_ms
+            for name, (duration, count, sql_time) in per_rerun.items():
+                durations.setdefault(name, []).append(duration)
+                sql_counts.setdefault(name, []).append(count)
+                sql_ms.setdefault(name, []).append(sql_time)
+
+        rows = []
+        for name, values in durations.items():
+            values = np.asarray(values)
+            rows.append({
+                "name": name,
+                "reruns": len(values),
+                "p50_ms": float(np.percentile(values, 50)),
+                "p95_ms": float(np.percentile(values, 95)),
+                "max_ms": float(values.max()),
+                "sql_count": float(np.mean(sql_counts[name])),
+                "sql_ms": float(np.mean(sql_ms[name])),
+            })
+        return sorted(rows, key=lambda row: row["p95_ms"], reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self._history.clear()
+
+
+# Instance du processus : partagée par les pages de l'application et les décorateurs de tools
+profiler = Profiler()
@@ -0,0 +1,273 @@
+"""Recherche de mouvements similaires, en mémoire.
+
+Les descripteurs de tout le catalogue (bvh_motion_stats.descriptor, voir
+tools.motion_descriptor) sont chargés une fois, centrés-réduits puis projetés
+par ACP sur quelques composantes. Une requête calcule la distance à tous les
+clips par un seul produit matriciel (force brute vectorisée) : quelques
+millisecondes pour 100 000 clips, sans structure d'index à maintenir.
+
+L'index est mis à jour par delta : les descripteurs calculés depuis le
+dernier chargement (computed_at) sont projetés avec l'ACP existante, les
+entrées supprimées (bvh_tombstone) sont retirées. L'ACP est recalculée quand
+le nombre de clips a été multiplié par REFIT_GROWTH depuis son calcul.
+
+Configuration par variables d'environnement :
+    SIMILARITY_COMPONENTS       dimensions gardées par l'ACP (défaut 24)
+    SIMILARITY_REFRESH_SECONDS  intervalle minimal entre deux mises à jour (défaut 10)
+"""
+import os
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+import pandas
+from sqlalchemy import Engine, select, func
+
+from tools.catalog_sync import SYNC_OVERLAP
+from tools.db_tools import BVHFile, BVHMotionStats, BVHTombstone
+from tools.motion_descriptor import DESCRIPTOR_SIZE
+from tools.motion_stats import STATS_VERSION
+
+COMPONENTS = int(os.getenv("SIMILARITY_COMPONENTS", "24"))
+REFRESH_INTERVAL = float(os.getenv("SIMILARITY_REFRESH_SECONDS", "10"))
+
+# L'ACP est calculée sur un échantillon : au-delà, le gain de précision est négligeable
+PCA_SAMPLE = 50_000
+REFIT_GROWTH = 2.0
+
+# Format binaire d'un tableau PostgreSQL (array_send) : en-tête de 20 octets pour une dimension,
+# puis pour chaque élément sa longueur (int32) et sa valeur (float4), en big-endian
+ARRAY_HEADER_BYTES = 20
+ARRAY_ELEMENT = np.dtype([("length", ">i4"), ("value", ">f4")])
+
+
+def decode_float4_arrays(blobs: list, size: int) -> np.ndarray:
+    """Matrice (len(blobs), size) à partir de tableaux real[] lus en binaire (array_send).
+
+    Bien plus rapide que de laisser psycopg2 construire une liste Python par tableau.
+    """
+    raw = np.frombuffer(b"".join(blobs), dtype=np.uint8).reshape(len(blobs), ARRAY_HEADER_BYTES + size * 8)
+    elements = np.ascontiguousarray(raw[:, ARRAY_HEADER_BYTES:]).view(ARRAY_ELEMENT)
+    return elements["value"].astype(np.float32)
+
+
+class SimilarityIndex:
+    """Plus proches voisins des clips du catalogue dans l'espace des descripteurs réduits.
+
+    Usage:
+        index = SimilarityIndex(engine)
+        index.refresh_if_due()
+        matches = index.query(bvh_id, k=10)  # [(id, distance), ...]
+    """
+
+    def __init__(self, engine: Engine, components: int = COMPONENTS, refresh_interval: float = REFRESH_INTERVAL):
+        self.engine = engine
+        self.components = components
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._ids = np.empty(0, dtype=np.int64)
+        self._vectors = np.empty((0, 0), dtype=np.float32)
+        self._norms = np.empty(0, dtype=np.float32)
+        self._positions = {}  # id -> ligne de _vectors
+        # ACP : centrage, réduction et base de projection (dimensions du descripteur, composantes)
+        self._mean = self._scale = self._basis = None
+        self._fitted_count = 0
+        # Derniers computed_at / deleted_at lus
+        self._computed_watermark = None
+        self._deleted_watermark = None
+        self.last_refresh = 0.0
+        self.last_refresh_stats = {}
+        self.last_query_ms = None
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _read_descriptors(self, since=None) -> tuple:
+        """Descripteurs à jour (version courante) calculés après since.
+
+        Returns:
+            Tuple (ids, matrice des descripteurs, plus grand computed_at lu)
+        """
+        stmt = (
+            select(BVHMotionStats.bvh_id, func.array_send(BVHMotionStats.descriptor), BVHMotionStats.computed_at)
+            .where(BVHMotionStats.stats_version == STATS_VERSION,
+                   func.cardinality(BVHMotionStats.descriptor) == DESCRIPTOR_SIZE)
+        )
+        if since is not None:
+            stmt = stmt.where(BVHMotionStats.computed_at > since - SYNC_OVERLAP)
+        with self.engine.connect() as conn:
+            rows = conn.execute(stmt).all()
+        if not rows:
+            return np.empty(0, dtype=np.int64), None, since
+        ids, blobs, computed = zip(*rows)
+        return np.asarray(ids, dtype=np.int64), decode_float4_arrays(blobs, DESCRIPTOR_SIZE), max(computed)
+
+    def _read_deleted_ids(self, since) -> tuple:
+        """Ids supprimés après since (tous si since est None) et plus grand deleted_at lu."""
+        stmt = select(BVHTombstone.bvh_id, BVHTombstone.deleted_at)
+        if since is not None:
+            stmt = stmt.where(BVHTombstone.deleted_at > since - SYNC_OVERLAP)
+        with self.engine.connect() as conn:
+            rows = conn.execute(stmt).all()
+        return [bvh_id for bvh_id, _ in rows], max((deleted_at for _, deleted_at in rows), default=since)
+
+    def _fit(self, descriptors: np.ndarray):
+        sample = descriptors
+        if len(sample) > PCA_SAMPLE:
+            sample = sample[np.random.default_rng(0).choice(len(sample), PCA_SAMPLE, replace=False)]
+        self._mean = sample.mean(axis=0)
+        scale = sample.std(axis=0)
+        # Une dimension constante sur le catalogue ne doit pas exploser après réduction
+        scale[scale < 1e-6] = 1.0
+        self._scale = scale
+        _, _, vt = np.linalg.svd((sample - self._mean) / scale, full_matrices=False)
+        self._basis = np.ascontiguousarray(vt[:self.components].T, dtype=np.float32)
+        self._fitted_count = len(descriptors)
+
+    def _project(self, descriptors: np.ndarray) -> np.ndarray:
+        return ((descriptors - self._mean) / self._scale).astype(np.float32) @ self._basis
+
+    def rebuild(self) -> dict:
+        """Recharge tous les descripteurs et recalcule l'ACP."""
+        start = time.perf_counter()
+        # Tombstones lus avant les descripteurs : une suppression concurrente sera vue au prochain delta
+        with self.engine.connect() as conn:
+            deleted_watermark = conn.execute(select(func.max(BVHTombstone.deleted_at))).scalar()
+        ids, descriptors, computed_watermark = self._read_descriptors()
+        with self._lock:
+            if descriptors is None:
+                self._ids = np.empty(0, dtype=np.int64)
+                self._vectors = np.empty((0, 0), dtype=np.float32)
+                self._norms = np.empty(0, dtype=np.float32)
+                self._basis = None
+                self._fitted_count = 0
+            else:
+                self._fit(descriptors)
+                self._ids = ids
+                self._vectors = self._project(descriptors)
+                self._norms = (self._vectors ** 2).sum(axis=1)
+            self._positions = {bvh_id: position for position, bvh_id in enumerate(self._ids.tolist())}
+            self._computed_watermark = computed_watermark
+            self._deleted_watermark = deleted_watermark
+            self.last_refresh = time.time()
+            self.last_refresh_stats = {"mode": "rebuild", "clips": len(self._ids), "updated": len(ids),
+                                       "deleted": 0, "elapsed_ms": (time.perf_counter() - start) * 1000}
+            return self.last_refresh_stats
+
+    def refresh(self) -> dict:
+        """Applique les descripteurs calculés et les entrées supprimées depuis la dernière mise à jour.
+
+        Returns:
+            Statistiques de la mise à jour (mode "delta" ou "rebuild", clips, durée)
+        """
+        if self._basis is None:
+            return self.rebuild()
+        start = time.perf_counter()
+        deleted_ids, deleted_watermark = self._read_deleted_ids(self._deleted_watermark)
+        ids, descriptors, computed_watermark = self._read_descriptors(self._computed_watermark)
+        with self._lock:
+            if descriptors is not None:
+                vectors = self._project(descriptors)
+                new_rows = []
+                for row, bvh_id in enumerate(ids.tolist()):
+                    position = self._positions.get(bvh_id)
+                    if position is None:
+                        new_rows.append(row)
+                    else:
+                        self._vectors[position] = vectors[row]
+                        self._norms[position] = (vectors[row] ** 2).sum()
+                if new_rows:
+                    for offset, bvh_id in enumerate(ids[new_rows].tolist()):
+                        self._positions[bvh_id] = len(self._ids) + offset
+                    self._ids = np.concatenate([self._ids, ids[new_rows]])
+                    self._vectors = np.concatenate([self._vectors, vectors[new_rows]])
+                    self._norms = np.concatenate([self._norms, (vectors[new_rows] ** 2).sum(axis=1)])
+            removed = sum(self._remove(bvh_id) for bvh_id in deleted_ids)
+            self._computed_watermark = computed_watermark
+            self._deleted_watermark = deleted_watermark
+            needs_refit = len(self._ids) > REFIT_GROWTH * self._fitted_count
+        if needs_refit:
+            return self.rebuild()
+        self.last_refresh = time.time()
+        self.last_refresh_stats = {"mode": "delta", "clips": len(self._ids), "updated": len(ids),
+                                   "deleted": removed, "elapsed_ms": (time.perf_counter() - start) * 1000}
+        return self.last_refresh_stats
+
+    def _remove(self, bvh_id: int) -> bool:
+        """Retire un clip en déplaçant la dernière ligne à sa place (appelé sous le verrou)."""
+        position = self._positions.pop(bvh_id, None)
+        if position is None:
+            return False
+        last = len(self._ids) - 1
+        if position != last:
+            self._ids[position] = self._ids[last]
+            self._vectors[position] = self._vectors[last]
+            self._norms[position] = self._norms[last]
+            self._positions[int(self._ids[position])] = position
+        self._ids = self._ids[:last]
+        self._vectors = self._vectors[:last]
+        self._norms = self._norms[:last]
+        return True
+
+    def refresh_if_due(self) -> bool:
+        """Met l'index à jour si la dernière mise à jour date de plus de refresh_interval."""
+        if time.time() - self.last_refresh < self.refresh_interval:
+            return False
+        self.refresh()
+        return True
+
+    def invalidate(self):
+        """Force une mise à jour au prochain refresh_if_due (ex: après une écriture)."""
+        self.last_refresh = 0.0
+
+    def __contains__(self, bvh_id: int) -> bool:
+        return bvh_id in self._positions
+
+    def query(self, bvh_id: int, k: int = 10) -> list:
+        """Les k clips les plus proches d'un clip du catalogue (lui-même exclu).
+
+        Returns:
+            Liste de (id, distance), de la plus proche à la plus lointaine
+        """
+        with self._lock:
+            position = self._positions.get(bvh_id)
+            if position is None:
+                raise ValueError(f"Pas de descripteur de mouvement pour l'entrée {bvh_id}")
+            return self._nearest(self._vectors[position], k, exclude=bvh_id)
+
+    def query_descriptor(self, descriptor, k: int = 10) -> list:
+        """Les k clips les plus proches d'un descripteur (ex: fichier pas encore enregistré)."""
+        with self._lock:
+            if self._basis is None:
+                return []
+            vector = self._project(np.asarray(descriptor, dtype=np.float32)[None, :])[0]
+            return self._nearest(vector, k)
+
+    def _nearest(self, vector: np.ndarray, k: int, exclude: Optional[int] = None) -> list:
+        start = time.perf_counter()
+        # |v - q|² = |v|² - 2 v.q + |q|² : un produit matrice-vecteur pour tout le catalogue
+        distances = self._norms - 2 * (self._vectors @ vector) + (vector ** 2).sum()
+        count = min(k + (exclude is not None), len(distances))
+        if count == 0:
+            return []
+        nearest = np.argpartition(distances, count - 1)[:count]
+        nearest = nearest[np.argsort(distances[nearest])]
+        matches = [(int(self._ids[i]), float(np.sqrt(max(distances[i], 0.0))))
+                   for i in nearest if self._ids[i] != exclude][:k]
+        self.last_query_ms = (time.perf_counter() - start) * 1000
+        return matches
+
+
+def similar_clips(engine: Engine, index: SimilarityIndex, bvh_id: int, k: int = 10) -> pandas.DataFrame:
+    """Les k clips les plus proches de bvh_id, avec leurs colonnes principales et leur distance."""
+    matches = index.query(bvh_id, k)
+    stmt = select(
+        BVHFile.id, BVHFile.original_filename, BVHFile.animation_style, BVHFile.skeleton_type,
+        BVHFile.duration_seconds, BVHFile.fps, BVHFile.description,
+    ).where(BVHFile.id.in_([match_id for match_id, _ in matches]))
+    with engine.connect() as conn:
+        df = pandas.read_sql_query(sql=stmt, con=conn)
+    # Un clip supprimé depuis la dernière mise à jour de l'index n'est plus dans le résultat
+    df["distance"] = df["id"].map(dict(matches))
+    return df.sort_values("distance").reset_index(drop=True)
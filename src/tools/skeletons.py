@@ -0,0 +1,79 @@
+"""Forme canonique et hash des hiérarchies de squelette.
+
+Un squelette (rig) est enregistré une seule fois dans la table skeletons et
+référencé par chaque entrée bvh via son hash. La forme canonique ne garde que
+ce qui définit le rig :
+    - le nom de chaque joint, en minuscules et sans préfixe d'espace de noms
+      ("mixamorig:Hips" et "mixamorig1:Hips" donnent "hips") ;
+    - l'index de son parent, ses canaux et la présence d'un End Site.
+Les OFFSET (proportions de l'acteur) n'en font pas partie : deux captures du
+même rig sur deux acteurs différents partagent le même squelette.
+
+Les rigs connus (MIXAMO, CMU, BIPED...) sont décrits par un BVH de référence
+dans KNOWN_RIGS_DIR, nommé <TYPE>.bvh ou <TYPE>_<variante>.bvh (une variante
+par export dont les canaux ou les joints diffèrent). Seule leur hiérarchie
+compte : un rig est reconnu par son hash, sans heuristique sur les noms.
+
+Le module ne dépend que de la hiérarchie parsée (parse_bvh(path, with_motion=False)
+suffit) et n'accède pas à la base.
+"""
+import functools
+import hashlib
+from pathlib import Path
+from typing import Optional
+
+SKELETON_HASH_ALGORITHM = "sha256"
+KNOWN_RIGS_DIR = Path(__file__).with_name("rigs")
+
+
+def canonical_joint_name(name: str) -> str:
+    return name.rsplit(":", 1)[-1].strip().lower()
+
+
+def canonical_hierarchy(clip) -> str:
+    """Une ligne "nom|parent|canaux|end_site" par joint, dans l'ordre du fichier."""
+    return "\n".join(
+        f"{canonical_joint_name(joint.name)}|{joint.parent}|"
+        f"{','.join(channel.lower() for channel in joint.channels)}|{int(joint.end_site is not None)}"
+        for joint in clip.joints
+    )
+
+
+def hierarchy_hash(definition: str) -> str:
+    return hashlib.new(SKELETON_HASH_ALGORITHM, definition.encode("utf-8")).hexdigest()
+
+
+def skeleton_fields(clip) -> dict:
+    """Champs skeleton_hash / skeleton_definition d'un BVHFileCreate."""
+    definition = canonical_hierarchy(clip)
+    return {"skeleton_hash": hierarchy_hash(definition), "skeleton_definition": definition}
+
+
+@functools.lru_cache(maxsize=None)
+def known_rigs(rig_dir: Path = KNOWN_RIGS_DIR) -> dict:
+    """Rigs de référence, lus une fois par processus.
+
+    Returns:
+        Dictionnaire {hash: valeurs de la ligne skeletons} (mêmes clés que db_tools._skeleton_specs)
+    """
+    # Import local : tools.bvh_parser dépend de ce module
+    from tools.bvh_parser import has_fingers, parse_bvh
+
+    rigs = {}
+    for path in sorted(Path(rig_dir).glob("*.bvh")):
+        clip = parse_bvh(path, with_motion=False)
+        fields = skeleton_fields(clip)
+        rigs[fields["skeleton_hash"]] = {
+            "hierarchy_hash": fields["skeleton_hash"],
+            "definition": fields["skeleton_definition"],
+            "skeleton_type": path.stem.split("_", 1)[0].upper(),
+            "joint_count": len(clip.joints),
+            "has_fingers": has_fingers(clip),
+        }
+    return rigs
+
+
+def known_rig_type(skeleton_hash: str) -> Optional[str]:
+    """Type du rig de référence de ce hash, ou None si la hiérarchie n'est pas celle d'un rig connu."""
+    rig = known_rigs().get(skeleton_hash)
+    return rig["skeleton_type"] if rig else None
@@ -0,0 +1,160 @@
+"""Écriture des fichiers envoyés dans le répertoire de données.
+
+Le contenu est copié par blocs dans un fichier temporaire du répertoire
+cible en calculant son hash au passage, puis publié par un renommage
+atomique : un fichier .bvh visible est toujours complet.
+"""
+import hashlib
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from tools.metadata_cache import HASH_ALGORITHM, file_content_hash
+
+CHUNK_SIZE = 1024 * 1024
+PARTIAL_SUFFIX = ".part"
+
+
+@dataclass
+class SavedFile:
+    path: Path
+    content_hash: str
+    size_bytes: int
+    duplicate: bool  # True si le contenu existait déjà (path pointe alors vers l'existant)
+
+
+def _publish(tmp_path: str, destination: Path) -> bool:
+    """Renomme tmp_path en destination sans jamais écraser un fichier existant."""
+    try:
+        os.link(tmp_path, destination)
+    except FileExistsError:
+        return False
+    except OSError:
+        # Système de fichiers sans liens physiques : vérification puis renommage
+        if destination.exists():
+            return False
+        os.replace(tmp_path, destination)
+        return True
+    os.unlink(tmp_path)
+    return True
+
+
+@dataclass
+class PartialFile:
+    path: Path  # Fichier .part complet, pas encore publié
+    content_hash: str
+    size_bytes: int
+
+
+def save_stream(source, dest_dir, filename: str, find_duplicate=None, chunk_size: int = CHUNK_SIZE) -> SavedFile:
+    """Copie un flux dans dest_dir/filename, en un seul passage.
+
+    Args:
+        source: Objet fichier binaire (UploadedFile, fichier ouvert...)
+        dest_dir: Répertoire cible
+        filename: Nom souhaité ; suffixé (_1, _2...) si un autre contenu porte déjà ce nom
+        find_duplicate: Fonction hash -> chemin d'un fichier existant de même contenu, ou None
+        chunk_size: Taille des blocs copiés
+
+    Returns:
+        Un SavedFile
+    """
+    filename = Path(filename).name  # Jamais de chemin venant du client
+    partial = write_partial(source, dest_dir, filename, chunk_size)
+    try:
+        return publish_file(partial.path, dest_dir, filename, partial.content_hash, partial.size_bytes,
+                            find_duplicate)
+    except BaseException:
+        partial.path.unlink(missing_ok=True)
+        raise
+
+
+def write_partial(source, dest_dir, filename: str, chunk_size: int = CHUNK_SIZE) -> PartialFile:
+    """Copie un flux par blocs dans un fichier .part de dest_dir en calculant son hash.
+
+    Le flux est lu depuis le début et sa position de lecture est restaurée
+    ensuite : l'appelant peut continuer à s'en servir.
+
+    Returns:
+        Un PartialFile, à publier avec publish_file
+    """
+    dest_dir = Path(dest_dir)
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.new(HASH_ALGORITHM)
+    size = 0
+    position = source.tell() if hasattr(source, "seek") else None
+    if position is not None:
+        source.seek(0)
+    fd, tmp_path = partial_file(dest_dir, Path(filename).name)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while chunk := source.read(chunk_size):
+                digest.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+    finally:
+        if position is not None:
+            source.seek(position)
+    return PartialFile(Path(tmp_path), digest.hexdigest(), size)
+
+
+def partial_file(dest_dir, filename: str) -> tuple:
+    """Crée le fichier temporaire d'une écriture en cours dans dest_dir.
+
+    Returns:
+        Tuple (descripteur de fichier, chemin), comme tempfile.mkstemp
+    """
+    # Préfixe "." et suffixe .part : le fichier partiel n'est jamais pris pour un .bvh
+    return tempfile.mkstemp(dir=dest_dir, prefix=f".{filename}.", suffix=PARTIAL_SUFFIX)
+
+
+def publish_file(tmp_path, dest_dir, filename: str, content_hash: str, size: int, find_duplicate=None) -> SavedFile:
+    """Publie un fichier temporaire complet sous dest_dir/filename (suffixé si le nom est pris).
+
+    Si un fichier de même contenu existe déjà (find_duplicate, ou même nom et
+    même hash), le fichier temporaire est supprimé et l'existant est renvoyé.
+
+    Returns:
+        Un SavedFile
+    """
+    dest_dir = Path(dest_dir)
+    existing = find_duplicate(content_hash) if find_duplicate else None
+    if existing and Path(existing).exists():
+        os.unlink(tmp_path)
+        return SavedFile(Path(existing), content_hash, size, duplicate=True)
+
+    stem, suffix = Path(filename).stem, Path(filename).suffix
+    for attempt in range(1000):
+        destination = dest_dir / (filename if attempt == 0 else f"{stem}_{attempt}{suffix}")
+        if destination.exists():
+            if destination.stat().st_size == size and file_content_hash(destination) == content_hash:
+                os.unlink(tmp_path)
+                return SavedFile(destination, content_hash, size, duplicate=True)
+            continue
+        if _publish(tmp_path, destination):
+            return SavedFile(destination, content_hash, size, duplicate=False)
+    raise FileExistsError(f"Aucun nom libre pour {filename} dans {dest_dir}")
+
+
+def remove_stale_partials(dest_dir, max_age_seconds: float = 3600) -> int:
+    """Supprime les fichiers .part laissés par une écriture interrompue."""
+    dest_dir = Path(dest_dir)
+    if not dest_dir.exists():
+        return 0
+    removed = 0
+    limit = time.time() - max_age_seconds
+    for path in dest_dir.glob(f".*{PARTIAL_SUFFIX}"):
+        try:
+            if path.stat().st_mtime < limit:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed